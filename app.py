@@ -1,16 +1,16 @@
 import os
-import shutil
 import webbrowser
 import requests
 import pyttsx3
-from flask import Flask, render_template, request, redirect, url_for, flash, session
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
+import json
 from werkzeug.utils import secure_filename
 from dotenv import load_dotenv
 from config import Config
-import base64
 from fish_audio_sdk import Session, TTSRequest
 from azure.storage.blob import BlobServiceClient, ContentSettings
 import time
+import asyncio
 
 from moviepy.config import change_settings
 if os.path.exists("/usr/bin/magick"):
@@ -19,8 +19,15 @@ if os.path.exists("/usr/bin/magick"):
 # Import modules from your old project
 # Ensure the 'modules' folder contains __init__.py and the files you provided
 from modules.video_generator import VideoGenerator
-from modules.pollinations_utils import PollinationsUtils
 from modules.background_audio_generator import BackgroundAudioGenerator
+from modules.retry_policy import CircuitBreaker
+from modules.http_transport import HttpTransport
+from modules.blob_store import BlobStore
+from modules.single_flight import SingleFlight
+from modules.job_queue import JobQueue
+from modules.job_workers import JobWorkerPool
+from modules.stage_pipeline import StagePipeline
+from modules.async_providers import AsyncProviders
 
 load_dotenv()
 
@@ -47,10 +54,13 @@ else:
     print("WARNING: AZURE_CONNECTION_STRING not found in .env. Cloud uploads will fail.")
     blob_service_client = None
 
+# One async client layer per process; forked job workers start its event loop on first use
+async_providers = AsyncProviders.from_config()
+
 # --- Helper Functions ---
 
-def upload_to_azure(local_file_path, blob_name):
-    """Uploads a local file to Azure Blob Storage and returns the public URL."""
+def upload_to_azure(local_file_path, blob_name, progress_hook=None):
+    """Uploads a local file to Azure Blob Storage and returns the public URL; progress_hook(current, total) gets the bytes sent."""
     if not blob_service_client:
         return None
     
@@ -64,7 +74,8 @@ def upload_to_azure(local_file_path, blob_name):
             blob_client.upload_blob(
                 data, 
                 overwrite=True,
-                content_settings=ContentSettings(content_type=content_type)
+                content_settings=ContentSettings(content_type=content_type),
+                progress_hook=progress_hook
             )
         return blob_client.url
     except Exception as e:
@@ -72,20 +83,12 @@ def upload_to_azure(local_file_path, blob_name):
         return None
 
 
+def media_filename(url):
+    return secure_filename(os.path.basename(url.split("?")[0])) or "downloaded_media.mp4"
+
 def download_file(url, folder):
-    try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        filename = secure_filename(os.path.basename(url.split("?")[0]))
-        if not filename: filename = "downloaded_media.mp4"
-        file_path = os.path.join(folder, filename)
-        with open(file_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        return file_path
-    except Exception as e:
-        print(f"Download error: {e}")
-        return None
+    # Cached by URL and revalidated with a conditional GET; the file name is prefixed with the content hash
+    return async_providers.download_file_sync(url, folder, media_filename(url))
 
 def get_next_project_name(base_name="manual_project"):
     if not os.path.exists(os.path.join(PROJECTS_FOLDER, base_name)):
@@ -136,42 +139,9 @@ def generate_voice_pyttsx3(text, output_path):
 def generate_google_tts(text, output_path):
     """
     Generates audio using Google Cloud TTS API (Standard Free Tier).
-    mimics the logic from the user's Apps Script.
+    mimics the logic from the user's Apps Script. Thin wrapper over the async provider layer.
     """
-    # Ideally, put this key in your .env file as GOOGLE_TTS_API_KEY
-    api_key = Config.GOOGLE_TTS_API_KEY
-    
-    url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={api_key}"
-    headers = {'Content-Type': 'application/json'}
-    
-    data = {
-        "input": {"text": text},
-        "voice": {
-            "languageCode": "en-US", 
-            "name": "en-US-Neural2-F"  # Female voice
-            # Options: en-US-Standard-A (Male), en-US-Standard-F (Female), en-GB-Standard-A (Female)
-        },
-        "audioConfig": {
-            "audioEncoding": "MP3", 
-            "speakingRate": 15.0
-        }
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        response_data = response.json()
-        
-        if 'audioContent' in response_data:
-            audio_content = base64.b64decode(response_data['audioContent'])
-            with open(output_path, 'wb') as f:
-                f.write(audio_content)
-            return True
-        else:
-            print(f"Google TTS Error: {response_data}")
-            return False
-    except Exception as e:
-        print(f"Google TTS Request Failed: {e}")
-        return False
+    return async_providers.google_tts_sync(text, output_path)
     
 def generate_fish_audio(text, output_path, ref_id="b85455e9d73e492d95c554176a8913df"):
     """Generates audio using Fish Audio SDK with the Kiova British voice."""
@@ -179,13 +149,16 @@ def generate_fish_audio(text, output_path, ref_id="b85455e9d73e492d95c554176a891
         # Your specific API Key
         session = Session(Config.FISH_AUDIO_API_KEY) 
         
-        # Stream the audio directly to the file
-        with open(output_path, "wb") as f:
-            for chunk in session.tts(TTSRequest(
+        # Collected in memory so concurrent requests for the same line can share it
+        def synthesize():
+            return b"".join(session.tts(TTSRequest(
                 reference_id=ref_id,
                 text=text
-            )):
-                f.write(chunk)
+            )))
+
+        audio = SingleFlight.group("fish-audio", shared=True).do((text, ref_id), synthesize)
+        with open(output_path, "wb") as f:
+            f.write(audio)
         
         print(f"✅ Fish Audio success: {output_path}")
         return True
@@ -226,10 +199,30 @@ def reset_project():
     
     # 3. Clear Session
     session.clear()
+
+    # 4. Drop stored assets no project links to any more
+    BlobStore.shared().gc()
     
     flash("Project reset. Temporary files deleted.", "info")
     return redirect(url_for('step1'))
 
+# Provider calls run in the job workers, so these report each live worker's counters
+# (sent with its heartbeat) next to the web process's own
+@app.route('/metrics/circuits')
+def circuit_metrics():
+    """Per-endpoint circuit breaker state and counters, per process."""
+    return jsonify({'web': CircuitBreaker.metrics(), **job_queue.worker_metrics('circuits')})
+
+@app.route('/metrics/http')
+def http_metrics():
+    """Per-host request, error, byte and latency counters of the shared HTTP transport, per process."""
+    return jsonify({'web': HttpTransport.stats(), **job_queue.worker_metrics('http')})
+
+@app.route('/metrics/singleflight')
+def single_flight_metrics():
+    """Calls and coalesced duplicate calls per single-flight group, per process."""
+    return jsonify({'web': SingleFlight.metrics(), **job_queue.worker_metrics('singleflight')})
+
 @app.route('/', methods=['GET', 'POST'])
 def step1():
     # --- Maintenance: Clean up abandoned files older than 24 hours ---
@@ -321,6 +314,232 @@ def step2():
 
     return render_template('step2.html', scripts=session.get('scripts', {}))
 
+def run_generation_job(job):
+    """
+    Job handler for step 3. Videos go through a StagePipeline (voice, media, render,
+    music, upload) with a worker pool per stage, so the next video's voiceovers and
+    downloads overlap this one's render and the previous one's upload.
+    """
+    payload = job.payload
+    current_project_name = payload['project_name']
+    current_project_path = os.path.join(PROJECTS_FOLDER, current_project_name)
+    gen_images_dir = os.path.join(current_project_path, 'generated_images')
+    voice_option = payload['voiceover']
+    custom_ref_id = payload['fish_ref_id']
+
+    job.log(f"Generating into folder: {current_project_name}")
+
+    # Utils
+    vg = VideoGenerator(current_project_name)
+    bg_gen = BackgroundAudioGenerator(current_project_name, bg_music_db=-25)
+
+    def scene_folder_for(video, scene):
+        scene_folder = os.path.join(gen_images_dir, str(video['vid_id']), clean_text_for_folder(scene['scene']))
+        os.makedirs(scene_folder, exist_ok=True)
+        return scene_folder
+
+    # --- A. Voiceovers ---
+    async def request_voiceovers(video):
+        """Requests every scene's Pollinations or Google TTS voiceover of a video at once; True for each that succeeded."""
+        async def request(scene):
+            scene_folder = scene_folder_for(video, scene)
+            vo_path = os.path.join(scene_folder, "voiceover.mp3")
+            if voice_option == 'Pollinations':
+                audio_path = await async_providers.generate_audio(scene['script'], scene_folder)
+                if audio_path:
+                    os.replace(audio_path, vo_path)
+                return bool(audio_path)
+            return await async_providers.google_tts(scene['script'], vo_path)
+        return await asyncio.gather(*(request(scene) for scene in video['scenes']))
+
+    def voice_stage(video):
+        job.check_cancelled()
+        # The async provider layer keeps the whole video's requests in flight on one thread
+        if voice_option in ('Pollinations', 'GoogleTTS'):
+            requested = async_providers.run_sync(request_voiceovers(video))
+        else:
+            requested = [False] * len(video['scenes'])
+        for scene, requested_ok in zip(video['scenes'], requested):
+            scene_folder = scene_folder_for(video, scene)
+            vo_path = os.path.join(scene_folder, "voiceover.mp3")
+            
+            if voice_option == 'Pollinations':
+                # Already requested above, without a fallback
+                pass
+            elif voice_option == 'GoogleTTS':
+                if not requested_ok:
+                     from gtts import gTTS
+                     tts = gTTS(text=scene['script'], lang='en', slow=False)
+                     tts.save(vo_path)
+            elif voice_option == 'FishAudio':
+                # USE SAVED ID
+                if not generate_fish_audio(scene['script'], vo_path, ref_id=custom_ref_id):
+                     from gtts import gTTS
+                     tts = gTTS(text=scene['script'], lang='en', slow=False)
+                     tts.save(vo_path)
+            else:
+                from gtts import gTTS
+                tts = gTTS(text=scene['script'], lang='en', slow=False)
+                tts.save(vo_path)
+            job.progress.emit("voice", video['vid_id'], scene['scene'], final=True, ok=os.path.exists(vo_path))
+        return video
+
+    # --- B. Media ---
+    async def download_media(video):
+        """Downloads every URL scene of a video at once; None for the other scenes."""
+        async def download(scene):
+            if scene['media_type'] != 'url':
+                return None
+            return await async_providers.download_file(scene['media_source'], scene_folder_for(video, scene), media_filename(scene['media_source']))
+        return await asyncio.gather(*(download(scene) for scene in video['scenes']))
+
+    def media_stage(video):
+        job.check_cancelled()
+        video['video_dict'] = {'video': video['vid_id'], 'scenes': []}
+        video['media_paths'] = []
+        downloaded = async_providers.run_sync(download_media(video))
+        for scene, downloaded_path in zip(video['scenes'], downloaded):
+            scene_folder = scene_folder_for(video, scene)
+            final_media_path = ""
+            if scene['media_type'] == 'url':
+                final_media_path = downloaded_path
+            else:
+                source_path = scene['media_source']
+                if os.path.exists(source_path):
+                    ext = os.path.splitext(source_path)[1]
+                    dest_path = os.path.join(scene_folder, f"media{ext}")
+                    BlobStore.shared().import_file(source_path, dest_path)
+                    final_media_path = dest_path
+            job.progress.emit("media", video['vid_id'], scene['scene'], final=True, ok=bool(final_media_path))
+
+            video['video_dict']['scenes'].append({'scene': scene['scene'], 'text': scene['script'], 'visuals': 'manual'})
+            video['media_paths'].append({'scene': scene['scene'], 'image_path': final_media_path, 'google_image_path': ''})
+        job.log(f"{video['vid_key']}: voiceovers and media ready")
+        return video
+
+    # --- C. Render, Music & Upload ---
+    def render_stage(video):
+        job.check_cancelled()
+        video['output_path'] = vg.execute(video['video_dict'], video['media_paths'], progress=job.progress)
+        return video
+
+    def music_stage(video):
+        job.check_cancelled()
+        if video['music_path'] and os.path.exists(video['output_path']):
+            music_video_path = bg_gen.execute(video['output_path'], specific_audio_path=video['music_path'])
+            if music_video_path:
+                video['output_path'] = music_video_path
+            job.progress.emit("music", video['vid_id'], final=True, ok=bool(music_video_path))
+        return video
+
+    def upload_stage(video):
+        job.check_cancelled()
+        final_output_path = video['output_path']
+        if final_output_path and os.path.exists(final_output_path):
+            filename = os.path.basename(final_output_path)
+            blob_name = f"{current_project_name}/{video['vid_key']}_{filename}"
+            cloud_url = upload_to_azure(final_output_path, blob_name,
+                                        progress_hook=lambda current, total: job.progress.emit("upload", video['vid_id'], done=current, total=total))
+            job.progress.emit("upload", video['vid_id'], final=True, ok=bool(cloud_url))
+            video['link'] = cloud_url if cloud_url else f"Upload Failed: {final_output_path}"
+            job.log(f"{video['vid_key']}: uploaded" if cloud_url else f"{video['vid_key']}: upload failed")
+        return video
+
+    pipeline = StagePipeline([
+        ('voice', voice_stage, Config.PIPELINE_VOICE_WORKERS),
+        ('media', media_stage, Config.PIPELINE_MEDIA_WORKERS),
+        ('render', render_stage, Config.PIPELINE_RENDER_WORKERS),
+        ('music', music_stage, Config.PIPELINE_MUSIC_WORKERS),
+        ('upload', upload_stage, Config.PIPELINE_UPLOAD_WORKERS),
+    ], queue_size=Config.PIPELINE_QUEUE_SIZE)
+    videos = [{'vid_key': vid_key, 'vid_id': vid_key.split('_')[1], 'scenes': scenes, 'music_path': payload['music'].get(vid_key), 'link': None}
+              for vid_key, scenes in payload['scripts'].items()]
+    results, errors = pipeline.run(videos)
+
+    utilization = pipeline.utilization()
+    job.progress.emit("pipeline", final=True, utilization=utilization)
+    job.log("Stage utilization: " + ", ".join(f"{name} {stats['utilization']:.0%} ({stats['workers']} workers)" for name, stats in utilization.items()))
+    job.check_cancelled()
+    for position, (stage, error) in errors.items():
+        job.log(f"Gen Error {videos[position]['vid_key']} ({stage}): {error}")
+
+    return [video['link'] for position, video in enumerate(results) if position not in errors and video['link']]
+
+job_queue = JobQueue.shared(Config.JOB_QUEUE_DB)
+job_workers = JobWorkerPool({'generate_videos': run_generation_job},
+                            metrics={'circuits': CircuitBreaker.metrics, 'http': HttpTransport.stats, 'singleflight': SingleFlight.metrics})
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Status, result and log lines (after log id ?after=) of a job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify({
+        'job_id': job_id,
+        'status': job['status'],
+        'error': job['error'],
+        'result': job['result'],
+        'logs': job_queue.logs(job_id, after=request.args.get('after', 0, type=int)),
+    })
+
+@app.route('/jobs/<job_id>/events')
+def job_event_stream(job_id):
+    """
+    Server-sent events of a job: "progress" events, "log" lines and a "status" event
+    whenever the status changes. The stream ends once the job has finished; a
+    reconnecting EventSource resumes after the Last-Event-ID it saw.
+    """
+    if job_queue.get(job_id) is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    # Event ids are "<last log id>-<last progress event id>"
+    last_log_id, _, last_event_id = request.headers.get('Last-Event-ID', '0-0').partition('-')
+    last_log_id = int(last_log_id) if last_log_id.isdigit() else 0
+    last_event_id = int(last_event_id) if last_event_id.isdigit() else 0
+
+    def message(kind, data):
+        return f"id: {last_log_id}-{last_event_id}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+
+    def stream():
+        nonlocal last_log_id, last_event_id
+        status = None
+        last_sent = time.time()
+        while True:
+            job = job_queue.get(job_id)
+            chunks = []
+            for line in job_queue.logs(job_id, after=last_log_id):
+                last_log_id = line['id']
+                chunks.append(message('log', line))
+            for event in job_queue.events(job_id, after=last_event_id):
+                last_event_id = event['id']
+                chunks.append(message('progress', event))
+            if job['status'] != status:
+                status = job['status']
+                chunks.append(message('status', {'status': status, 'error': job['error']}))
+            if chunks:
+                last_sent = time.time()
+                yield "".join(chunks)
+            elif time.time() - last_sent > 15:
+                # Comment line that keeps proxies from closing an idle stream
+                last_sent = time.time()
+                yield ": keep-alive\n\n"
+            if status in JobQueue.FINISHED:
+                return
+            time.sleep(Config.PROGRESS_STREAM_INTERVAL)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if job_queue.cancel(job_id):
+        flash("Cancelling the generation.", "info")
+    return redirect(url_for('step3'))
+
+@app.route('/metrics/jobs')
+def job_metrics():
+    """Number of jobs per status."""
+    return jsonify(job_queue.counts())
+
 @app.route('/step3', methods=['GET', 'POST'])
 def step3():
     if 'scripts' not in session: return redirect(url_for('step2'))
@@ -328,6 +547,20 @@ def step3():
     # Load previously saved settings (if any)
     saved_settings = session.get('step3_settings', {})
 
+    # A generation job of this session: show its progress, or its results once done
+    job = job_queue.get(session['step3_job_id']) if 'step3_job_id' in session else None
+    if job is None or job['status'] in JobQueue.FINISHED:
+        session.pop('step3_job_id', None)
+    if job and job['status'] in JobQueue.FINISHED:
+        if job['status'] == 'done':
+            session['generated_videos'] = job['result']
+            flash(f"Generation Complete! Created {len(job['result'])} videos.", "success")
+        elif job['status'] == 'cancelled':
+            flash("Generation cancelled.", "info")
+        else:
+            flash(f"Generation failed: {job['error']}", "danger")
+        job = None
+
     # If we already generated videos in this session, show results
     if request.method == 'GET' and 'generated_videos' in session:
         return render_template('step3.html', 
@@ -335,7 +568,7 @@ def step3():
                              generated_videos=session['generated_videos'],
                              settings=saved_settings) # Pass settings
 
-    if request.method == 'POST':
+    if request.method == 'POST' and job is None:
         voice_option = request.form.get('voiceover')
         
         # Capture custom Ref ID, default to Kiova if empty
@@ -348,7 +581,6 @@ def step3():
             'voiceover': voice_option,
             'fish_ref_id': custom_ref_id
         }
-        saved_settings = session['step3_settings']
         # -------------------------------------------
 
         # 1. Project Setup
@@ -360,120 +592,49 @@ def step3():
         os.makedirs(gen_video_dir, exist_ok=True)
         os.makedirs(gen_images_dir, exist_ok=True)
 
-        print(f"Generating into folder: {current_project_name}")
-
-        # Utils
-        pollinations_utils = PollinationsUtils(Config.POLLINATIONS_API_KEY if hasattr(Config, 'POLLINATIONS_API_KEY') else None)
-        vg = VideoGenerator(current_project_name)
-        bg_gen = BackgroundAudioGenerator(current_project_name, bg_music_db=-25)
-
-        azure_links = [] 
-
-        # 2. Iterate Videos
-        for vid_key, scenes in session['scripts'].items():
-            vid_id = vid_key.split('_')[1] 
-            
-            # --- A. Handle Specific Music Upload ---
+        # 2. Save the music uploads; the request's files are gone once the job runs
+        music_paths = {}
+        for vid_key in session['scripts']:
             music_file_input_name = f"bg_music_{vid_key}"
             music_file = request.files.get(music_file_input_name)
             
-            specific_music_path = None
             if music_file and music_file.filename != '':
                 music_folder = os.path.join(current_project_path, 'data', 'bg_music')
                 os.makedirs(music_folder, exist_ok=True)
                 safe_name = secure_filename(f"{vid_key}_{music_file.filename}")
                 specific_music_path = os.path.join(music_folder, safe_name)
-                music_file.save(specific_music_path)
-
-            # --- B. Prepare Video Generation Data ---
-            video_dict = {'video': vid_id, 'scenes': []}
-            media_paths_list = []
-
-            for scene in scenes:
-                scene_id = scene['scene']
-                clean_scene_id = clean_text_for_folder(scene_id)
-                scene_folder = os.path.join(gen_images_dir, str(vid_id), clean_scene_id)
-                os.makedirs(scene_folder, exist_ok=True)
-
-                # Voiceover Logic
-                vo_path = os.path.join(scene_folder, "voiceover.mp3")
-                
-                if voice_option == 'Pollinations':
-                    pollinations_utils.generate_audio(scene['script'], scene_folder) 
-                    files = [f for f in os.listdir(scene_folder) if f.startswith('audio_')]
-                    if files:
-                        latest_file = max([os.path.join(scene_folder, f) for f in files], key=os.path.getctime)
-                        if os.path.exists(vo_path): os.remove(vo_path)
-                        os.rename(latest_file, vo_path)
-                elif voice_option == 'GoogleTTS':
-                    if not generate_google_tts(scene['script'], vo_path):
-                         from gtts import gTTS
-                         tts = gTTS(text=scene['script'], lang='en', slow=False)
-                         tts.save(vo_path)
-                elif voice_option == 'FishAudio':
-                    # USE SAVED ID
-                    if not generate_fish_audio(scene['script'], vo_path, ref_id=custom_ref_id):
-                         from gtts import gTTS
-                         tts = gTTS(text=scene['script'], lang='en', slow=False)
-                         tts.save(vo_path)
-                else:
-                    from gtts import gTTS
-                    tts = gTTS(text=scene['script'], lang='en', slow=False)
-                    tts.save(vo_path)
-
-                # Media Logic
-                final_media_path = ""
-                if scene['media_type'] == 'url':
-                    final_media_path = download_file(scene['media_source'], scene_folder)
-                else:
-                    source_path = scene['media_source']
-                    if os.path.exists(source_path):
-                        ext = os.path.splitext(source_path)[1]
-                        dest_path = os.path.join(scene_folder, f"media{ext}")
-                        shutil.copy(source_path, dest_path)
-                        final_media_path = dest_path
-
-                video_dict['scenes'].append({'scene': scene_id, 'text': scene['script'], 'visuals': 'manual'})
-                media_paths_list.append({'scene': scene_id, 'image_path': final_media_path, 'google_image_path': ''})
-
-            # --- C. Generate Video & Apply Music ---
-            try:
-                raw_video_path = vg.execute(video_dict, media_paths_list)
-                final_output_path = raw_video_path
-
-                if specific_music_path and os.path.exists(raw_video_path):
-                    music_video_path = bg_gen.execute(raw_video_path, specific_audio_path=specific_music_path)
-                    if music_video_path:
-                        final_output_path = music_video_path
-
-                if final_output_path and os.path.exists(final_output_path):
-                    filename = os.path.basename(final_output_path)
-                    blob_name = f"{current_project_name}/{vid_key}_{filename}"
-                    cloud_url = upload_to_azure(final_output_path, blob_name)
-                    azure_links.append(cloud_url if cloud_url else f"Upload Failed: {final_output_path}")
-
-            except Exception as e:
-                print(f"Gen Error {vid_key}: {e}")
-                continue
-
-        session['generated_videos'] = azure_links
-        flash(f"Generation Complete! Created {len(azure_links)} videos.", "success")
-
-        # Pass settings back to template
-        return render_template('step3.html', 
-                             scripts=session.get('scripts', {}), 
-                             generated_videos=azure_links,
-                             settings=saved_settings)
+                blob_store = BlobStore.shared()
+                blob_store.link(blob_store.put_chunks(iter(lambda: music_file.stream.read(1024 * 1024), b'')), specific_music_path)
+                music_paths[vid_key] = specific_music_path
 
-    # GET Request (First load)
+        # 3. Hand the generation to the job workers and return straight away
+        session['step3_job_id'] = job_queue.enqueue('generate_videos', {
+            'project_name': current_project_name,
+            'voiceover': voice_option,
+            'fish_ref_id': custom_ref_id,
+            'scripts': session['scripts'],
+            'music': music_paths,
+        })
+        session.pop('generated_videos', None)
+        return redirect(url_for('step3'))
+
+    # GET Request (First load, or a job in progress)
     return render_template('step3.html', 
                          scripts=session.get('scripts', {}), 
-                         settings=saved_settings)
+                         settings=saved_settings,
+                         job=job,
+                         workers_alive=bool(job_queue.live_workers()) if job else True)
     
 if __name__ == '__main__':
     # Ensure fonts folder exists for VideoGenerator (TextClip)
     if not os.path.exists('fonts'):
         os.makedirs('fonts')
         print("WARNING: Please put 'ARIALBD.TTF' or 'Candara-Bold.ttf' in the /fonts folder, or update VideoGenerator path.")
+
+    # Job workers are forked before the server starts its threads; under the debug
+    # reloader only in its child process. Other servers (flask run, gunicorn) need worker.py.
+    debug = True
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        job_workers.start()
         
-    app.run(debug=True)
\ No newline at end of file
+    app.run(debug=debug)
@@ -15,6 +15,101 @@ class Config:
     FISH_AUDIO_API_KEY=os.getenv("FISH_AUDIO_API_KEY")
     AZURE_CONNECTION_STRING=os.getenv("AZURE_CONNECTION_STRING")
     AZURE_CONTAINER_NAME=os.getenv("AZURE_CONTAINER_NAME")
+
+    # Gemini models the writer may route between, fastest/most reliable first is picked at runtime
+    GEMINI_MODELS = os.getenv("GEMINI_MODELS", "gemini-2.5-flash,gemini-2.0-flash").split(",")
+    # Per-model Gemini quotas used to pace requests (requests and tokens per minute)
+    GEMINI_RPM = int(os.getenv("GEMINI_RPM", 10))
+    GEMINI_TPM = int(os.getenv("GEMINI_TPM", 250000))
+
+    # Shared LLM/TTS clients: timeouts in seconds and keep-alive connections per client
+    LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", 10))
+    LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", 120))
+    LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", 16))
+
+    # Pooled HTTP transport for all other outbound requests: default timeouts in seconds and keep-alive connections per host
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 10))
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", 60))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", 16))
+
+    # Async provider layer: connections per event loop and requests in flight per provider
+    ASYNC_MAX_CONNECTIONS = int(os.getenv("ASYNC_MAX_CONNECTIONS", 256))
+    ASYNC_MAX_CONNECTIONS_PER_HOST = int(os.getenv("ASYNC_MAX_CONNECTIONS_PER_HOST", 64))
+    ASYNC_POLLINATIONS_CONCURRENCY = int(os.getenv("ASYNC_POLLINATIONS_CONCURRENCY", 32))
+    ASYNC_PEXELS_CONCURRENCY = int(os.getenv("ASYNC_PEXELS_CONCURRENCY", 16))
+    ASYNC_GOOGLE_TTS_CONCURRENCY = int(os.getenv("ASYNC_GOOGLE_TTS_CONCURRENCY", 16))
+    ASYNC_NAGAAC_CONCURRENCY = int(os.getenv("ASYNC_NAGAAC_CONCURRENCY", 4))
+
+    # Footage downloads: parallel range requests per file, smallest range size and read buffer (bytes)
+    DOWNLOAD_PARTS = int(os.getenv("DOWNLOAD_PARTS", 4))
+    DOWNLOAD_MIN_PART_SIZE = int(os.getenv("DOWNLOAD_MIN_PART_SIZE", 4 * 1024 * 1024))
+    DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE", 1024 * 1024))
+
+    # Pexels search cache: full result pages kept for PEXELS_CACHE_TTL seconds and served "lru" or "random";
+    # prefetching stops when fewer than PEXELS_RATE_LIMIT_RESERVE API requests are left
+    PEXELS_CACHE_DB = os.getenv("PEXELS_CACHE_DB", "pexels_cache.db")
+    PEXELS_CACHE_TTL = int(os.getenv("PEXELS_CACHE_TTL", 24 * 3600))
+    PEXELS_PER_PAGE = int(os.getenv("PEXELS_PER_PAGE", 80))
+    PEXELS_MAX_PAGES = int(os.getenv("PEXELS_MAX_PAGES", 5))
+    PEXELS_PICK_STRATEGY = os.getenv("PEXELS_PICK_STRATEGY", "lru")
+    PEXELS_RATE_LIMIT_RESERVE = int(os.getenv("PEXELS_RATE_LIMIT_RESERVE", 50))
+
+    # Local state shared by all projects, such as the NagaAC catalogue snapshot used when the API cannot be reached
+    DATA_DIR = os.getenv("DATA_DIR", "data")
+    NAGA_AC_CATALOGUE_SNAPSHOT = os.getenv("NAGA_AC_CATALOGUE_SNAPSHOT", os.path.join(DATA_DIR, "naga_ac_catalogue.json"))
+
+    # Content-addressed asset store shared by all projects; unreferenced blobs are kept BLOB_GC_GRACE seconds
+    BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", os.path.join(DATA_DIR, "blobs"))
+    BLOB_GC_GRACE = int(os.getenv("BLOB_GC_GRACE", 3600))
+
+    # Media URL download cache: largest single download and total size of cached entries (bytes)
+    URL_CACHE_MAX_FILE_BYTES = int(os.getenv("URL_CACHE_MAX_FILE_BYTES", 500 * 1024 * 1024))
+    URL_CACHE_MAX_BYTES = int(os.getenv("URL_CACHE_MAX_BYTES", 5 * 1024 * 1024 * 1024))
+
+    # Duplicate calls in flight in different worker processes (same TTS line, Pexels query or clip) share one request through this database
+    SINGLE_FLIGHT_DB = os.getenv("SINGLE_FLIGHT_DB", "single_flight.db")
+
+    # Background jobs: queue database, worker processes started with the web app and idle poll interval (seconds)
+    JOB_QUEUE_DB = os.getenv("JOB_QUEUE_DB", "jobs.db")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+    JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", 1))
+
+    # Job progress events: least seconds between partial updates of one step, and how often the SSE stream checks for new ones
+    PROGRESS_MIN_INTERVAL = float(os.getenv("PROGRESS_MIN_INTERVAL", 0.5))
+    PROGRESS_STREAM_INTERVAL = float(os.getenv("PROGRESS_STREAM_INTERVAL", 0.5))
+
+    # Step 3 stage pipeline: worker threads per stage and videos queued between two stages
+    PIPELINE_VOICE_WORKERS = int(os.getenv("PIPELINE_VOICE_WORKERS", 2))
+    PIPELINE_MEDIA_WORKERS = int(os.getenv("PIPELINE_MEDIA_WORKERS", 2))
+    PIPELINE_RENDER_WORKERS = int(os.getenv("PIPELINE_RENDER_WORKERS", 1))
+    PIPELINE_MUSIC_WORKERS = int(os.getenv("PIPELINE_MUSIC_WORKERS", 1))
+    PIPELINE_UPLOAD_WORKERS = int(os.getenv("PIPELINE_UPLOAD_WORKERS", 2))
+    PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", 2))
+
+    # Persistent LLM response cache, opt-in: with it a repeated prompt replays the same script or caption
+    # instead of a fresh random generation. Deterministic mode also pins sampling seeds
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+    LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", "llm_cache.db")
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", 7 * 24 * 3600))
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 20000))
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+    LLM_DETERMINISTIC = os.getenv("LLM_DETERMINISTIC", "0") == "1"
+
+    # Concurrent Pollinations image generation per video
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", 6))
+
+    # Instagram captions are generated concurrently by ScriptDivider
+    CAPTION_WORKERS = int(os.getenv("CAPTION_WORKERS", 8))
+    CAPTION_TIMEOUT = float(os.getenv("CAPTION_TIMEOUT", 90))
+
+    # Retries for Pollinations and Pexels: exponential backoff with jitter, capped attempts and
+    # deadline (seconds); the per-endpoint circuit opens after that many consecutive failures
+    RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", 5))
+    RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", 1))
+    RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", 30))
+    RETRY_DEADLINE = float(os.getenv("RETRY_DEADLINE", 120))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", 5))
+    CIRCUIT_RESET_TIMEOUT = float(os.getenv("CIRCUIT_RESET_TIMEOUT", 30))
     
 
     # Video parameters
@@ -0,0 +1,297 @@
+import asyncio
+import base64
+import os
+import random
+import threading
+import urllib.parse
+from urllib.parse import urlparse
+import aiohttp
+from config import Config
+from modules.footage_downloader import FootageDownloader
+from modules.llm_cache import LLMCache
+from modules.pollinations_utils import PollinationsUtils
+from modules.retry_policy import HTTPStatusError, RetryPolicy
+from modules.blob_store import BlobStore
+from modules.single_flight import SingleFlight
+from modules.url_cache import UrlCache
+
+
+class AsyncProviders():
+    """
+    Asyncio clients for Pollinations, Pexels, Google TTS and the NagaAC catalogue.
+
+    All requests share one aiohttp session per event loop, and each provider has a
+    semaphore capping its requests in flight, so one orchestrator can keep hundreds
+    of calls running for a batch of reels on a single thread. Retries and circuit
+    breaking use the same RetryPolicy endpoints as the synchronous clients, identical
+    Pexels searches and TTS lines in flight at once share one request, and media
+    downloads go through the UrlCache and BlobStore like the synchronous path.
+
+    Synchronous callers use run_sync(), which runs the coroutine on a shared
+    background event loop and blocks only the calling thread.
+    """
+
+    _loop = None
+    _loop_lock = threading.Lock()
+
+    def __init__(self, pollinations_api_key=None, pexels_api_key=None, google_tts_api_key=None):
+        self.pollinations_api_key = pollinations_api_key
+        self.pexels_api_key = pexels_api_key
+        self.google_tts_api_key = google_tts_api_key
+        self.retry_policy = RetryPolicy.from_config()
+        self.llm_cache = LLMCache.shared()
+        self.concurrency = {
+            "pollinations": Config.ASYNC_POLLINATIONS_CONCURRENCY,
+            "pexels": Config.ASYNC_PEXELS_CONCURRENCY,
+            "google_tts": Config.ASYNC_GOOGLE_TTS_CONCURRENCY,
+            "nagaac": Config.ASYNC_NAGAAC_CONCURRENCY,
+        }
+        # Sessions and semaphores belong to the loop they were created in
+        self._per_loop = {}
+
+    @classmethod
+    def from_config(cls):
+        return cls(Config.POLLINATIONS_API_KEY, Config.PEXELS_API_KEY, Config.GOOGLE_TTS_API_KEY)
+
+    def _state(self):
+        loop = asyncio.get_running_loop()
+        state = self._per_loop.get(loop)
+        if state is None:
+            connector = aiohttp.TCPConnector(limit=Config.ASYNC_MAX_CONNECTIONS, limit_per_host=Config.ASYNC_MAX_CONNECTIONS_PER_HOST, ttl_dns_cache=300)
+            timeout = aiohttp.ClientTimeout(total=None, connect=Config.HTTP_CONNECT_TIMEOUT, sock_read=Config.HTTP_READ_TIMEOUT)
+            state = {
+                "session": aiohttp.ClientSession(connector=connector, timeout=timeout, auto_decompress=True),
+                "semaphores": {provider: asyncio.Semaphore(limit) for provider, limit in self.concurrency.items()},
+                "inflight": {},
+            }
+            self._per_loop[loop] = state
+        return state
+
+    async def close(self):
+        state = self._per_loop.pop(asyncio.get_running_loop(), None)
+        if state:
+            await state["session"].close()
+
+    async def _shared(self, key, func, group):
+        """
+        Awaits func(), sharing one call between coroutines asking for the same key at
+        once, and with other processes through the shared SingleFlight group.
+        """
+        inflight = self._state()["inflight"]
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(SingleFlight.group(group, shared=True).ado(key, func))
+            inflight[key] = task
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+        # A cancelled waiter must not cancel the call the others are waiting for
+        return await asyncio.shield(task)
+
+    async def _request(self, provider, endpoint, method, url, read_timeout=None, max_attempts=None, deadline=None, response_type="bytes", **kwargs):
+        """Runs one request under the provider's semaphore and the endpoint's retry policy."""
+        state = self._state()
+        if read_timeout:
+            # Passing timeout=None would disable the session timeouts, so only override when asked
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=None, connect=Config.HTTP_CONNECT_TIMEOUT, sock_read=read_timeout)
+
+        async def attempt():
+            async with state["semaphores"][provider]:
+                async with state["session"].request(method, url, **kwargs) as response:
+                    if response.status != 200:
+                        raise HTTPStatusError(response.status, f"{endpoint} request failed with status code {response.status}")
+                    if response_type == "json":
+                        return await response.json(content_type=None)
+                    if response_type == "text":
+                        return await response.text()
+                    return await response.read()
+
+        return await self.retry_policy.acall(attempt, endpoint, deadline=deadline, max_attempts=max_attempts)
+
+    # --- Pollinations ---
+
+    async def generate_text(self, prompt, system_prompt='', timeout=None, use_cache=True):
+        key = LLMCache.make_key("pollinations", "openai", prompt, system_prompt)
+        if use_cache:
+            cached = await asyncio.to_thread(self.llm_cache.get, key)
+            if cached is not None:
+                return cached
+        data = {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "model": "openai",
+            "seed": LLMCache.seed_for(key) if self.llm_cache.deterministic else random.randint(1, 999999999),
+            "jsonMode": False,
+            "private": True,
+            "stream": False
+        }
+        try:
+            text = await self._request("pollinations", "pollinations-text", "POST", "https://text.pollinations.ai",
+                                       read_timeout=timeout or Config.LLM_READ_TIMEOUT, deadline=timeout, response_type="text", json=data)
+        except Exception as e:
+            print(f"Text generation failed: {e}")
+            return None
+        await asyncio.to_thread(self.llm_cache.set, key, text, "pollinations", "openai")
+        return text
+
+    async def generate_image(self, prompt, save_path, width=1080, height=1920, infinite_try=True):
+        params = {
+            "safe": "true",
+            "seed": random.randint(1, 999999999),
+            "width": width,
+            "height": height,
+            "nologo": "true",
+            "private": "true",
+            "model": "flux",
+            "enhance": "true",
+            "referrer": "pollinations.py"
+        }
+        url = f"https://image.pollinations.ai/prompt/{urllib.parse.quote(prompt)}"
+        try:
+            content = await self._request("pollinations", "pollinations-image", "GET", url, read_timeout=60,
+                                          max_attempts=None if infinite_try else 1, params=params)
+        except Exception as e:
+            print(f"Image generation failed: {e}")
+            return None
+        return await asyncio.to_thread(BlobStore.shared().store_unique, content, save_path, "img", ".png")
+
+    async def generate_audio(self, prompt, save_path, infinite_try=True, voice="nova"):
+        data = {
+            "model": "openai-audio",
+            "modalities": ["text", "audio"],
+            "audio": {"voice": voice, "format": "mp3"},
+            "messages": [
+                {"role": "system", "content": PollinationsUtils.TTS_SYSTEM_MESSAGE},
+                {"role": "user", "content": prompt},
+            ],
+        }
+        headers = {"Authorization": f"Bearer {self.pollinations_api_key}"} if self.pollinations_api_key else {}
+        try:
+            response = await self._request("pollinations", "pollinations-audio", "POST", "https://text.pollinations.ai/openai/chat/completions",
+                                           read_timeout=Config.LLM_READ_TIMEOUT, max_attempts=None if infinite_try else 1,
+                                           response_type="json", json=data, headers=headers)
+            audio = base64.b64decode(response["choices"][0]["message"]["audio"]["data"])
+        except Exception as e:
+            print(f"Audio generation failed: {e}")
+            return None
+        return await asyncio.to_thread(BlobStore.write_unique, audio, save_path, "audio", ".mp3")
+
+    # --- Pexels ---
+
+    async def search(self, query, mode='video', page=1, per_page=10, orientation=None):
+        endpoint = 'https://api.pexels.com/v1/search' if mode == 'photo' else 'https://api.pexels.com/videos/search'
+        # aiohttp rejects None query values
+        params = {k: v for k, v in {'query': query, 'page': page, 'per_page': per_page, 'orientation': orientation}.items() if v is not None}
+        try:
+            return await self._shared((self.pexels_api_key, endpoint, tuple(sorted(params.items()))), lambda: self._request(
+                "pexels", "pexels-api", "GET", endpoint, response_type="json", params=params, headers={'Authorization': self.pexels_api_key}), "pexels-search")
+        except Exception as e:
+            print(f"Pexels request failed: {e}")
+            return None
+
+    async def download_file(self, url, folder_path, filename=None):
+        """
+        Downloads url through the UrlCache into folder_path, returning the linked file
+        path (or None on failure). The cache revalidates, coalesces and stores the file
+        once in the BlobStore, exactly as for synchronous callers; it runs in the
+        default executor under the provider semaphore, which bounds the threads used.
+        """
+        filename = filename or os.path.basename(urlparse(url).path) or "downloaded_media"
+        try:
+            async with self._state()["semaphores"]["pexels"]:
+                file_path = await asyncio.to_thread(UrlCache.shared().download, url, folder_path, filename)
+        except Exception as e:
+            print(f'Error downloading file: {e}')
+            return None
+        print(f'File downloaded and saved: {file_path}')
+        return file_path
+
+    async def fetch_footage(self, query, folder_path, mode='video', pages=1, orientation=None, photo_quality='original', video_quality='original'):
+        """Async counterpart of FootageDownloader.execute: search one random page and download the first hit."""
+        results = await self.search(query, mode, random.randint(1, pages), 1, orientation)
+        for item in (results or {}).get(mode + 's', []):
+            if mode == 'photo':
+                download_url = FootageDownloader._choose_image_quality(item, photo_quality, Config.VIDEO_WIDTH, Config.VIDEO_HEIGHT)
+            else:
+                download_url = FootageDownloader._choose_video_quality(item, video_quality, Config.VIDEO_WIDTH, Config.VIDEO_HEIGHT)
+            if download_url:
+                return await self.download_file(download_url, folder_path)
+        return None
+
+    # --- Google TTS ---
+
+    async def google_tts(self, text, output_path, voice_name="en-US-Neural2-F", speaking_rate=15.0):
+        url = f"https://texttospeech.googleapis.com/v1/text:synthesize?key={self.google_tts_api_key}"
+        data = {
+            "input": {"text": text},
+            "voice": {"languageCode": "en-US", "name": voice_name},
+            "audioConfig": {"audioEncoding": "MP3", "speakingRate": speaking_rate}
+        }
+        try:
+            # The same line requested by several scenes at once is synthesized once
+            response_data = await self._shared((text, voice_name, speaking_rate), lambda: self._request(
+                "google_tts", "google-tts", "POST", url, response_type="json", json=data), "google-tts")
+        except Exception as e:
+            print(f"Google TTS Request Failed: {e}")
+            return False
+        if 'audioContent' not in response_data:
+            print(f"Google TTS Error: {response_data}")
+            return False
+        audio_content = base64.b64decode(response_data['audioContent'])
+        await asyncio.to_thread(self._write, output_path, audio_content)
+        return True
+
+    # --- NagaAC ---
+
+    async def nagaac_request(self, url, headers):
+        """Conditional GET used by NagaACCatalogue.get_async; returns (status, headers, json or None)."""
+        state = self._state()
+
+        async def attempt():
+            async with state["semaphores"]["nagaac"]:
+                async with state["session"].get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=None, connect=Config.HTTP_CONNECT_TIMEOUT, sock_read=10)) as response:
+                    if response.status == 429 or response.status >= 500:
+                        raise HTTPStatusError(response.status, f"nagaac-catalogue request failed with status code {response.status}")
+                    data = await response.json(content_type=None) if response.status == 200 else None
+                    return response.status, dict(response.headers), data
+
+        # A 304 or other client status is an answer for the catalogue, not a failure to retry
+        return await self.retry_policy.acall(attempt, "nagaac-catalogue")
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _write(path, content):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    @classmethod
+    def _background_loop(cls):
+        with cls._loop_lock:
+            if cls._loop is None:
+                cls._loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._loop.run_forever, name="async-providers", daemon=True).start()
+            return cls._loop
+
+    def run_sync(self, coro):
+        """Runs a coroutine of this class on the shared background loop and waits for its result."""
+        return asyncio.run_coroutine_threadsafe(coro, self._background_loop()).result()
+
+    def generate_text_sync(self, *args, **kwargs):
+        return self.run_sync(self.generate_text(*args, **kwargs))
+
+    def generate_image_sync(self, *args, **kwargs):
+        return self.run_sync(self.generate_image(*args, **kwargs))
+
+    def generate_audio_sync(self, *args, **kwargs):
+        return self.run_sync(self.generate_audio(*args, **kwargs))
+
+    def download_file_sync(self, *args, **kwargs):
+        return self.run_sync(self.download_file(*args, **kwargs))
+
+    def fetch_footage_sync(self, *args, **kwargs):
+        return self.run_sync(self.fetch_footage(*args, **kwargs))
+
+    def google_tts_sync(self, *args, **kwargs):
+        return self.run_sync(self.google_tts(*args, **kwargs))
@@ -4,6 +4,7 @@ import os
 import random
 import math
 import time # For unique temp audio filenames
+import threading
 from moviepy.editor import (VideoFileClip, AudioFileClip,
                             concatenate_audioclips, CompositeAudioClip)
 from modules.base_generator import BaseGenerator # Assuming this path is correct
@@ -223,7 +224,8 @@ class BackgroundAudioGenerator(BaseGenerator):
             # effectively removing any audio, which is correct if no tracks were found.
 
             # --- 9. Write Output File ---
-            temp_audio_filename = f"temp-audio-bg-{int(time.time())}.m4a"
+            # Process and thread in the name: pipeline workers may mix several videos in the same second
+            temp_audio_filename = f"temp-audio-bg-{int(time.time())}-{os.getpid()}-{threading.get_ident()}.m4a"
             print(f"BackgroundAudioGenerator: Writing final video to: {output_file_path} (using {temp_audio_filename})")
             final_clip.write_videofile(
                 output_file_path,
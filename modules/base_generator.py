@@ -2,13 +2,17 @@ import csv
 import os
 import re
 import json
+from modules.project_store import ProjectStore
 
 class BaseGenerator:
 
     SCRIPT_FILE_NAME = 'script.csv'
     SCRIPT_VIDEOS_FILE_NAME = 'script_videos.json'
+    SCRIPT_VIDEOS_JSONL_FILE_NAME = 'script_videos.jsonl'
+    SCRIPT_VIDEOS_INDEX_FILE_NAME = 'script_videos.index'
     IMAGE_PROMPTS_FILE_NAME = 'image_prompts.json'
     IMAGE_PATHS_FILE_NAME = 'image_paths.json'
+    PROJECT_DB_FILE_NAME = ProjectStore.FILE_NAME
 
     def __init__(self, project_folder):
         # Forming paths to the project directories
@@ -20,8 +24,11 @@ class BaseGenerator:
         self.downloaded_videos = os.path.join(self.project_folder, 'downloaded_videos')
         self.script_file_path = os.path.join(self.project_folder, self.SCRIPT_FILE_NAME)
         self.script_videos_file_path = os.path.join(self.project_folder, self.SCRIPT_VIDEOS_FILE_NAME)
+        self.script_videos_jsonl_file_path = os.path.join(self.project_folder, self.SCRIPT_VIDEOS_JSONL_FILE_NAME)
+        self.script_videos_index_file_path = os.path.join(self.project_folder, self.SCRIPT_VIDEOS_INDEX_FILE_NAME)
         self.image_prompts_file_path = os.path.join(self.project_folder, self.IMAGE_PROMPTS_FILE_NAME)
         self.image_paths_file_path = os.path.join(self.project_folder, self.IMAGE_PATHS_FILE_NAME)
+        self.project_db_file_path = os.path.join(self.project_folder, self.PROJECT_DB_FILE_NAME)
         self.bg_music_directory = os.path.join("data", "bg_music")
         self.fonts_folder = 'fonts'
 
@@ -33,6 +40,15 @@ class BaseGenerator:
         os.makedirs(self.fonts_folder, exist_ok=True)
         
 
+    @property
+    def store(self):
+        """The project's metadata store; JSON files of an existing project are imported on first use."""
+        new = not os.path.exists(self.project_db_file_path)
+        store = ProjectStore.shared(self.project_db_file_path)
+        if new and store.is_empty():
+            store.import_json(self.script_videos_file_path, self.image_paths_file_path)
+        return store
+
     def read_csv(self, file_path):
         # Logic for reading a CSV file
         with open(file_path, mode='r', encoding='utf-8') as file:
@@ -0,0 +1,240 @@
+import fcntl
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from config import Config
+
+
+class BlobStore():
+    """
+    Content-addressed file store shared by all projects.
+
+    Every file is stored once under its SHA-256, sharded as <root>/ab/cd/<digest>,
+    and written through a temp file and os.replace so a blob is either complete or
+    absent. Project folders get a reflink (copy-on-write clone) of the blob where the
+    filesystem supports it, a hardlink otherwise, and a plain copy as the last resort.
+    Each linked path is recorded in blobs.db; gc() forgets references whose project
+    files are gone and deletes blobs nobody references any more.
+
+    Blobs are read-only and a hardlink shares the blob's inode, so linked files must
+    never be rewritten in place. Files that are edited in place later (voiceovers
+    that get enhanced, images cropped in place) are linked with writable=True, which
+    never hardlinks and falls back to a copy.
+    """
+
+    # ioctl request of Linux's FICLONE (reflink on btrfs, xfs and similar)
+    FICLONE = 0x40049409
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, root="data/blobs"):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.db_name = os.path.join(root, "blobs.db")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self.init_create_db()
+
+    @classmethod
+    def shared(cls):
+        with cls._instances_lock:
+            if "default" not in cls._instances:
+                cls._instances["default"] = cls(Config.BLOB_STORE_DIR)
+            return cls._instances["default"]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_create_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS blobs (
+            digest TEXT PRIMARY KEY,
+            size INTEGER,
+            created_at REAL
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS blob_refs (
+            path TEXT PRIMARY KEY,
+            digest TEXT,
+            linked_at REAL
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS blob_refs_digest ON blob_refs (digest)')
+        conn.commit()
+        conn.close()
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:4], digest)
+
+    def has(self, digest):
+        return os.path.exists(self.blob_path(digest))
+
+    # --- Writing blobs ---
+
+    def _commit_tmp(self, tmp_path, digest, size):
+        path = self.blob_path(digest)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.chmod(tmp_path, 0o444)
+            os.replace(tmp_path, path)
+        conn = self._connect()
+        with conn:
+            # Refreshing created_at keeps a blob that is about to be linked out of gc's grace window
+            conn.execute('''INSERT INTO blobs (digest, size, created_at) VALUES (?, ?, ?)
+                            ON CONFLICT (digest) DO UPDATE SET created_at = excluded.created_at''', (digest, size, time.time()))
+        conn.close()
+        return digest
+
+    def put_chunks(self, chunks):
+        """Stores an iterable of byte chunks and returns its digest."""
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in chunks:
+                    sha256.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return self._commit_tmp(tmp_path, sha256.hexdigest(), size)
+
+    def put_bytes(self, data):
+        return self.put_chunks([data])
+
+    def put_file(self, src_path, chunk_size=1024 * 1024):
+        with open(src_path, 'rb') as f:
+            return self.put_chunks(iter(lambda: f.read(chunk_size), b''))
+
+    def put_moved(self, src_path, chunk_size=1024 * 1024):
+        """Moves src_path (a file under tmp_dir) into the store without copying it and returns its digest."""
+        sha256 = hashlib.sha256()
+        size = 0
+        with open(src_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                sha256.update(chunk)
+                size += len(chunk)
+        return self._commit_tmp(src_path, sha256.hexdigest(), size)
+
+    # --- Linking into projects ---
+
+    def _clone(self, src, dst, writable):
+        try:
+            with open(src, 'rb') as s, open(dst, 'wb') as d:
+                fcntl.ioctl(d.fileno(), self.FICLONE, s.fileno())
+            return
+        except OSError:
+            if os.path.exists(dst):
+                os.remove(dst)
+        if not writable:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        shutil.copyfile(src, dst)
+
+    def link(self, digest, dest_path, writable=False):
+        """
+        Places the blob at dest_path (atomically replacing any file there) and records
+        the reference. Pass writable=True for files that are later rewritten in place.
+        """
+        os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+        tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        self._clone(self.blob_path(digest), tmp_path, writable)
+        os.replace(tmp_path, dest_path)
+        conn = self._connect()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO blob_refs (path, digest, linked_at) VALUES (?, ?, ?)',
+                         (os.path.abspath(dest_path), digest, time.time()))
+        conn.close()
+        return dest_path
+
+    def import_file(self, src_path, dest_path):
+        """Stores src_path and links it to dest_path (instead of shutil.copy)."""
+        return self.link(self.put_file(src_path), dest_path)
+
+    def adopt(self, path):
+        """Moves an existing project file into the store, leaving a link in its place."""
+        return self.link(self.put_file(path), path)
+
+    def store_bytes(self, data, dest_path):
+        return self.link(self.put_bytes(data), dest_path)
+
+    @staticmethod
+    def write_unique(data, folder, prefix, extension):
+        """
+        Writes data to <folder>/<prefix>_<hash><extension> through a temp file, without
+        linking it to the store. For outputs that are rewritten in place later.
+        """
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{prefix}_{hashlib.sha256(data).hexdigest()[:16]}{extension}")
+        fd, tmp_path = tempfile.mkstemp(dir=folder)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def store_unique(self, data, folder, prefix, extension):
+        """Stores data and links it as <folder>/<prefix>_<hash><extension>."""
+        digest = self.put_bytes(data)
+        return self.link(digest, os.path.join(folder, f"{prefix}_{digest[:16]}{extension}"))
+
+    def release(self, path):
+        """Deletes a linked project file and drops its reference."""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM blob_refs WHERE path = ?', (os.path.abspath(path),))
+        conn.close()
+        if os.path.exists(path):
+            os.remove(path)
+
+    # --- Garbage collection ---
+
+    def refcounts(self):
+        conn = self._connect()
+        rows = conn.execute('''SELECT b.digest, COUNT(r.path) FROM blobs b LEFT JOIN blob_refs r ON r.digest = b.digest
+                               GROUP BY b.digest''').fetchall()
+        conn.close()
+        return dict(rows)
+
+    def gc(self, grace=None):
+        """
+        Drops references to project files that were deleted, then deletes blobs with
+        no references that are older than grace seconds. Returns the bytes freed.
+        """
+        grace = Config.BLOB_GC_GRACE if grace is None else grace
+        conn = self._connect()
+        stale = [path for path, in conn.execute('SELECT path FROM blob_refs').fetchall() if not os.path.exists(path)]
+        with conn:
+            conn.executemany('DELETE FROM blob_refs WHERE path = ?', [(path,) for path in stale])
+        unreferenced = conn.execute('''SELECT digest, size FROM blobs
+                                       WHERE created_at < ? AND digest NOT IN (SELECT digest FROM blob_refs)''',
+                                    (time.time() - grace,)).fetchall()
+        freed = 0
+        for digest, size in unreferenced:
+            path = self.blob_path(digest)
+            if os.path.exists(path):
+                os.chmod(path, 0o644)
+                os.remove(path)
+                freed += size
+            with conn:
+                conn.execute('DELETE FROM blobs WHERE digest = ? AND digest NOT IN (SELECT digest FROM blob_refs)', (digest,))
+        conn.close()
+        return freed
+
+    def stats(self):
+        conn = self._connect()
+        blobs, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM blobs').fetchone()
+        refs = conn.execute('SELECT COUNT(*) FROM blob_refs').fetchone()[0]
+        conn.close()
+        return {"blobs": blobs, "bytes": size, "references": refs}
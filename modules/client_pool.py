@@ -0,0 +1,56 @@
+import threading
+from config import Config
+
+
+class ClientPool():
+    """
+    Long-lived API clients, one per provider and credentials in each process.
+
+    Clients are created lazily on first use and then shared by every thread, so
+    keep-alive connections (and their TLS sessions) are reused across calls instead
+    of being set up again for every caption, structure or TTS request. The Gemini
+    and OpenAI clients are both safe to share between threads. Plain HTTP calls go
+    through HttpTransport instead.
+    """
+
+    _clients = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get(cls, key, factory):
+        client = cls._clients.get(key)
+        if client is None:
+            with cls._lock:
+                client = cls._clients.get(key)
+                if client is None:
+                    client = factory()
+                    cls._clients[key] = client
+        return client
+
+    @classmethod
+    def gemini(cls, api_key):
+        def factory():
+            from google import genai
+            from google.genai import types
+            return genai.Client(
+                api_key=api_key,
+                http_options=types.HttpOptions(timeout=int(Config.LLM_READ_TIMEOUT * 1000)),
+            )
+        return cls._get(("gemini", api_key), factory)
+
+    @classmethod
+    def openai(cls, api_key, base_url):
+        def factory():
+            import httpx
+            from openai import OpenAI
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(Config.LLM_READ_TIMEOUT, connect=Config.LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(max_connections=Config.LLM_POOL_SIZE, max_keepalive_connections=Config.LLM_POOL_SIZE),
+            )
+            return OpenAI(api_key=api_key, base_url=base_url, http_client=http_client)
+        return cls._get(("openai", api_key, base_url), factory)
+
+    @staticmethod
+    def timeout(read_timeout=None):
+        """(connect, read) timeout tuple for requests calls."""
+        return (Config.LLM_CONNECT_TIMEOUT, read_timeout or Config.LLM_READ_TIMEOUT)
@@ -0,0 +1,108 @@
+import asyncio
+import sqlite3
+import time
+
+
+class CooldownScheduler():
+    """
+    Model cooldowns shared between worker processes.
+
+    State lives in a SQLite database in WAL mode, so readers never block and every
+    read-modify-write runs inside a BEGIN IMMEDIATE transaction. Instead of sleeping,
+    callers ask when the next model becomes available or await wait_for_model().
+    """
+
+    def __init__(self, db_name="model_cooldowns.db", namespace="default"):
+        self.db_name = db_name
+        self.namespace = namespace
+        self.init_create_db()
+
+    def _connect(self):
+        # isolation_level=None so transactions are controlled explicitly below
+        conn = sqlite3.connect(self.db_name, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_create_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS model_cooldowns (
+            namespace TEXT,
+            model_id TEXT,
+            flagged_at REAL,
+            cooldown_until REAL,
+            PRIMARY KEY (namespace, model_id)
+        )''')
+        conn.close()
+
+    def flag(self, model, seconds, only_if_available=False):
+        """
+        Puts the model into cooldown for the given seconds. With only_if_available the
+        model is only flagged if it is not cooling down already. Returns True if flagged.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT cooldown_until FROM model_cooldowns WHERE namespace = ? AND model_id = ?',
+                               (self.namespace, model)).fetchone()
+            if only_if_available and row and row[0] > now:
+                conn.execute('COMMIT')
+                return False
+            until = now + seconds if only_if_available or not row else max(row[0], now + seconds)
+            conn.execute('''INSERT INTO model_cooldowns (namespace, model_id, flagged_at, cooldown_until)
+                            VALUES (?, ?, ?, ?)
+                            ON CONFLICT(namespace, model_id) DO UPDATE SET
+                                flagged_at = excluded.flagged_at,
+                                cooldown_until = excluded.cooldown_until''',
+                         (self.namespace, model, now, until))
+            conn.execute('COMMIT')
+            return True
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def clear(self, model):
+        conn = self._connect()
+        conn.execute('DELETE FROM model_cooldowns WHERE namespace = ? AND model_id = ?', (self.namespace, model))
+        conn.close()
+
+    def cooldowns(self, models):
+        """Returns {model: {"flagged_at", "cooldown_until"}} for the given models."""
+        conn = self._connect()
+        rows = conn.execute('SELECT model_id, flagged_at, cooldown_until FROM model_cooldowns WHERE namespace = ?',
+                            (self.namespace,)).fetchall()
+        conn.close()
+        state = {model: {"flagged_at": 0, "cooldown_until": 0} for model in models}
+        for model, flagged_at, cooldown_until in rows:
+            if model in state:
+                state[model] = {"flagged_at": flagged_at, "cooldown_until": cooldown_until}
+        return state
+
+    def available(self, models):
+        now = time.time()
+        state = self.cooldowns(models)
+        return [model for model in models if state[model]["cooldown_until"] <= now]
+
+    def next_available_at(self, models):
+        """Returns the unix time at which the first of the models leaves cooldown (now if one is free)."""
+        state = self.cooldowns(models)
+        if not state:
+            return time.time()
+        return max(time.time(), min(entry["cooldown_until"] for entry in state.values()))
+
+    async def wait_for_model(self, models, poll_interval=5):
+        """
+        Awaitable that resolves to the list of available models. It re-reads the
+        shared state every poll_interval seconds, so a cooldown cleared by another
+        worker is noticed early. The SQLite reads run in a thread, so a locked
+        database never stalls the event loop.
+        """
+        while True:
+            available = await asyncio.to_thread(self.available, models)
+            if available:
+                return available
+            delay = await asyncio.to_thread(self.next_available_at, models) - time.time()
+            await asyncio.sleep(min(max(delay, 0), poll_interval))
@@ -1,18 +1,31 @@
-import random
-import uuid
+import hashlib
 from modules.base_generator import BaseGenerator
 import os
 from urllib.parse import urlparse
 import requests
+from modules.retry_policy import HTTPStatusError, RetryPolicy
+from modules.http_transport import HttpTransport
+from modules.ranged_download import RangedDownload
+from modules.pexels_search_cache import PexelsSearchCache
+from modules.blob_store import BlobStore
+from modules.single_flight import SingleFlight
+from config import Config
 
 class FootageDownloader(BaseGenerator):
-    def __init__(self, project_folder, api_key):
+    # Photos are shown with a slow zoom-in, so they need this much more than the frame (VideoGenerator.ZOOM_FACTOR)
+    PHOTO_ZOOM_MARGIN = 1.2
+
+    def __init__(self, project_folder, api_key, target_width=Config.VIDEO_WIDTH, target_height=Config.VIDEO_HEIGHT):
         # Call the constructor of the base class
         super().__init__(project_folder)
         self.api_key = api_key
+        self.target_width = target_width
+        self.target_height = target_height
         self.results_folder = 'results'
         self.images_folder = self.downloaded_images
         self.videos_folder = self.downloaded_videos
+        # The shared cache gets the class-level search and this instance's key per pick
+        self.search_cache = PexelsSearchCache.shared(FootageDownloader.search_with_key)
 
     def read_script_videos_json(self):
         return self.read_json(self.script_videos_file_path)
@@ -21,100 +34,140 @@ class FootageDownloader(BaseGenerator):
         return self.read_json(self.image_paths_file_path)
     
     def update_image_path(self, video_id, scene, image_path, google_image_path):
-        data = self.read_image_paths_json()
-        for video in data:
-            if video["video"] == video_id:
-                for scene_data in video["scenes"]:
-                    if scene_data["scene"] == scene:
-                        scene_data["image_path"] = image_path
-                        scene_data["google_image_path"] = google_image_path
-                        break
-                break
-        self.write_json(self.image_paths_file_path, data)
+        # Single-row update in the project store; image_paths.json is exported from it when needed
+        self.store.set_scene_assets(video_id, scene, image_path=image_path, google_image_path=google_image_path)
 
     def execute(self, query, mode='video', pages=1, per_page=10, orientation=None,
                             photo_quality='original', video_quality='original'):
-        pexels_file_path = ''
-        google_file_path = ''
-        page = random.randint(1, pages)
-        per_page = 1
-        # for page in range(1, pages + 1):
         if mode == 'photo':
-            results = self.search_photos(query, page, per_page, orientation)
             folder_path = self.images_folder
         elif mode == 'video':
-            results = self.search_videos(query, page, per_page, orientation)
             folder_path = self.videos_folder
         else:
             print(f"Invalid mode: {mode}")
             return
 
-        if results:
-            for item in results.get(mode + 's', []):
-                if mode == 'photo':
-                    download_url = self._choose_image_quality(item, photo_quality)
-                else:
-                    download_url = self._choose_video_quality(item, video_quality)
-                if download_url:
-                    return self._download_file(download_url, folder_path)
+        # Served from the cached pool of full result pages instead of one search per scene
+        item = self.search_cache.pick(mode, query, orientation, max_pages=max(pages, Config.PEXELS_MAX_PAGES), api_key=self.api_key)
+        if item:
+            if mode == 'photo':
+                download_url = self._choose_image_quality(item, photo_quality, self.target_width, self.target_height)
+            else:
+                download_url = self._choose_video_quality(item, video_quality, self.target_width, self.target_height)
+            if download_url:
+                return self._download_file(download_url, folder_path)
 
-    @staticmethod
-    def _choose_image_quality(item, quality):
+    @classmethod
+    def _choose_image_quality(cls, item, quality, target_width=None, target_height=None):
+        if quality in ('original', 'auto') and target_width and target_height:
+            return cls._sized_photo_url(item, target_width, target_height)
         if quality in item["src"]:
             return item["src"][quality]
         else:
             print(f"Chosen image quality '{quality}' not available. Downloading original.")
             return item["src"]["original"]
 
-    @staticmethod
-    def _choose_video_quality(item, quality):
-        if quality:
-            if quality == 'original':
-                return item['video_files'][0]['link']
+    @classmethod
+    def _sized_photo_url(cls, item, target_width, target_height):
+        """
+        Pexels resizes on request: the original URL with w/h/fit=crop returns a
+        centre crop at exactly that size, so only the frame plus zoom margin is sent.
+        """
+        width = int(target_width * cls.PHOTO_ZOOM_MARGIN)
+        height = int(target_height * cls.PHOTO_ZOOM_MARGIN)
+        if item.get("width") and item.get("height") and (item["width"] < width or item["height"] < height):
+            # Never ask for an upscale; the local resize handles small photos
+            return item["src"]["original"]
+        return item["src"]["original"].split("?")[0] + f"?auto=compress&cs=tinysrgb&fit=crop&w={width}&h={height}"
+
+    @classmethod
+    def _choose_video_quality(cls, item, quality, target_width=None, target_height=None):
+        if quality and quality not in ('original', 'auto'):
             for video in item['video_files']:
                 if video['quality'] == quality:
                     return video['link']
             print(f"Chosen video quality '{quality}' not available. Downloading default.")
+        if target_width and target_height:
+            video = cls._choose_video_rendition(item['video_files'], target_width, target_height)
+            if video:
+                return video['link']
         return item['video_files'][0]['link']
 
-    def search_photos(self, query, page=1, per_page=10, orientation=None):
-        endpoint = 'https://api.pexels.com/v1/search'
+    @staticmethod
+    def _choose_video_rendition(video_files, target_width, target_height, target_fps=30):
+        """
+        Smallest rendition that still covers the target frame, preferring the target
+        orientation and frame rates no higher than target_fps. Falls back to the largest
+        rendition when none is big enough.
+        """
+        portrait = target_height >= target_width
+        renditions = [v for v in video_files if v.get('width') and v.get('height') and v.get('link')]
+        if not renditions:
+            return None
+        matching = [v for v in renditions if (v['height'] >= v['width']) == portrait] or renditions
+        covering = [v for v in matching if v['width'] >= target_width and v['height'] >= target_height]
+        if not covering:
+            return max(matching, key=lambda v: v['width'] * v['height'])
+        return min(covering, key=lambda v: (v['width'] * v['height'], (v.get('fps') or 0) > target_fps + 1, v.get('fps') or 0))
+
+    def search(self, mode, query, orientation=None, page=1, per_page=80):
+        return self.search_with_key(self.api_key, mode, query, orientation, page, per_page)
+
+    @classmethod
+    def search_with_key(cls, api_key, mode, query, orientation=None, page=1, per_page=80):
+        endpoint = 'https://api.pexels.com/v1/search' if mode == 'photo' else 'https://api.pexels.com/videos/search'
         params = {'query': query, 'page': page, 'per_page': per_page, 'orientation': orientation}
-        return self._make_request(endpoint, params)
+        return cls._make_request(api_key, endpoint, params)
+
+    def search_photos(self, query, page=1, per_page=10, orientation=None):
+        return self.search_with_key(self.api_key, 'photo', query, orientation, page, per_page)
 
     def search_videos(self, query, page=1, per_page=10, orientation=None):
-        endpoint = 'https://api.pexels.com/videos/search'
-        params = {'query': query, 'page': page, 'per_page': per_page, 'orientation': orientation}
-        return self._make_request(endpoint, params)
+        return self.search_with_key(self.api_key, 'video', query, orientation, page, per_page)
 
-    def _make_request(self, endpoint, params):
-        headers = {'Authorization': self.api_key}
-        response = requests.get(endpoint, params=params, headers=headers)
+    @staticmethod
+    def _make_request(api_key, endpoint, params):
+        headers = {'Authorization': api_key}
 
-        if response.status_code == 200:
+        def attempt():
+            response = HttpTransport.get(endpoint, params=params, headers=headers, timeout=HttpTransport.default_timeout(30))
+            PexelsSearchCache.shared(FootageDownloader.search_with_key).record_rate_limit(response.headers)
+            if response.status_code != 200:
+                raise HTTPStatusError(response.status_code, f"Request failed with status code {response.status_code}")
             return response.json()
-        else:
-            print(f"Request failed with status code {response.status_code}")
+
+        try:
+            # Identical searches in flight at the same time share one API request
+            key = (api_key, endpoint, tuple(sorted((k, str(v)) for k, v in params.items())))
+            return SingleFlight.group("pexels-api", shared=True).do(key, RetryPolicy.from_config().call, attempt, "pexels-api")
+        except Exception as e:
+            print(f"Pexels request failed: {e}")
             return None
 
     @staticmethod
     def _download_file(url, folder_path):
-        try:
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
-
-            # Extract the filename from the URL using urlparse
-            parsed_url = urlparse(url)
-            filename = os.path.basename(parsed_url.path)
+        # Extract the filename from the URL using urlparse
+        parsed_url = urlparse(url)
+        filename = os.path.basename(parsed_url.path)
 
-            # Save the file in the specified folder
-            file_path = os.path.join(folder_path, str(uuid.uuid4()) + filename)
-            with open(file_path, 'wb') as file:
-                for chunk in response.iter_content(chunk_size=8192):
-                    file.write(chunk)
+        url_hash = hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+        file_path = os.path.join(folder_path, url_hash + filename)
+        def download():
+            blob_store = BlobStore.shared()
+            # Downloaded inside the store (named after the URL so an interrupted download
+            # resumes from its .part file) and moved in, so a clip is written only once
+            tmp_path = os.path.join(blob_store.tmp_dir, url_hash + filename)
+            RangedDownload().download(url, tmp_path)
+            return blob_store.put_moved(tmp_path)
 
+        try:
+            # A clip already being downloaded for another project is waited for, and every
+            # caller links the stored blob by digest without hashing the file again
+            digest = SingleFlight.group("pexels-download", shared=True).do(url, download)
+            BlobStore.shared().link(digest, file_path)
             print(f'File downloaded and saved: {file_path}')
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, OSError) as e:
             print(f'Error downloading file: {e}')
+            return None
 
         return file_path
\ No newline at end of file
@@ -1,77 +1,100 @@
+import asyncio
 import json
 import time
 import os
+from modules.model_router import ModelRouter
+from modules.cooldown_scheduler import CooldownScheduler
 
 class GroqUtils():
-    def __init__(self, api_key, text_model_whitelist=["llama-3.3-70b-versatile", "llama3-70b-8192", "llama3-8b-8192", "llama-3.1-8b-instant"]):
+    FLAG_TIMEOUT = 600  # 10 minutes
+
+    def __init__(self, api_key, text_model_whitelist=["llama-3.3-70b-versatile", "llama3-70b-8192", "llama3-8b-8192", "llama-3.1-8b-instant"], db_name="model_cooldowns.db"):
         self.api_key = api_key
         self.text_model_whitelist = text_model_whitelist
         self.current_model_id = 0
         self.history_file = "model_history.json"
+        self.router = ModelRouter.shared("groq", text_model_whitelist)
+        # Cooldowns are shared with every other worker process through SQLite
+        self.scheduler = CooldownScheduler(db_name=db_name, namespace="groq")
         self._load_history()
-        self.update_current_model_id()
 
 
     def _load_history(self):
-        self.model_history = {}
-        if os.path.exists(self.history_file):
+        # One-off import of flags from the old model_history.json file; flagging only
+        # free models makes a repeated import harmless when several processes start at once
+        try:
             with open(self.history_file, 'r') as f:
-                self.model_history = json.load(f)
+                model_history = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Could not read {self.history_file}: {e}")
+            return
 
+        current_time = time.time()
         for model in self.text_model_whitelist:
-            if model not in self.model_history or not isinstance(self.model_history[model], dict):
-                self.model_history[model] = {"timestamp": 0, "flagged": False}
-            elif not all(k in self.model_history[model] for k in ["timestamp", "flagged"]):
-                self.model_history[model] = {"timestamp": 0, "flagged": False}
+            model_data = model_history.get(model)
+            if isinstance(model_data, dict) and model_data.get("flagged") and current_time - model_data.get("timestamp", 0) < self.FLAG_TIMEOUT:
+                self.scheduler.flag(model, self.FLAG_TIMEOUT - (current_time - model_data["timestamp"]), only_if_available=True)
+        try:
+            os.replace(self.history_file, self.history_file + ".imported")
+        except FileNotFoundError:
+            # Another process imported it first
+            pass
+
+    @property
+    def model_history(self):
+        current_time = time.time()
+        state = self.scheduler.cooldowns(self.text_model_whitelist)
+        return {model: {"timestamp": data["flagged_at"], "flagged": data["cooldown_until"] > current_time}
+                for model, data in state.items()}
 
-    def _save_history(self):
-        with open(self.history_file, 'w') as f:
-            json.dump(self.model_history, f)
-    
     def get_best_model(self):
+        """
+        Returns the available model with the best expected completion time, or None
+        if every model is cooling down. It never sleeps: use next_available_at() to
+        schedule a retry, or await wait_for_model() to get on with other work meanwhile.
+        """
+        available = self.scheduler.available(self.text_model_whitelist)
+        best_model = self.router.best_model(available) if available else None
+        if best_model is not None:
+            self.current_model_id = self.text_model_whitelist.index(best_model)
+        return best_model
+
+    def next_available_at(self):
+        """Unix time at which get_best_model() will next return a model."""
+        available = self.scheduler.available(self.text_model_whitelist)
+        if not available:
+            return self.scheduler.next_available_at(self.text_model_whitelist)
+        # Free in the shared store but possibly backing off locally after errors
+        return max(time.time(), self.router.next_available_at(available))
+
+    async def wait_for_model(self):
+        """Awaitable version of get_best_model() that resolves once a model is free."""
         while True:
-            current_model = self.text_model_whitelist[self.current_model_id]
-            current_time = time.time()
-            
-            # Ensure model data exists and is in the correct format
-            if current_model not in self.model_history or not isinstance(self.model_history[current_model], dict):
-                self.model_history[current_model] = {"timestamp": 0, "flagged": False}
-            
-            # Check if model is in history and unflag it if the timeout period has passed
-            if self.model_history[current_model].get("flagged", True):
-                if current_time - self.model_history[current_model].get("timestamp", 0) >= 600:  # 10 minutes passed
-                    self.model_history[current_model]["flagged"] = False
-                    self._save_history()
+            available = await self.scheduler.wait_for_model(self.text_model_whitelist)
+            best_model = self.router.best_model(available)
+            if best_model is not None:
+                self.current_model_id = self.text_model_whitelist.index(best_model)
+                return best_model
+            await asyncio.sleep(max(0.1, self.router.next_available_at(available) - time.time()))
+
+    def record_success(self, model, latency):
+        self.router.record_success(model, latency)
 
-            # Return current model if it's not flagged or not in history
-            if not self.model_history[current_model].get("flagged", False):
-                return current_model
-            # if self.model_history[current_model]["flagged"]:
-            #     return current_model
-            
+    def record_error(self, model, error, latency=None):
+        self.router.record_error(model, error, latency=latency)
+        if self.router.is_rate_limit_error(error) and model in self.text_model_whitelist:
+            self.current_model_id = self.text_model_whitelist.index(model)
             self.update_current_model_id()
-            # Check if all models are flagged and still within timeout period
-            all_flagged = all(model_data["flagged"] and current_time - model_data["timestamp"] < 600 
-                             for model_data in self.model_history.values())
-            if all_flagged:
-                time.sleep(120)  # Wait 2 minutes if all models are timed out
-            else:
-                # Try next model
-                self.current_model_id = (self.current_model_id + 1) % len(self.text_model_whitelist)
-                
+
     def update_current_model_id(self):
         current_model = self.text_model_whitelist[self.current_model_id]
-        
-        # Check if model exists in history and create structure if needed
-        if current_model not in self.model_history:
-            self.model_history[current_model] = {"timestamp": 0, "flagged": False}
-        
-        current_time = time.time()
-        # Only update timestamp and flag if more than 10 minutes passed or it was not flagged
-        if (current_time - self.model_history[current_model]["timestamp"] >= 600) or not self.model_history[current_model]["flagged"]:
-            self.model_history[current_model]["timestamp"] = current_time
-            self.model_history[current_model]["flagged"] = True
-            self._save_history()
+
+        # Only flag if the model is not cooling down already; the check and the write
+        # happen in one transaction so concurrent workers cannot both flag it
+        if self.scheduler.flag(current_model, self.FLAG_TIMEOUT, only_if_available=True):
+            self.router.set_cooldown(current_model, self.FLAG_TIMEOUT)
         else:
             # Move to next model if current one is flagged and less than 10 minutes passed
             self.current_model_id = (self.current_model_id + 1) % len(self.text_model_whitelist)
@@ -0,0 +1,96 @@
+import threading
+import time
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+
+
+class HttpTransport():
+    """
+    Pooled HTTP transport shared by every outbound request in the process.
+
+    Each host gets its own keep-alive requests.Session, so repeated calls to the
+    same API reuse connections (and TLS sessions) instead of connecting again.
+    Requests get the default (connect, read) timeouts unless the caller passes its
+    own, ask for gzip/deflate bodies (decoded transparently by requests) and are
+    counted per host: requests, errors, bytes received and latency.
+    """
+
+    _sessions = {}
+    _stats = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def host_of(url):
+        return urlparse(url).netloc.lower()
+
+    @classmethod
+    def session_for(cls, url):
+        host = cls.host_of(url)
+        session = cls._sessions.get(host)
+        if session is None:
+            with cls._lock:
+                session = cls._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=Config.HTTP_POOL_SIZE)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers["Accept-Encoding"] = "gzip, deflate"
+                    cls._sessions[host] = session
+        return session
+
+    @staticmethod
+    def default_timeout(read_timeout=None):
+        """(connect, read) timeout tuple, read_timeout overriding the configured default."""
+        return (Config.HTTP_CONNECT_TIMEOUT, read_timeout or Config.HTTP_READ_TIMEOUT)
+
+    @classmethod
+    def request(cls, method, url, timeout=None, **kwargs):
+        host = cls.host_of(url)
+        start = time.time()
+        try:
+            response = cls.session_for(url).request(method, url, timeout=timeout or cls.default_timeout(), **kwargs)
+        except requests.RequestException:
+            cls._record(host, time.time() - start, 0, error=True)
+            raise
+        if kwargs.get("stream"):
+            # The body is read later by the caller; count what the server announced
+            size = int(response.headers.get("Content-Length") or 0)
+        else:
+            size = len(response.content)
+        cls._record(host, time.time() - start, size, error=response.status_code >= 400)
+        return response
+
+    @classmethod
+    def get(cls, url, **kwargs):
+        return cls.request("GET", url, **kwargs)
+
+    @classmethod
+    def post(cls, url, **kwargs):
+        return cls.request("POST", url, **kwargs)
+
+    @classmethod
+    def _record(cls, host, latency, size, error=False):
+        with cls._lock:
+            stats = cls._stats.setdefault(host, {"requests": 0, "errors": 0, "bytes": 0, "latency": 0.0, "max_latency": 0.0})
+            stats["requests"] += 1
+            stats["errors"] += int(error)
+            stats["bytes"] += size
+            stats["latency"] += latency
+            stats["max_latency"] = max(stats["max_latency"], latency)
+
+    @classmethod
+    def stats(cls):
+        with cls._lock:
+            return {
+                host: {
+                    "requests": stats["requests"],
+                    "errors": stats["errors"],
+                    "bytes": stats["bytes"],
+                    "avg_latency": stats["latency"] / stats["requests"] if stats["requests"] else 0.0,
+                    "max_latency": stats["max_latency"],
+                }
+                for host, stats in cls._stats.items()
+            }
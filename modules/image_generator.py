@@ -1,4 +1,5 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 import random
 import time
@@ -9,6 +10,9 @@ from PIL import Image
 import requests
 from modules.base_generator import BaseGenerator
 from modules.pollinations_utils import PollinationsUtils
+from modules.retry_policy import HTTPStatusError, RetryPolicy
+from modules.http_transport import HttpTransport
+from config import Config
 
 
 class ImageGenerator(BaseGenerator):
@@ -27,14 +31,56 @@ class ImageGenerator(BaseGenerator):
         return self.read_json(self.script_videos_file_path)
     
     def write_json_data(self):
-        json_data = [{"video": video_id, **video_data} for video_id, video_data in self.videos.items()]
-        self.write_json(self.image_paths_file_path, json_data)
+        # The scenes are already in the project store; this only refreshes the JSON copy
+        self.store.export_image_paths(self.image_paths_file_path)
 
     def execute(self, video_id, scene, prompt, generation_chance=0.3):
+        scene_data = self.generate_scene_image(video_id, scene, prompt, random.random() <= generation_chance)
+        self.store.set_scene_assets(video_id, scene, image_path=scene_data["image_path"], google_image_path=scene_data["google_image_path"])
+        if "scenes" not in self.videos[video_id]:
+            self.videos[video_id]["scenes"] = []
+        self.videos[video_id]["scenes"].append(scene_data)
+
+    def execute_batch(self, video_id, scenes, generation_chance=0.3, max_workers=None, on_image_ready=None):
+        """
+        Generates the images of all scenes of a video at once with bounded concurrency.
+
+        scenes is a list of (scene, prompt) pairs. on_image_ready(scene_data) is called
+        as soon as each image is done, so rendering can start on finished scenes. The
+        results go to the project store as they finish and image_paths.json is written once at the end.
+
+        This is for callers that know every scene of a video up front. ScenePipeline
+        gets scenes one at a time from the script stream, so its media workers call
+        execute() per scene and get their concurrency from the worker count instead.
+        """
+        # Decide up front, in scene order, which scenes get a generated image
+        planned = [(scene, prompt, random.random() <= generation_chance) for scene, prompt in scenes]
+        results = {}
+        with ThreadPoolExecutor(max_workers=max_workers or Config.IMAGE_WORKERS) as pool:
+            futures = {pool.submit(self.generate_scene_image, video_id, scene, prompt, generate): scene
+                       for scene, prompt, generate in planned}
+            for future in as_completed(futures):
+                scene = futures[future]
+                try:
+                    scene_data = future.result()
+                except Exception as e:
+                    print(f"Image generation failed for scene {scene}: {e}")
+                    scene_data = {"scene": scene, "image_path": "", "google_image_path": ""}
+                results[scene] = scene_data
+                self.store.set_scene_assets(video_id, scene, image_path=scene_data["image_path"], google_image_path=scene_data["google_image_path"])
+                if on_image_ready:
+                    on_image_ready(scene_data)
+
+        if "scenes" not in self.videos[video_id]:
+            self.videos[video_id]["scenes"] = []
+        self.videos[video_id]["scenes"].extend(results[scene] for scene, _, _ in planned)
+        self.write_json_data()
+        return self.videos[video_id]["scenes"]
+
+    def generate_scene_image(self, video_id, scene, prompt, generate=True):
         save_path = os.path.join(self.generated_images, str(video_id), self.remove_symbols(scene))
         os.makedirs(save_path, exist_ok=True)
-        if random.random() <= generation_chance:
-            self.pollinations_utils = PollinationsUtils()
+        if generate:
             image_path = self.pollinations_utils.generate_image(prompt, save_path, self.width, self.height, False)
             if image_path == None:
                 image_path = ""
@@ -43,14 +89,11 @@ class ImageGenerator(BaseGenerator):
         else:
             image_path = ""
 
-        scene_data = { 
+        return { 
             "scene": scene, 
             "image_path": image_path,
             "google_image_path": ""
         } 
-        if "scenes" not in self.videos[video_id]:
-            self.videos[video_id]["scenes"] = []
-        self.videos[video_id]["scenes"].append(scene_data)
 
 
     def generate_images_pollynation_ai_legacy(self, prompt, save_path):
@@ -59,46 +102,44 @@ class ImageGenerator(BaseGenerator):
         formatted_prompt = prompt.replace(" ", "-")
         url = f"https://image.pollinations.ai/prompt/{formatted_prompt}"
 
-        while True:
-            try:
-                # Make the request to the API
-                response = requests.get(url)
-                if response.status_code == 200:
-                    # Wait for the image to be generated
-                    # time.sleep(10)  # Adjust the sleep time as needed
-
-                    # Save the image
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    image_save_name = f"img_{timestamp}.png"
-                    image_save_path = os.path.join(save_path, image_save_name)
-                    os.makedirs(os.path.dirname(image_save_path), exist_ok=True)
-                    with open(image_save_path, 'wb') as f:
-                        f.write(response.content)
-                    # Open the saved image
-                    image = Image.open(image_save_path)
-
-                    # Crop 50 pixels from the bottom
-                    image = image.crop((0, 0, image.width, image.height - 48))
-
-                    # Calculate the new dimensions for cropping
-                    width, height = image.size
-                    # crop_height = int((width - 170) * 1.2)
-
-                    # Crop the image to the new dimensions
-                    left = 0
-                    top = 0
-                    right = width
-                    bottom = height - 100
-                    cropped_image = image.crop((left, top, right, bottom))
-
-                    # Save the cropped image
-                    cropped_image.save(image_save_path)
-                    return image_save_path
-                else:
-                    print(f"Failed to generate image. Status code: {response.status_code}. Retrying...")
-            except requests.RequestException as e:
-                print(f"Request failed: {e}. Retrying...")
-            time.sleep(5)  # Wait for 5 seconds before retrying
+        def attempt():
+            response = HttpTransport.get(url, timeout=HttpTransport.default_timeout(60))
+            if response.status_code != 200:
+                raise HTTPStatusError(response.status_code, f"Failed to generate image. Status code: {response.status_code}")
+            return response.content
+
+        try:
+            content = RetryPolicy.from_config().call(attempt, "pollinations-image")
+        except Exception as e:
+            print(f"Image generation failed: {e}")
+            return None
+
+        # Save the image (a unique name, it is cropped in place below)
+        image_save_name = f"img_{uuid.uuid4().hex}.png"
+        image_save_path = os.path.join(save_path, image_save_name)
+        os.makedirs(os.path.dirname(image_save_path), exist_ok=True)
+        with open(image_save_path, 'wb') as f:
+            f.write(content)
+        # Open the saved image
+        image = Image.open(image_save_path)
+
+        # Crop 50 pixels from the bottom
+        image = image.crop((0, 0, image.width, image.height - 48))
+
+        # Calculate the new dimensions for cropping
+        width, height = image.size
+        # crop_height = int((width - 170) * 1.2)
+
+        # Crop the image to the new dimensions
+        left = 0
+        top = 0
+        right = width
+        bottom = height - 100
+        cropped_image = image.crop((left, top, right, bottom))
+
+        # Save the cropped image
+        cropped_image.save(image_save_path)
+        return image_save_path
 
 
     def trim_and_resize_image(self, image_path, width, height):
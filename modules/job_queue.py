@@ -0,0 +1,246 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class JobCancelled(Exception):
+    """Raised inside a job handler once its job was cancelled."""
+
+
+class JobQueue():
+    """
+    Durable job queue in SQLite (WAL mode), shared by the web process and the workers.
+
+    Jobs go queued -> running -> done | failed; a queued job that is cancelled goes
+    straight to cancelled, a running one is flagged and stops at its handler's next
+    check_cancelled(). claim() hands each queued job to exactly one worker, oldest
+    first, inside an IMMEDIATE transaction. Every job has its own log lines and
+    progress events (JSON objects, see ProgressReporter).
+    """
+
+    STATUSES = ("queued", "running", "done", "failed", "cancelled")
+    FINISHED = ("done", "failed", "cancelled")
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.init_create_db()
+
+    @classmethod
+    def shared(cls, db_name):
+        with cls._instances_lock:
+            if db_name not in cls._instances:
+                cls._instances[db_name] = cls(db_name)
+            return cls._instances[db_name]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_create_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS jobs (
+            job_id TEXT PRIMARY KEY,
+            kind TEXT,
+            payload TEXT,
+            status TEXT,
+            result TEXT,
+            error TEXT,
+            cancel_requested INTEGER DEFAULT 0,
+            worker TEXT,
+            created_at REAL,
+            started_at REAL,
+            finished_at REAL
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)')
+        conn.execute('''CREATE TABLE IF NOT EXISTS job_logs (
+            log_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT,
+            created_at REAL,
+            message TEXT
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS job_logs_job ON job_logs (job_id, log_id)')
+        conn.execute('''CREATE TABLE IF NOT EXISTS job_events (
+            event_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_id TEXT,
+            data TEXT
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS job_events_job ON job_events (job_id, event_id)')
+        conn.execute('''CREATE TABLE IF NOT EXISTS workers (
+            worker TEXT PRIMARY KEY,
+            heartbeat_at REAL
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS worker_metrics (
+            worker TEXT,
+            name TEXT,
+            data TEXT,
+            reported_at REAL,
+            PRIMARY KEY (worker, name)
+        )''')
+        conn.close()
+
+    @staticmethod
+    def _row_to_job(row):
+        job_id, kind, payload, status, result, error, cancel_requested, worker, created_at, started_at, finished_at = row
+        return {
+            "job_id": job_id, "kind": kind, "payload": json.loads(payload), "status": status,
+            "result": json.loads(result) if result is not None else None, "error": error,
+            "cancel_requested": bool(cancel_requested), "worker": worker,
+            "created_at": created_at, "started_at": started_at, "finished_at": finished_at,
+        }
+
+    def enqueue(self, kind, payload):
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        conn.execute('INSERT INTO jobs (job_id, kind, payload, status, created_at) VALUES (?, ?, ?, ?, ?)',
+                     (job_id, kind, json.dumps(payload), "queued", time.time()))
+        conn.close()
+        self.log(job_id, "Queued")
+        return job_id
+
+    def get(self, job_id):
+        conn = self._connect()
+        row = conn.execute('SELECT * FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        conn.close()
+        return self._row_to_job(row) if row else None
+
+    def claim(self, worker):
+        """Marks the oldest queued job as running on worker and returns it, or None."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1").fetchone()
+            if row:
+                conn.execute("UPDATE jobs SET status = 'running', worker = ?, started_at = ? WHERE job_id = ?",
+                             (worker, time.time(), row[0]))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        self.log(row[0], f"Started on {worker}")
+        return self.get(row[0])
+
+    def _finish(self, job_id, status, result=None, error=None):
+        conn = self._connect()
+        conn.execute("UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE job_id = ? AND status IN ('queued', 'running')",
+                     (status, json.dumps(result) if result is not None else None, error, time.time(), job_id))
+        conn.close()
+
+    def complete(self, job_id, result):
+        self._finish(job_id, "done", result=result)
+        self.log(job_id, "Done")
+
+    def fail(self, job_id, error):
+        self._finish(job_id, "failed", error=error)
+        self.log(job_id, f"Failed: {error}")
+
+    def mark_cancelled(self, job_id):
+        self._finish(job_id, "cancelled", error="Cancelled")
+        self.log(job_id, "Cancelled")
+
+    def cancel(self, job_id):
+        """Cancels a queued job at once and asks a running one to stop. Returns False for finished jobs."""
+        conn = self._connect()
+        conn.execute("UPDATE jobs SET status = 'cancelled', cancel_requested = 1, error = 'Cancelled', finished_at = ? WHERE job_id = ? AND status = 'queued'",
+                     (time.time(), job_id))
+        if conn.execute('SELECT changes()').fetchone()[0]:
+            conn.close()
+            self.log(job_id, "Cancelled")
+            return True
+        conn.execute("UPDATE jobs SET cancel_requested = 1 WHERE job_id = ? AND status = 'running'", (job_id,))
+        changed = conn.execute('SELECT changes()').fetchone()[0]
+        conn.close()
+        if changed:
+            self.log(job_id, "Cancellation requested")
+        return bool(changed)
+
+    def cancel_requested(self, job_id):
+        conn = self._connect()
+        row = conn.execute('SELECT cancel_requested FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        conn.close()
+        return bool(row and row[0])
+
+    def fail_orphans(self, is_alive):
+        """Fails running jobs whose worker is no longer alive (is_alive(worker) is False)."""
+        conn = self._connect()
+        rows = conn.execute("SELECT job_id, worker FROM jobs WHERE status = 'running'").fetchall()
+        conn.close()
+        for job_id, worker in rows:
+            if not is_alive(worker):
+                self.fail(job_id, f"Worker {worker} exited while running the job")
+
+    # --- Worker heartbeats ---
+
+    def heartbeat(self, worker):
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO workers (worker, heartbeat_at) VALUES (?, ?)', (worker, time.time()))
+        conn.close()
+
+    def live_workers(self, max_age=30):
+        """Workers (of any process or host) that sent a heartbeat in the last max_age seconds."""
+        conn = self._connect()
+        rows = conn.execute('SELECT worker FROM workers WHERE heartbeat_at > ?', (time.time() - max_age,)).fetchall()
+        conn.close()
+        return [worker for worker, in rows]
+
+    def report_metrics(self, worker, metrics):
+        """Stores a worker's in-memory counters ({name: JSON serializable data}) for the web process to read."""
+        now = time.time()
+        conn = self._connect()
+        conn.executemany('INSERT OR REPLACE INTO worker_metrics (worker, name, data, reported_at) VALUES (?, ?, ?, ?)',
+                         [(worker, name, json.dumps(data), now) for name, data in metrics.items()])
+        conn.close()
+
+    def worker_metrics(self, name, max_age=30):
+        """The last reported counters called name of every live worker, as {worker: data}."""
+        conn = self._connect()
+        rows = conn.execute('SELECT worker, data FROM worker_metrics WHERE name = ? AND reported_at > ? ORDER BY worker',
+                            (name, time.time() - max_age)).fetchall()
+        conn.close()
+        return {worker: json.loads(data) for worker, data in rows}
+
+    # --- Logs ---
+
+    def log(self, job_id, message):
+        conn = self._connect()
+        conn.execute('INSERT INTO job_logs (job_id, created_at, message) VALUES (?, ?, ?)', (job_id, time.time(), str(message)))
+        conn.close()
+
+    def logs(self, job_id, after=0):
+        """Log lines of a job as {"id", "time", "message"}, only those after log id `after`."""
+        conn = self._connect()
+        rows = conn.execute('SELECT log_id, created_at, message FROM job_logs WHERE job_id = ? AND log_id > ? ORDER BY log_id',
+                            (job_id, after)).fetchall()
+        conn.close()
+        return [{"id": log_id, "time": created_at, "message": message} for log_id, created_at, message in rows]
+
+    # --- Progress events ---
+
+    def add_event(self, job_id, event):
+        conn = self._connect()
+        conn.execute('INSERT INTO job_events (job_id, data) VALUES (?, ?)', (job_id, json.dumps(event)))
+        conn.close()
+
+    def events(self, job_id, after=0):
+        """Progress events of a job after event id `after`, each with its "id" added."""
+        conn = self._connect()
+        rows = conn.execute('SELECT event_id, data FROM job_events WHERE job_id = ? AND event_id > ? ORDER BY event_id',
+                            (job_id, after)).fetchall()
+        conn.close()
+        return [{"id": event_id, **json.loads(data)} for event_id, data in rows]
+
+    def counts(self):
+        conn = self._connect()
+        rows = conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        conn.close()
+        return {status: dict(rows).get(status, 0) for status in self.STATUSES}
@@ -0,0 +1,148 @@
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+from config import Config
+from modules.job_queue import JobCancelled, JobQueue
+from modules.progress import ProgressReporter
+
+
+class JobContext():
+    """What a job handler gets: the job's payload, its log, progress events and the cancellation check."""
+
+    def __init__(self, queue, job):
+        self.queue = queue
+        self.job_id = job["job_id"]
+        self.payload = job["payload"]
+        self.progress = ProgressReporter(lambda event: queue.add_event(self.job_id, event))
+
+    def log(self, message):
+        print(f"[job {self.job_id[:8]}] {message}")
+        self.queue.log(self.job_id, message)
+
+    def check_cancelled(self):
+        if self.queue.cancel_requested(self.job_id):
+            raise JobCancelled()
+
+
+class JobWorkerPool():
+    """
+    Worker processes that run jobs from a JobQueue.
+
+    handlers maps a job kind to a function taking a JobContext and returning a JSON
+    serializable result. metrics maps a name to a function returning counters of the
+    worker process; they are reported to the queue with every heartbeat.
+
+    The first workers are forked, so start() should run before the web server starts
+    its threads. A supervisor thread fails the job of a worker that died and starts a
+    replacement with the spawn method instead, since forking a process that is running
+    other threads can copy a lock they hold into the child and deadlock it; handlers
+    and metrics must therefore be importable module-level functions. More workers (or
+    more worker.py processes on the same queue) run more jobs at once.
+    """
+
+    def __init__(self, handlers, processes=None, db_name=None, poll_interval=None, metrics=None):
+        self.handlers = handlers
+        self.metrics = metrics or {}
+        self.processes = processes or Config.JOB_WORKERS
+        self.db_name = db_name or Config.JOB_QUEUE_DB
+        self.poll_interval = poll_interval or Config.JOB_POLL_INTERVAL
+        self.queue = JobQueue.shared(self.db_name)
+        self._context = multiprocessing.get_context("fork")
+        self._restart_context = multiprocessing.get_context("spawn")
+        self._workers = []
+        self._stopping = threading.Event()
+
+    def __getstate__(self):
+        # What a spawned worker needs; processes, events and contexts stay in the parent
+        return {"handlers": self.handlers, "metrics": self.metrics, "processes": self.processes,
+                "db_name": self.db_name, "poll_interval": self.poll_interval}
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @staticmethod
+    def worker_name(pid=None):
+        return f"{socket.gethostname()}:{pid or os.getpid()}"
+
+    @staticmethod
+    def _is_alive(worker):
+        host, _, pid = (worker or "").rpartition(":")
+        if host != socket.gethostname() or not pid.isdigit():
+            # Workers on other hosts are not ours to judge
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def start(self):
+        # Jobs left running by workers of a previous run will never finish
+        self.queue.fail_orphans(self._is_alive)
+        for _ in range(self.processes):
+            self._workers.append(self._spawn())
+        threading.Thread(target=self._supervise, daemon=True).start()
+        print(f"Started {self.processes} job workers")
+        return self
+
+    def stop(self):
+        self._stopping.set()
+        for process in self._workers:
+            process.terminate()
+        for process in self._workers:
+            process.join()
+
+    def _spawn(self, context=None):
+        process = (context or self._context).Process(target=self._work, daemon=True)
+        process.start()
+        return process
+
+    def _supervise(self):
+        while not self._stopping.wait(5):
+            for index, process in enumerate(self._workers):
+                if not process.is_alive() and not self._stopping.is_set():
+                    print(f"Job worker {process.pid} exited with code {process.exitcode}, restarting it")
+                    self.queue.fail_orphans(lambda worker: worker != self.worker_name(process.pid))
+                    self._workers[index] = self._spawn(self._restart_context)
+
+    def _work(self):
+        worker = self.worker_name()
+
+        def heartbeat():
+            # Lets the web process tell whether any worker is serving the queue, also during long jobs
+            while True:
+                self.queue.heartbeat(worker)
+                self.queue.report_metrics(worker, {name: collect() for name, collect in self.metrics.items()})
+                time.sleep(5)
+
+        threading.Thread(target=heartbeat, daemon=True).start()
+        while True:
+            job = self.queue.claim(worker)
+            if job is None:
+                time.sleep(self.poll_interval)
+                continue
+            self.run_job(job)
+
+    def run_job(self, job):
+        context = JobContext(self.queue, job)
+        handler = self.handlers.get(job["kind"])
+        try:
+            if handler is None:
+                raise ValueError(f"No handler for job kind '{job['kind']}'")
+            result = handler(context)
+            self.queue.complete(job["job_id"], result)
+        except JobCancelled:
+            self.queue.mark_cancelled(job["job_id"])
+        except Exception as e:
+            print(traceback.format_exc())
+            self.queue.fail(job["job_id"], str(e) or type(e).__name__)
+
+    def join(self):
+        """Blocks while the workers run (for worker.py)."""
+        while not self._stopping.wait(1):
+            pass
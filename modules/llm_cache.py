@@ -0,0 +1,151 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from config import Config
+
+
+class LLMCache():
+    """
+    Disk-backed prompt-to-response cache for LLM calls.
+
+    Entries are keyed on a hash of (provider, model, system prompt, prompt, params),
+    expire after ttl seconds and are evicted least-recently-used first once the cache
+    grows past max_entries or max_bytes. Stored in SQLite (WAL mode), so caption
+    threads and parallel workers can share it. With deterministic=True the callers also
+    pin their sampling seeds, so a replayed stage gets exactly the same output.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_name="llm_cache.db", ttl=7 * 24 * 3600, max_entries=20000, max_bytes=200 * 1024 * 1024, deterministic=False, enabled=True):
+        self.db_name = db_name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.deterministic = deterministic
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if enabled:
+            self.init_create_db()
+
+    @classmethod
+    def shared(cls):
+        """The process-wide cache configured from Config."""
+        with cls._instances_lock:
+            if "default" not in cls._instances:
+                cls._instances["default"] = cls(
+                    db_name=Config.LLM_CACHE_DB,
+                    ttl=Config.LLM_CACHE_TTL,
+                    max_entries=Config.LLM_CACHE_MAX_ENTRIES,
+                    max_bytes=Config.LLM_CACHE_MAX_BYTES,
+                    deterministic=Config.LLM_DETERMINISTIC,
+                    enabled=Config.LLM_CACHE_ENABLED,
+                )
+            return cls._instances["default"]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_create_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS llm_cache (
+            key TEXT PRIMARY KEY,
+            provider TEXT,
+            model TEXT,
+            response TEXT,
+            size INTEGER,
+            created_at REAL,
+            last_access REAL
+        )''')
+        conn.execute('CREATE INDEX IF NOT EXISTS llm_cache_last_access ON llm_cache (last_access)')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def make_key(provider, model, prompt, system_prompt='', params=None):
+        payload = json.dumps([provider, model, system_prompt or '', prompt, params or {}], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def seed_for(key):
+        """Stable sampling seed derived from a cache key, used in deterministic mode."""
+        return int(key[:8], 16) % 999999999 + 1
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute('SELECT response, created_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row and now - row[1] < self.ttl:
+            conn.execute('UPDATE llm_cache SET last_access = ? WHERE key = ?', (now, key))
+            conn.commit()
+            conn.close()
+            with self._lock:
+                self.hits += 1
+            return row[0]
+        if row:
+            conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            conn.commit()
+        conn.close()
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, response, provider='', model=''):
+        if not self.enabled or response is None:
+            return
+        now = time.time()
+        conn = self._connect()
+        conn.execute('''INSERT OR REPLACE INTO llm_cache (key, provider, model, response, size, created_at, last_access)
+                        VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                     (key, provider, model, response, len(response.encode('utf-8')), now, now))
+        self._evict(conn)
+        conn.commit()
+        conn.close()
+
+    def _evict(self, conn):
+        conn.execute('DELETE FROM llm_cache WHERE created_at <= ?', (time.time() - self.ttl,))
+        count, total_size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+        while count > self.max_entries or total_size > self.max_bytes:
+            # Drop the least recently used tenth (at least one entry) per round
+            batch = max(1, count // 10)
+            conn.execute('DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_access LIMIT ?)', (batch,))
+            count, total_size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache').fetchone()
+
+    def delete(self, key):
+        if not self.enabled:
+            return
+        conn = self._connect()
+        conn.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+        conn.commit()
+        conn.close()
+
+    def cached_call(self, provider, model, prompt, call, system_prompt='', params=None, use_cache=True, validate=None):
+        """
+        Returns the cached response for the request or runs call(key) and stores its
+        result. Results that are None or fail validate() are not stored. With
+        use_cache=False the lookup is skipped but the fresh response is still stored.
+        """
+        key = self.make_key(provider, model, prompt, system_prompt, params)
+        if use_cache:
+            response = self.get(key)
+            if response is not None:
+                return response
+        response = call(key)
+        if response is not None and (validate is None or validate(response)):
+            self.set(key, response, provider, model)
+        return response
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
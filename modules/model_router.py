@@ -0,0 +1,180 @@
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class ModelRouter():
+    """
+    Picks the model with the best expected completion time.
+
+    For every model it keeps an EWMA of the request latency and the error rate over
+    the last error_window requests. The expected completion time of a model is its
+    latency divided by its success rate (the expected number of attempts). Rate-limit
+    errors put a model into cooldown, honouring retry-after when the provider sends it.
+    Models that were never tried start at default_latency so they get explored.
+    """
+
+    RATE_LIMIT_MARKERS = ('rate_limit', 'rate limit', '429', 'resource_exhausted', 'quota', 'too many requests')
+
+    # Routers are shared per provider so every instance in the process learns from the same traffic
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, models, alpha=0.3, error_window=20, default_latency=5.0, rate_limit_cooldown=60, error_cooldown=10, max_error_rate=0.95):
+        self.alpha = alpha
+        self.error_window = error_window
+        self.default_latency = default_latency
+        self.rate_limit_cooldown = rate_limit_cooldown
+        self.error_cooldown = error_cooldown
+        self.max_error_rate = max_error_rate
+        self._lock = threading.Lock()
+        self._stats = {}
+        self.models = []
+        self.add_models(models)
+
+    @classmethod
+    def shared(cls, name, models, **kwargs):
+        with cls._instances_lock:
+            if name not in cls._instances:
+                cls._instances[name] = cls(models, **kwargs)
+            else:
+                cls._instances[name].add_models(models)
+            return cls._instances[name]
+
+    def add_models(self, models):
+        with self._lock:
+            for model in models:
+                if model not in self._stats:
+                    self.models.append(model)
+                    self._stats[model] = {
+                        "latency": None,
+                        "outcomes": deque(maxlen=self.error_window),
+                        "cooldown_until": 0,
+                        "consecutive_errors": 0,
+                        "requests": 0,
+                    }
+
+    def record_success(self, model, latency):
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None:
+                return
+            if stats["latency"] is None:
+                stats["latency"] = latency
+            else:
+                stats["latency"] = self.alpha * latency + (1 - self.alpha) * stats["latency"]
+            stats["outcomes"].append(0)
+            stats["consecutive_errors"] = 0
+            stats["requests"] += 1
+
+    def record_error(self, model, error=None, latency=None, rate_limited=None, retry_after=None):
+        if rate_limited is None:
+            rate_limited = self.is_rate_limit_error(error)
+        if retry_after is None:
+            retry_after = self.parse_retry_after(error)
+        with self._lock:
+            stats = self._stats.get(model)
+            if stats is None:
+                return
+            stats["outcomes"].append(1)
+            stats["consecutive_errors"] += 1
+            stats["requests"] += 1
+            if latency is not None and stats["latency"] is not None:
+                # A failed call still tells us how slow the model currently is
+                stats["latency"] = self.alpha * latency + (1 - self.alpha) * stats["latency"]
+            if rate_limited:
+                cooldown = retry_after if retry_after else self.rate_limit_cooldown
+            else:
+                # Back off exponentially on repeated plain errors: 10s, 20s, 40s, ...
+                cooldown = self.error_cooldown * 2 ** (stats["consecutive_errors"] - 1) if stats["consecutive_errors"] >= 2 else 0
+            if cooldown:
+                stats["cooldown_until"] = max(stats["cooldown_until"], time.time() + cooldown)
+
+    def set_cooldown(self, model, seconds):
+        with self._lock:
+            if model in self._stats:
+                self._stats[model]["cooldown_until"] = time.time() + seconds
+
+    def clear_cooldown(self, model):
+        with self._lock:
+            if model in self._stats:
+                self._stats[model]["cooldown_until"] = 0
+
+    def expected_time(self, model):
+        stats = self._stats[model]
+        latency = stats["latency"] if stats["latency"] is not None else self.default_latency
+        return latency / (1 - min(self._error_rate(stats), self.max_error_rate))
+
+    def best_model(self, candidates=None, exclude=()):
+        """Returns the available model with the lowest expected completion time, or None if all are cooling down."""
+        now = time.time()
+        with self._lock:
+            available = [m for m in (candidates or self.models)
+                         if m in self._stats and m not in exclude and self._stats[m]["cooldown_until"] <= now]
+            if not available:
+                return None
+            # Ties (e.g. untried models) keep whitelist order
+            return min(available, key=self.expected_time)
+
+    def next_available_at(self, candidates=None):
+        """Returns the unix time at which the first of the candidates leaves cooldown."""
+        with self._lock:
+            times = [self._stats[m]["cooldown_until"] for m in (candidates or self.models) if m in self._stats]
+        return min(times) if times else time.time()
+
+    @contextmanager
+    def track(self, model):
+        """Times the wrapped call and records it as a success or error for the model."""
+        start = time.time()
+        try:
+            yield
+        except Exception as e:
+            self.record_error(model, e, latency=time.time() - start)
+            raise
+        self.record_success(model, time.time() - start)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {
+                model: {
+                    "latency_ewma": stats["latency"],
+                    "error_rate": self._error_rate(stats),
+                    "requests": stats["requests"],
+                    "cooldown_remaining": max(0, stats["cooldown_until"] - now),
+                    "expected_time": self.expected_time(model),
+                }
+                for model, stats in self._stats.items()
+            }
+
+    @staticmethod
+    def _error_rate(stats):
+        outcomes = stats["outcomes"]
+        return sum(outcomes) / len(outcomes) if outcomes else 0
+
+    @classmethod
+    def is_rate_limit_error(cls, error):
+        if error is None:
+            return False
+        if getattr(error, "status_code", None) == 429 or getattr(error, "code", None) == 429:
+            return True
+        message = str(error).lower()
+        return any(marker in message for marker in cls.RATE_LIMIT_MARKERS)
+
+    @staticmethod
+    def parse_retry_after(error):
+        if error is None:
+            return None
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value is None:
+            # Gemini reports it in the body as e.g. "retryDelay": "37s"
+            match = re.search(r'retry[-_ ]?(?:after|delay)["\':\s]+(\d+(?:\.\d+)?)', str(error), re.IGNORECASE)
+            value = match.group(1) if match else None
+        try:
+            return float(value) if value is not None else None
+        except ValueError:
+            return None
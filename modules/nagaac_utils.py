@@ -1,16 +1,217 @@
+import asyncio
+import json
+import os
 import sqlite3
+import threading
+import time
 import requests
+from config import Config
+from modules.http_transport import HttpTransport
+from modules.model_router import ModelRouter
+
+
+class NagaACCatalogue():
+    """
+    Cached copy of the NagaAC /models and /limits catalogues.
+
+    Both endpoints are fetched at most once per ttl seconds. When the ttl expires
+    the entry is revalidated with If-None-Match / If-Modified-Since, so an unchanged
+    catalogue only costs a 304. Every successful fetch is written to snapshot_file,
+    which is also used when the API cannot be reached (offline mode). After a failed
+    refresh the stale copy is served for failure_ttl seconds before trying again.
+
+    The fetch itself runs outside the lock: one caller refreshes an endpoint while
+    the others keep getting the stale copy, and the new one is swapped in under the
+    lock. Only an endpoint with no copy at all makes the other callers wait for it.
+    """
+
+    ENDPOINTS = ("models", "limits")
+
+    # One catalogue per (api_url, api_key) so every NagaACUtils in the process shares it
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, api_key, api_url, ttl=3600, snapshot_file=None, offline=False, failure_ttl=60):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.ttl = ttl
+        self.failure_ttl = failure_ttl
+        self.snapshot_file = snapshot_file or Config.NAGA_AC_CATALOGUE_SNAPSHOT
+        self.offline = offline
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._attempted_at = {}
+        self._refreshing = {}
+        self.limiter_to_model = {}
+        self.max_images_by_model = {}
+        self._load_snapshot()
+
+    @classmethod
+    def shared(cls, api_key, api_url, **kwargs):
+        key = (api_url, api_key)
+        with cls._instances_lock:
+            if key not in cls._instances:
+                cls._instances[key] = cls(api_key, api_url, **kwargs)
+            return cls._instances[key]
+
+    def _is_fresh(self, endpoint):
+        entry = self._entries.get(endpoint)
+        if entry and (self.offline or time.time() - entry["fetched_at"] < self.ttl):
+            return True
+        # Negative cache: a refresh that just failed is not retried on every lookup
+        return time.time() - self._attempted_at.get(endpoint, 0) < self.failure_ttl
+
+    def get(self, endpoint):
+        """Returns the JSON body of the given endpoint, fetching only when the ttl expired."""
+        action, value = self._claim_refresh(endpoint)
+        if action == "wait":
+            value.wait()
+        elif action == "fetch":
+            response = None
+            try:
+                response = self._fetch(endpoint, value)
+            finally:
+                self._finish_refresh(endpoint, response)
+        return self._current(endpoint)
+
+    async def get_async(self, endpoint, providers):
+        """get() for asyncio callers; the refresh goes through AsyncProviders instead of blocking a thread."""
+        action, value = self._claim_refresh(endpoint)
+        if action == "wait":
+            await asyncio.to_thread(value.wait)
+        elif action == "fetch":
+            response = None
+            try:
+                response = await providers.nagaac_request(f"{self.api_url}/{endpoint}", value)
+            except Exception as e:
+                print(f"NagaAC catalogue refresh of /{endpoint} failed: {e}")
+            finally:
+                self._finish_refresh(endpoint, response)
+        return self._current(endpoint)
+
+    def _current(self, endpoint):
+        with self._lock:
+            return self._entries.get(endpoint, {}).get("data", {"data": []})
+
+    def _claim_refresh(self, endpoint):
+        """
+        Returns ("serve", None) when the current copy should be used, ("wait", event)
+        while another caller fetches an endpoint that has no copy yet, or
+        ("fetch", headers) when this caller refreshes the endpoint.
+        """
+        with self._lock:
+            refreshing = self._refreshing.get(endpoint)
+            if refreshing is not None:
+                return ("serve", None) if endpoint in self._entries else ("wait", refreshing)
+            if self.offline or self._is_fresh(endpoint):
+                return "serve", None
+            self._attempted_at[endpoint] = time.time()
+            self._refreshing[endpoint] = threading.Event()
+            return "fetch", self._request_headers(endpoint)
+
+    def _finish_refresh(self, endpoint, response):
+        with self._lock:
+            if response is not None:
+                self._apply_response(endpoint, *response)
+            self._refreshing.pop(endpoint).set()
+
+    def invalidate(self):
+        with self._lock:
+            for entry in self._entries.values():
+                entry["fetched_at"] = 0
+            self._attempted_at.clear()
+
+    def _request_headers(self, endpoint):
+        entry = self._entries.get(endpoint)
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        if entry:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def _fetch(self, endpoint, headers):
+        """Returns (status, headers, json or None), or None when the request failed."""
+        try:
+            response = HttpTransport.get(f"{self.api_url}/{endpoint}", headers=headers, timeout=HttpTransport.default_timeout(10))
+            data = response.json() if response.status_code == 200 else None
+        except (requests.RequestException, ValueError) as e:
+            # Keep serving the stale copy (or the snapshot) instead of failing model selection
+            print(f"NagaAC catalogue refresh of /{endpoint} failed: {e}")
+            return None
+        return response.status_code, response.headers, data
+
+    def _apply_response(self, endpoint, status_code, headers, data):
+        entry = self._entries.get(endpoint)
+        if status_code == 304 and entry:
+            entry["fetched_at"] = time.time()
+        elif status_code == 200:
+            self._entries[endpoint] = {
+                "fetched_at": time.time(),
+                "etag": headers.get("ETag"),
+                "last_modified": headers.get("Last-Modified"),
+                "data": data,
+            }
+            self._build_indexes()
+        else:
+            print(f"NagaAC catalogue refresh of /{endpoint} failed with status code {status_code}")
+            return
+        self._save_snapshot()
+
+    def _build_indexes(self):
+        limiter_to_model = {}
+        max_images_by_model = {}
+        for item in self._entries.get("models", {}).get("data", {}).get("data", []):
+            if item.get("object") != "model":
+                continue
+            # The first model listed for a limiter wins, matching the old linear scan
+            if item.get("limiter") is not None:
+                limiter_to_model.setdefault(item["limiter"], item["id"])
+            if "max_images" in item:
+                max_images_by_model[item["id"]] = item["max_images"]
+        self.limiter_to_model = limiter_to_model
+        self.max_images_by_model = max_images_by_model
+
+    def _load_snapshot(self):
+        if not self.snapshot_file or not os.path.exists(self.snapshot_file):
+            return
+        try:
+            with open(self.snapshot_file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read NagaAC catalogue snapshot {self.snapshot_file}: {e}")
+            return
+        for endpoint in self.ENDPOINTS:
+            if endpoint in snapshot:
+                self._entries[endpoint] = snapshot[endpoint]
+        self._build_indexes()
+
+    def _save_snapshot(self):
+        if not self.snapshot_file:
+            return
+        tmp_path = f"{self.snapshot_file}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.snapshot_file) or ".", exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.snapshot_file)
+        except OSError as e:
+            print(f"Could not write NagaAC catalogue snapshot {self.snapshot_file}: {e}")
+
 
 class NagaACUtils():
-    def __init__(self, api_key, db_name="naga_ac.db", text_model_whitelist=["default-gemini-1.5-pro", "default-gpt-3.5-turbo"], image_model_whitelist = ["sdxl", "kandinsky-3.1"], voice_model_whitelist = ['default-eleven-monolingual-v1', 'default-eleven-turbo-v2', 'default-eleven-multilingual-v1', 'default-eleven-multilingual-v2'], api_url="https://api.naga.ac/v1"):
+    def __init__(self, api_key, db_name="naga_ac.db", text_model_whitelist=["default-gemini-1.5-pro", "default-gpt-3.5-turbo"], image_model_whitelist = ["sdxl", "kandinsky-3.1"], voice_model_whitelist = ['default-eleven-monolingual-v1', 'default-eleven-turbo-v2', 'default-eleven-multilingual-v1', 'default-eleven-multilingual-v2'], api_url="https://api.naga.ac/v1", catalogue_ttl=3600, catalogue_snapshot=None, offline=False):
         self.api_key = api_key
         self.db_name = db_name
         self.api_url = api_url
+        self.catalogue = NagaACCatalogue.shared(api_key, api_url, ttl=catalogue_ttl, snapshot_file=catalogue_snapshot, offline=offline)
         self.init_create_db()
         self.text_model_whitelist = text_model_whitelist
         self.image_model_whitelist = image_model_whitelist
         self.voice_model_whitelist = voice_model_whitelist
         self.current_model_id = 0
+        self.router = ModelRouter.shared("nagaac", [model.replace('default-', '') for model in text_model_whitelist + image_model_whitelist + voice_model_whitelist])
         # self.update_db_limits()
 
 
@@ -160,13 +361,18 @@ class NagaACUtils():
         else:
             model_whitelist = self.text_model_whitelist
 
-        self.current_model_id += 1
-        if self.current_model_id >= len(model_whitelist):
-            self.current_model_id = 0
-
         model_whitelist_new = [model.replace('default-', '') for model in model_whitelist]
-        
-        return model_whitelist_new[self.current_model_id]
+        if not model_whitelist_new:
+            return None
+
+        # Pick by observed latency and error rate; rate-limited models sit out their cooldown
+        best_model = self.router.best_model(model_whitelist_new)
+        if best_model is None:
+            # Everything is cooling down: take the model that comes back first
+            stats = self.router.stats()
+            best_model = min(model_whitelist_new, key=lambda m: stats.get(m, {}).get("cooldown_remaining", 0))
+        self.current_model_id = model_whitelist_new.index(best_model)
+        return best_model
 
 
         # Connect to SQLite database (or create it if it doesn't exist)
@@ -218,40 +424,17 @@ class NagaACUtils():
 
 
     def get_model_by_limiter(self, limiter):
-        data = self.get_models_json()
-
-        # Insert or update data
-        for item in data["data"]:
-            if item["object"] == "model":
-                if item['limiter'] == limiter:
-                    return item['id']
+        # Refreshes the catalogue only if the ttl expired, then a dict lookup
+        self.catalogue.get("models")
+        return self.catalogue.limiter_to_model.get(limiter)
                 
     def get_image_model_max_images_count(self, model_id):
-        data = self.get_models_json()
-
-        # Insert or update data
-        for item in data["data"]:
-            if item["object"] == "model":
-                if item['id'] == model_id:
-                    return item['max_images']
+        self.catalogue.get("models")
+        return self.catalogue.max_images_by_model.get(model_id)
 
 
     def get_limiters_json(self):
-        api_path = self.api_url + "/limits"
-        # Make the HTTP GET request
-        headers = {
-            "Authorization": f"Bearer {self.api_key}"
-        }
-
-        response = requests.get(api_path, headers=headers)
-        return response.json()
+        return self.catalogue.get("limits")
     
     def get_models_json(self):
-        api_path = self.api_url + "/models"
-        # Make the HTTP GET request
-        headers = {
-            "Authorization": f"Bearer {self.api_key}"
-        }
-
-        response = requests.get(api_path, headers=headers)
-        return response.json()
+        return self.catalogue.get("models")
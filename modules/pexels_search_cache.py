@@ -0,0 +1,186 @@
+import json
+import random
+import sqlite3
+import threading
+import time
+from config import Config
+
+
+class PexelsSearchCache():
+    """
+    Cached pool of Pexels search results, shared by every FootageDownloader.
+
+    Search pages are stored per (mode, query, orientation, page) for ttl seconds,
+    always fetched with the full per_page. pick() serves one result from all fresh
+    pages of a query, either at random or least-recently-used first, and prefetches
+    the next page in the background once most of the pool has been used, so
+    repeated queries vary their footage without a search per scene.
+
+    The X-Ratelimit-* headers of every Pexels response are tracked; when fewer than
+    rate_limit_reserve requests are left, prefetching stops and expired pages are
+    served instead of refetched.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, fetch, db_name="pexels_cache.db", ttl=24 * 3600, per_page=80, max_pages=5, strategy="lru", rate_limit_reserve=50):
+        # fetch(api_key, mode, query, orientation, page, per_page) returns the search JSON or None;
+        # the key comes with every pick() so the shared cache holds no caller's key or instance
+        self.fetch = fetch
+        self.db_name = db_name
+        self.ttl = ttl
+        self.per_page = per_page
+        self.max_pages = max_pages
+        self.strategy = strategy
+        self.rate_limit_reserve = rate_limit_reserve
+        self._lock = threading.Lock()
+        self._prefetching = set()
+        self.rate_limit = {"limit": None, "remaining": None, "reset": None}
+        self.api_calls = 0
+        self.picks = 0
+        self.init_create_db()
+
+    @classmethod
+    def shared(cls, fetch):
+        with cls._instances_lock:
+            if "default" not in cls._instances:
+                cls._instances["default"] = cls(
+                    fetch,
+                    db_name=Config.PEXELS_CACHE_DB,
+                    ttl=Config.PEXELS_CACHE_TTL,
+                    per_page=Config.PEXELS_PER_PAGE,
+                    max_pages=Config.PEXELS_MAX_PAGES,
+                    strategy=Config.PEXELS_PICK_STRATEGY,
+                    rate_limit_reserve=Config.PEXELS_RATE_LIMIT_RESERVE,
+                )
+            return cls._instances["default"]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_create_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS pexels_pages (
+            mode TEXT,
+            query TEXT,
+            orientation TEXT,
+            page INTEGER,
+            total_results INTEGER,
+            items TEXT,
+            fetched_at REAL,
+            PRIMARY KEY (mode, query, orientation, page)
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS pexels_usage (
+            mode TEXT,
+            item_id INTEGER,
+            uses INTEGER,
+            last_used REAL,
+            PRIMARY KEY (mode, item_id)
+        )''')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _key(mode, query, orientation):
+        return (mode, query.strip().lower(), orientation or "")
+
+    def record_rate_limit(self, headers):
+        """Called with the headers of every Pexels API response."""
+        with self._lock:
+            for name in ("limit", "remaining", "reset"):
+                value = headers.get(f"X-Ratelimit-{name.capitalize()}")
+                if value is not None:
+                    self.rate_limit[name] = int(value)
+
+    def rate_limited(self):
+        with self._lock:
+            remaining, reset = self.rate_limit["remaining"], self.rate_limit["reset"]
+        if remaining is None or (reset and reset < time.time()):
+            return False
+        return remaining < self.rate_limit_reserve
+
+    def _pages(self, key, fresh_only=True):
+        conn = self._connect()
+        rows = conn.execute('SELECT page, total_results, items, fetched_at FROM pexels_pages WHERE mode = ? AND query = ? AND orientation = ? ORDER BY page', key).fetchall()
+        conn.close()
+        now = time.time()
+        return [(page, total, json.loads(items)) for page, total, items, fetched_at in rows if not fresh_only or now - fetched_at < self.ttl]
+
+    def _fetch_page(self, key, page, api_key):
+        mode, query, orientation = key
+        with self._lock:
+            self.api_calls += 1
+        results = self.fetch(api_key, mode, query, orientation or None, page, self.per_page)
+        if results is None:
+            return None
+        items = results.get(mode + 's', [])
+        conn = self._connect()
+        conn.execute('INSERT OR REPLACE INTO pexels_pages (mode, query, orientation, page, total_results, items, fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     (*key, page, results.get("total_results", len(items)), json.dumps(items), time.time()))
+        conn.commit()
+        conn.close()
+        return items
+
+    def _prefetch(self, key, page, api_key):
+        with self._lock:
+            if (key, page) in self._prefetching:
+                return
+            self._prefetching.add((key, page))
+
+        def run():
+            try:
+                self._fetch_page(key, page, api_key)
+            except Exception as e:
+                print(f"Prefetch of Pexels page {page} for '{key[1]}' failed: {e}")
+            finally:
+                with self._lock:
+                    self._prefetching.discard((key, page))
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def pick(self, mode, query, orientation=None, max_pages=None, api_key=None):
+        """Returns one search result (a Pexels photo/video dict) for the query, or None."""
+        key = self._key(mode, query, orientation)
+        max_pages = max_pages or self.max_pages
+        pages = self._pages(key)
+        if not pages:
+            if self.rate_limited():
+                pages = self._pages(key, fresh_only=False)
+            elif self._fetch_page(key, 1, api_key) is not None:
+                pages = self._pages(key)
+        items = {item["id"]: item for _, _, page_items in pages for item in page_items}
+        if not items:
+            return None
+
+        conn = self._connect()
+        usage = dict(conn.execute(
+            f'SELECT item_id, uses FROM pexels_usage WHERE mode = ? AND item_id IN ({",".join("?" * len(items))})',
+            (mode, *items)).fetchall())
+        if self.strategy == "random":
+            item_id = random.choice(list(items))
+        else:
+            # Least used first, random among equals so parallel scenes do not all get the same clip
+            least_uses = min(usage.get(item_id, 0) for item_id in items)
+            item_id = random.choice([item_id for item_id in items if usage.get(item_id, 0) == least_uses])
+        conn.execute('''INSERT INTO pexels_usage (mode, item_id, uses, last_used) VALUES (?, ?, 1, ?)
+                        ON CONFLICT (mode, item_id) DO UPDATE SET uses = uses + 1, last_used = excluded.last_used''',
+                     (mode, item_id, time.time()))
+        conn.commit()
+        conn.close()
+        with self._lock:
+            self.picks += 1
+
+        # Prefetch the next page once three quarters of the pool has been served
+        used = sum(1 for other in items if usage.get(other, 0) > 0 or other == item_id)
+        last_page, total_results, _ = pages[-1]
+        if used >= len(items) * 0.75 and last_page < max_pages and last_page * self.per_page < total_results and not self.rate_limited():
+            self._prefetch(key, last_page + 1, api_key)
+        return items[item_id]
+
+    def stats(self):
+        with self._lock:
+            return {"api_calls": self.api_calls, "picks": self.picks, "rate_limit": dict(self.rate_limit)}
@@ -2,101 +2,19 @@ import json
 import random
 import time
 import os
-from datetime import datetime
 # import pollinations
 import urllib.parse
 import requests
-from openai import OpenAI
 import base64
+from modules.client_pool import ClientPool
+from modules.http_transport import HttpTransport
+from modules.llm_cache import LLMCache
+from modules.retry_policy import HTTPStatusError, RetryPolicy
+from modules.blob_store import BlobStore
+from modules.single_flight import SingleFlight
 
 class PollinationsUtils():
-    def __init__(self, api_key):
-        self.api_key = api_key
-
-    def generate_text(self, prompt, system_prompt=''):
-        url = "https://text.pollinations.ai"
-
-        while True:
-            try:
-                data = {
-                    "messages": [
-                        {"role": "system", "content": system_prompt},
-                        {"role": "user", "content": prompt}
-                    ],
-                    "model": "openai",
-                    "seed": random.randint(1, 999999999),
-                    "jsonMode": False,
-                    "private": True,
-                    "stream": False
-                }
-                # Make the request to the API
-                response = requests.post(url, json=data, stream=True)
-                if response.status_code == 200:
-                    return response.text
-                else:
-                    print(f"Failed to generate text. Status code: {response.status_code}. Retrying...")
-            except Exception as e:
-                print(f"Request failed: {e}. Retrying...")
-            time.sleep(5)  # Wait for 5 seconds before retrying
-
-
-
-    def generate_image(self, prompt, save_path, width=1080, height=1920, infinite_try=True):
-        params = {
-        "safe": True,
-        "seed": random.randint(1, 999999999),
-        "width": width,
-        "height": height,
-        "nologo": True,
-        "private": True,
-        "model": "flux",
-        "enhance": True,
-        "referrer": "pollinations.py"
-        }
-
-        encoded_prompt = urllib.parse.quote(prompt)
-        query_params = "&".join(f"{k}={v}" for k, v in params.items())
-        url = f"https://image.pollinations.ai/prompt/{encoded_prompt}?{query_params}"
-
-        while True:
-            try:
-                # Make the request to the API
-                response = requests.get(
-                    url=url,
-                    headers={"Content-Type": "application/json"},
-                    timeout=60
-                )
-                if response.status_code == 200:
-                    # Wait for the image to be generated
-                    # time.sleep(10)  # Adjust the sleep time as needed
-
-                    # Save the image
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    image_save_name = f"img_{timestamp}.png"
-                    image_save_path = os.path.join(save_path, image_save_name)
-                    os.makedirs(os.path.dirname(image_save_path), exist_ok=True)
-                    with open(image_save_path, 'wb') as f:
-                        f.write(response.content)
-                    return image_save_path
-                else:
-                    print(f"Failed to generate image. Status code: {response.status_code}. Retrying...")
-                    if not infinite_try:
-                        return None
-            except requests.RequestException as e:
-                print(f"Request failed: {e}. Retrying...")
-                if not infinite_try:
-                    return None
-            time.sleep(5)  # Wait for 5 seconds before retrying
-
-    def generate_audio(self, prompt, save_path, infinite_try=True, voice="nova"):
-
-        
-        client = OpenAI(
-            api_key=self.api_key,
-            base_url="https://text.pollinations.ai/openai",
-        )
-        
-        system_message = """
+    TTS_SYSTEM_MESSAGE = """
         You are a TTS agent. Your only job is to generate audio that exactly matches the text the user provides. 
         Do not add, remove, modify, or interpret any words.
         Simply convert the input text into speech, mimicking it word for word, exactly as it is written
@@ -125,33 +43,118 @@ class PollinationsUtils():
         | I love AI. | "That's great! AI is amazing!" ❌ |
         """
 
+    def __init__(self, api_key=None):
+        self.api_key = api_key
+        self.llm_cache = LLMCache.shared()
+        self.retry_policy = RetryPolicy.from_config()
+
+    def generate_text(self, prompt, system_prompt='', timeout=None, use_cache=True):
+        def call(key):
+            # Deterministic mode pins the seed so a cache miss still reproduces the same text
+            seed = LLMCache.seed_for(key) if self.llm_cache.deterministic else random.randint(1, 999999999)
+            # Identical prompts in flight at the same time share one request
+            return SingleFlight.group("pollinations-text", shared=True).do((key, use_cache), self._generate_text, prompt, system_prompt, timeout, seed)
+        return self.llm_cache.cached_call("pollinations", "openai", prompt, call, system_prompt=system_prompt, use_cache=use_cache)
+
+    def _generate_text(self, prompt, system_prompt, timeout, seed):
+        url = "https://text.pollinations.ai"
+        # With a timeout the retries stop at that deadline instead of the policy's one
+        deadline = time.time() + timeout if timeout else None
+        data = {
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": prompt}
+            ],
+            "model": "openai",
+            "seed": seed,
+            "jsonMode": False,
+            "private": True,
+            "stream": False
+        }
+
+        def attempt():
+            read_timeout = max(1, deadline - time.time()) if deadline else None
+            response = HttpTransport.post(url, json=data, timeout=ClientPool.timeout(read_timeout))
+            if response.status_code != 200:
+                raise HTTPStatusError(response.status_code, f"Failed to generate text. Status code: {response.status_code}")
+            return response.text
+
+        try:
+            return self.retry_policy.call(attempt, "pollinations-text", deadline=timeout)
+        except Exception as e:
+            print(f"Text generation failed: {e}")
+            return None
+
+
+
+    def generate_image(self, prompt, save_path, width=1080, height=1920, infinite_try=True):
+        params = {
+        "safe": True,
+        "seed": random.randint(1, 999999999),
+        "width": width,
+        "height": height,
+        "nologo": True,
+        "private": True,
+        "model": "flux",
+        "enhance": True,
+        "referrer": "pollinations.py"
+        }
+
+        encoded_prompt = urllib.parse.quote(prompt)
+        query_params = "&".join(f"{k}={v}" for k, v in params.items())
+        url = f"https://image.pollinations.ai/prompt/{encoded_prompt}?{query_params}"
+
+        def attempt():
+            response = HttpTransport.get(
+                url,
+                headers={"Content-Type": "application/json"},
+                timeout=HttpTransport.default_timeout(60)
+            )
+            if response.status_code != 200:
+                raise HTTPStatusError(response.status_code, f"Failed to generate image. Status code: {response.status_code}")
+            return response.content
+
+        try:
+            # infinite_try retries with backoff up to the policy's limits, otherwise one attempt;
+            # concurrent requests for the same prompt and size share one generation
+            content = SingleFlight.group("pollinations-image").do(
+                (prompt, width, height, infinite_try),
+                self.retry_policy.call, attempt, "pollinations-image", max_attempts=None if infinite_try else 1)
+        except Exception as e:
+            print(f"Image generation failed: {e}")
+            return None
+
+        # Save the image, named after its content so parallel saves cannot collide
+        return BlobStore.shared().store_unique(content, save_path, "img", ".png")
 
-        while True:
-            try:
-                response = client.chat.completions.create(
-                    model="openai-audio",
-                    modalities=["text", "audio"],
-                    audio={"voice": voice, "format": "mp3"},
-                    messages=[
-                        {
-                            "role": "system",
-                            "content": system_message,
-                        },
-                        {"role": "user", "content": prompt},
-                    ],
-                )
-                
-                # Extract and decode the base64 audio data
-                wav_bytes = base64.b64decode(response.choices[0].message.audio.data)
-                
-                # Save the audio
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                audio_save_name = f"audio_{timestamp}.mp3"
-                audio_save_path = os.path.join(save_path, audio_save_name)
-                os.makedirs(os.path.dirname(audio_save_path), exist_ok=True)
-                with open(audio_save_path, 'wb') as f:
-                    f.write(wav_bytes)
-                
-                return audio_save_path
-            except Exception as e:
-                print(f"Request failed: {e}.")
+    def generate_audio(self, prompt, save_path, infinite_try=True, voice="nova"):
+
+        
+        client = ClientPool.openai(self.api_key, "https://text.pollinations.ai/openai")
+
+        def attempt():
+            response = client.chat.completions.create(
+                model="openai-audio",
+                modalities=["text", "audio"],
+                audio={"voice": voice, "format": "mp3"},
+                messages=[
+                    {
+                        "role": "system",
+                        "content": self.TTS_SYSTEM_MESSAGE,
+                    },
+                    {"role": "user", "content": prompt},
+                ],
+            )
+            # Extract and decode the base64 audio data
+            return base64.b64decode(response.choices[0].message.audio.data)
+
+        try:
+            wav_bytes = SingleFlight.group("pollinations-audio", shared=True).do(
+                (prompt, voice, infinite_try),
+                self.retry_policy.call, attempt, "pollinations-audio", max_attempts=None if infinite_try else 1)
+        except Exception as e:
+            print(f"Audio generation failed: {e}")
+            return None
+
+        # Save the audio; not linked from the blob store because voiceovers are enhanced in place
+        return BlobStore.write_unique(wav_bytes, save_path, "audio", ".mp3")
@@ -0,0 +1,56 @@
+import threading
+import time
+from proglog import ProgressBarLogger
+from config import Config
+
+
+class ProgressReporter():
+    """
+    Structured progress events of one job: a stage (voice, media, render, encode,
+    music, upload) of a video or one of its scenes, optionally with done/total.
+
+    Events are handed to sink(event). Partial updates of the same (stage, video,
+    scene) are dropped when they come less than min_interval seconds after the last
+    one sent, so calling emit() for every rendered frame costs a dict lookup; the
+    final update of a step is always sent.
+    """
+
+    def __init__(self, sink, min_interval=None):
+        self.sink = sink
+        self.min_interval = Config.PROGRESS_MIN_INTERVAL if min_interval is None else min_interval
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def emit(self, stage, video=None, scene=None, done=None, total=None, final=False, **data):
+        """Sends the event unless it is throttled; returns whether it was sent."""
+        key = (stage, video, scene)
+        final = final or bool(total and done is not None and done >= total)
+        now = time.monotonic()
+        with self._lock:
+            if not final and now - self._last.get(key, float("-inf")) < self.min_interval:
+                return False
+            self._last[key] = now
+        event = {"stage": stage, "video": video, "scene": scene, "final": final, "time": time.time()}
+        if total:
+            event.update(done=done, total=total)
+        event.update(data)
+        self.sink(event)
+        return True
+
+    def frame_logger(self, stage, video=None, scene=None):
+        """A MoviePy logger (write_videofile(logger=...)) that reports frames written."""
+        return _FrameLogger(self, stage, video, scene)
+
+
+class _FrameLogger(ProgressBarLogger):
+    def __init__(self, reporter, stage, video, scene):
+        super().__init__()
+        self.reporter = reporter
+        self.stage = stage
+        self.video = video
+        self.scene = scene
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        # MoviePy counts written video frames on the "t" bar (audio chunks are on "chunk")
+        if bar == "t" and attr == "index":
+            self.reporter.emit(self.stage, self.video, self.scene, done=value + 1, total=self.bars[bar]["total"])
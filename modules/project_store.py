@@ -0,0 +1,253 @@
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+
+class ProjectStore():
+    """
+    Per-project metadata in SQLite (WAL mode): videos, scenes, scene assets and
+    stage status, all keyed by (video, scene).
+
+    Updating one scene is a single-row upsert in its own transaction, so parallel
+    image, footage and render workers no longer reread and rewrite whole JSON files
+    (or overwrite each other's changes). script_videos.json and image_paths.json
+    stay the exchange format: import_json() loads them and the export_* methods
+    write them atomically from the store.
+    """
+
+    # Database file inside a project folder
+    FILE_NAME = 'project.db'
+
+    # Assets that make up an image_paths.json scene entry
+    IMAGE_PATH_KINDS = ("image_path", "google_image_path")
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.init_create_db()
+
+    @classmethod
+    def shared(cls, db_name):
+        with cls._instances_lock:
+            if db_name not in cls._instances:
+                cls._instances[db_name] = cls(db_name)
+            return cls._instances[db_name]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_create_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS videos (
+            video_id TEXT PRIMARY KEY,
+            caption TEXT,
+            updated_at REAL
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS scenes (
+            video_id TEXT,
+            scene_id TEXT,
+            position INTEGER,
+            data TEXT,
+            updated_at REAL,
+            PRIMARY KEY (video_id, scene_id)
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS assets (
+            video_id TEXT,
+            scene_id TEXT,
+            kind TEXT,
+            path TEXT,
+            updated_at REAL,
+            PRIMARY KEY (video_id, scene_id, kind)
+        )''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS stage_status (
+            video_id TEXT,
+            scene_id TEXT,
+            stage TEXT,
+            status TEXT,
+            detail TEXT,
+            updated_at REAL,
+            PRIMARY KEY (video_id, scene_id, stage)
+        )''')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def _video_key(video_id):
+        return str(video_id)
+
+    @staticmethod
+    def _video_value(video_key):
+        # The JSON files use integer video ids
+        return int(video_key) if video_key.lstrip('-').isdigit() else video_key
+
+    @classmethod
+    def _sorted_video_keys(cls, keys):
+        # Numeric ids in numeric order first, then any others
+        return sorted(keys, key=lambda key: (0, int(key), "") if isinstance(cls._video_value(key), int) else (1, 0, key))
+
+    def is_empty(self):
+        conn = self._connect()
+        count = conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0] + conn.execute('SELECT COUNT(*) FROM assets').fetchone()[0]
+        conn.close()
+        return count == 0
+
+    # --- Videos and scenes ---
+
+    def _upsert_video(self, conn, video):
+        video_key = self._video_key(video["video"])
+        now = time.time()
+        conn.execute('''INSERT INTO videos (video_id, caption, updated_at) VALUES (?, ?, ?)
+                        ON CONFLICT (video_id) DO UPDATE SET caption = excluded.caption, updated_at = excluded.updated_at''',
+                     (video_key, video.get("caption"), now))
+        conn.execute('DELETE FROM scenes WHERE video_id = ?', (video_key,))
+        conn.executemany('INSERT INTO scenes (video_id, scene_id, position, data, updated_at) VALUES (?, ?, ?, ?, ?)',
+                         [(video_key, str(scene["scene"]), position, json.dumps(scene, ensure_ascii=False), now)
+                          for position, scene in enumerate(video.get("scenes", []))])
+
+    def upsert_video(self, video):
+        """Stores a script_videos.json video dict (video, caption, scenes) in one transaction."""
+        conn = self._connect()
+        with conn:
+            self._upsert_video(conn, video)
+        conn.close()
+
+    def replace_videos(self, videos):
+        """Replaces all videos and scenes, as writing a new script_videos.json did."""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM videos')
+            conn.execute('DELETE FROM scenes')
+            for video in videos:
+                self._upsert_video(conn, video)
+        conn.close()
+
+    def get_video(self, video_id):
+        video_key = self._video_key(video_id)
+        conn = self._connect()
+        row = conn.execute('SELECT caption FROM videos WHERE video_id = ?', (video_key,)).fetchone()
+        scenes = conn.execute('SELECT data FROM scenes WHERE video_id = ? ORDER BY position', (video_key,)).fetchall()
+        conn.close()
+        if row is None:
+            return None
+        video = {"video": self._video_value(video_key), "scenes": [json.loads(data) for data, in scenes]}
+        if row[0] is not None:
+            video["caption"] = row[0]
+        return video
+
+    def videos(self):
+        conn = self._connect()
+        keys = [key for key, in conn.execute('SELECT video_id FROM videos').fetchall()]
+        conn.close()
+        return [self.get_video(key) for key in self._sorted_video_keys(keys)]
+
+    # --- Assets ---
+
+    def set_asset(self, video_id, scene_id, kind, path):
+        conn = self._connect()
+        with conn:
+            conn.execute('''INSERT INTO assets (video_id, scene_id, kind, path, updated_at) VALUES (?, ?, ?, ?, ?)
+                            ON CONFLICT (video_id, scene_id, kind) DO UPDATE SET path = excluded.path, updated_at = excluded.updated_at''',
+                         (self._video_key(video_id), str(scene_id), kind, path or "", time.time()))
+        conn.close()
+
+    def set_scene_assets(self, video_id, scene_id, **paths):
+        """Sets several asset kinds of one scene at once, e.g. image_path=..., google_image_path=..."""
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany('''INSERT INTO assets (video_id, scene_id, kind, path, updated_at) VALUES (?, ?, ?, ?, ?)
+                                ON CONFLICT (video_id, scene_id, kind) DO UPDATE SET path = excluded.path, updated_at = excluded.updated_at''',
+                             [(self._video_key(video_id), str(scene_id), kind, path or "", now) for kind, path in paths.items()])
+        conn.close()
+
+    def get_asset(self, video_id, scene_id, kind):
+        conn = self._connect()
+        row = conn.execute('SELECT path FROM assets WHERE video_id = ? AND scene_id = ? AND kind = ?',
+                           (self._video_key(video_id), str(scene_id), kind)).fetchone()
+        conn.close()
+        return row[0] if row else None
+
+    def scene_assets(self, video_id):
+        """{scene_id: {kind: path}} for one video."""
+        conn = self._connect()
+        # Scene order of the script where known, numeric scene id otherwise
+        rows = conn.execute('''SELECT a.scene_id, a.kind, a.path FROM assets a
+                               LEFT JOIN scenes s ON s.video_id = a.video_id AND s.scene_id = a.scene_id
+                               WHERE a.video_id = ?
+                               ORDER BY s.position IS NULL, s.position, CAST(a.scene_id AS INTEGER), a.scene_id''',
+                            (self._video_key(video_id),)).fetchall()
+        conn.close()
+        assets = {}
+        for scene_id, kind, path in rows:
+            assets.setdefault(scene_id, {})[kind] = path
+        return assets
+
+    # --- Stage status ---
+
+    def set_stage(self, video_id, stage, status, scene_id="", detail=""):
+        conn = self._connect()
+        with conn:
+            conn.execute('''INSERT INTO stage_status (video_id, scene_id, stage, status, detail, updated_at) VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT (video_id, scene_id, stage) DO UPDATE SET status = excluded.status, detail = excluded.detail, updated_at = excluded.updated_at''',
+                         (self._video_key(video_id), str(scene_id), stage, status, detail, time.time()))
+        conn.close()
+
+    def stage_status(self, video_id):
+        """{(scene_id, stage): status}; video-level stages have scene_id ''."""
+        conn = self._connect()
+        rows = conn.execute('SELECT scene_id, stage, status FROM stage_status WHERE video_id = ?', (self._video_key(video_id),)).fetchall()
+        conn.close()
+        return {(scene_id, stage): status for scene_id, stage, status in rows}
+
+    # --- JSON import/export ---
+
+    def import_json(self, script_videos_path=None, image_paths_path=None):
+        if script_videos_path and os.path.exists(script_videos_path):
+            with open(script_videos_path, 'r', encoding='utf-8') as f:
+                self.replace_videos(json.load(f))
+        if image_paths_path and os.path.exists(image_paths_path):
+            with open(image_paths_path, 'r', encoding='utf-8') as f:
+                image_paths = json.load(f)
+            for video in image_paths:
+                for scene in video.get("scenes", []):
+                    self.set_scene_assets(video["video"], scene["scene"], **{kind: scene.get(kind, "") for kind in self.IMAGE_PATH_KINDS})
+
+    @staticmethod
+    def _write_atomic(path, data):
+        # A temp file of its own per writer, so concurrent exports never share one
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                # mkstemp creates the file private to the owner
+                os.fchmod(f.fileno(), 0o644)
+                json.dump(data, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def export_script_videos(self, path):
+        self._write_atomic(path, self.videos())
+
+    def export_image_paths(self, path):
+        conn = self._connect()
+        keys = [key for key, in conn.execute('SELECT DISTINCT video_id FROM assets').fetchall()]
+        conn.close()
+        data = []
+        for key in self._sorted_video_keys(keys):
+            scenes = [{"scene": scene_id, **{kind: assets.get(kind, "") for kind in self.IMAGE_PATH_KINDS}}
+                      for scene_id, assets in self.scene_assets(key).items()
+                      if any(kind in assets for kind in self.IMAGE_PATH_KINDS)]
+            if scenes:
+                data.append({"video": self._video_value(key), "scenes": scenes})
+        self._write_atomic(path, data)
@@ -0,0 +1,95 @@
+import threading
+import time
+from collections import defaultdict, deque
+
+
+class QuotaPacer():
+    """
+    Paces requests against per-minute request (RPM) and token (TPM) quotas.
+
+    Every key (usually a model id) has its own sliding window of recent requests.
+    acquire() returns immediately while the window has room and only sleeps for as
+    long as it takes the oldest request to leave the window. backoff() blocks a key
+    after a 429 for the retry-after the provider asked for.
+    """
+
+    # Pacers are shared per provider so all writers in the process draw from one quota
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, rpm=None, tpm=None, window=60):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self._lock = threading.Lock()
+        self._requests = defaultdict(deque)
+        self._blocked_until = defaultdict(float)
+        self.total_wait = 0.0
+
+    @classmethod
+    def shared(cls, name, **kwargs):
+        with cls._instances_lock:
+            if name not in cls._instances:
+                cls._instances[name] = cls(**kwargs)
+            return cls._instances[name]
+
+    @staticmethod
+    def estimate_tokens(text):
+        # Roughly four characters per token for English text
+        return len(text or "") // 4 + 1
+
+    def acquire(self, key=None, tokens=0):
+        """
+        Waits until a request of the given token size fits the quota, then records it.
+        Returns the recorded entry, which can be passed to record_usage() once the real
+        token count is known.
+        """
+        while True:
+            with self._lock:
+                now = time.time()
+                requests = self._requests[key]
+                while requests and requests[0][0] <= now - self.window:
+                    requests.popleft()
+
+                wait = self._blocked_until[key] - now
+                if self.rpm and len(requests) >= self.rpm:
+                    wait = max(wait, requests[0][0] + self.window - now)
+                if self.tpm and requests:
+                    # Wait until enough old requests have left the window to fit this one
+                    used = sum(entry[1] for entry in requests)
+                    for timestamp, entry_tokens in list(requests):
+                        if used + tokens <= self.tpm:
+                            break
+                        used -= entry_tokens
+                        wait = max(wait, timestamp + self.window - now)
+
+                if wait <= 0:
+                    entry = [now, tokens]
+                    requests.append(entry)
+                    return entry
+                self.total_wait += wait
+            print(f"Quota pacing {key}: waiting {wait:.1f}s")
+            time.sleep(wait)
+
+    def record_usage(self, entry, tokens):
+        """Replaces the estimated token count of an acquired request with the actual one."""
+        with self._lock:
+            entry[1] = tokens
+
+    def backoff(self, key=None, retry_after=None):
+        """Blocks the key for retry_after seconds (the rest of the window if unknown)."""
+        with self._lock:
+            delay = retry_after if retry_after else self.window
+            self._blocked_until[key] = max(self._blocked_until[key], time.time() + delay)
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {
+                key: {
+                    "requests_in_window": sum(1 for entry in requests if entry[0] > now - self.window),
+                    "tokens_in_window": sum(entry[1] for entry in requests if entry[0] > now - self.window),
+                    "blocked_for": max(0, self._blocked_until[key] - now),
+                }
+                for key, requests in self._requests.items()
+            }
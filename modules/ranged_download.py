@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from config import Config
+from modules.http_transport import HttpTransport
+
+
+class RangedDownload():
+    """
+    Resumable file download, split into parallel HTTP range requests when large.
+
+    The body is written to <file>.part and only renamed to the final path once it
+    is complete. For ranged downloads the bytes finished in each segment are kept in
+    <file>.part.json, so an interrupted download continues where every segment
+    stopped instead of starting over. Servers without range support, and files
+    under min_part_size, are streamed over a single connection (still resumable
+    when ranges are supported).
+    """
+
+    def __init__(self, parts=None, min_part_size=None, chunk_size=None):
+        self.parts = parts or Config.DOWNLOAD_PARTS
+        self.min_part_size = min_part_size or Config.DOWNLOAD_MIN_PART_SIZE
+        self.chunk_size = chunk_size or Config.DOWNLOAD_CHUNK_SIZE
+
+    def download(self, url, file_path):
+        """Downloads url to file_path and returns file_path; raises requests.RequestException on failure."""
+        if os.path.exists(file_path):
+            return file_path
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        size, accepts_ranges = self._probe(url)
+        part_path = file_path + ".part"
+        if accepts_ranges and size and size >= 2 * self.min_part_size and self.parts > 1:
+            self._download_parallel(url, part_path, size)
+        else:
+            self._download_single(url, part_path, accepts_ranges)
+        os.replace(part_path, file_path)
+        return file_path
+
+    @staticmethod
+    def _probe(url):
+        try:
+            response = HttpTransport.request("HEAD", url, allow_redirects=True, timeout=HttpTransport.default_timeout(30))
+        except requests.RequestException as e:
+            # Some CDNs drop HEAD requests; the single-stream GET still works there
+            print(f"HEAD {url} failed ({e}), downloading in one stream")
+            return None, False
+        if response.status_code >= 400:
+            return None, False
+        size = int(response.headers.get("Content-Length") or 0) or None
+        return size, response.headers.get("Accept-Ranges", "").lower() == "bytes"
+
+    def _download_single(self, url, part_path, accepts_ranges):
+        offset = os.path.getsize(part_path) if accepts_ranges and os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        response = HttpTransport.get(url, headers=headers, stream=True)
+        response.raise_for_status()
+        if offset and response.status_code != 206:
+            # The server ignored the range, start over
+            offset = 0
+        with open(part_path, "ab" if offset else "wb") as file:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                file.write(chunk)
+
+    def _download_parallel(self, url, part_path, size):
+        progress_path = part_path + ".json"
+        segments = self._load_progress(progress_path, size)
+        if segments is None or not os.path.exists(part_path):
+            part_size = max(self.min_part_size, -(-size // self.parts))
+            segments = [[start, min(start + part_size, size) - 1, 0] for start in range(0, size, part_size)]
+            with open(part_path, "wb") as file:
+                file.truncate(size)
+
+        lock = threading.Lock()
+
+        def save_progress():
+            with lock:
+                with open(progress_path, "w") as f:
+                    json.dump({"size": size, "segments": segments}, f)
+
+        def fetch(segment):
+            start, end, done = segment
+            if start + done > end:
+                return
+            response = HttpTransport.get(url, headers={"Range": f"bytes={start + done}-{end}"}, stream=True)
+            response.raise_for_status()
+            if response.status_code != 206:
+                raise requests.RequestException(f"Range request for {url} returned status code {response.status_code}")
+            with open(part_path, "r+b") as file:
+                file.seek(start + done)
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    file.write(chunk)
+                    with lock:
+                        segment[2] += len(chunk)
+            save_progress()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.parts) as executor:
+                for future in [executor.submit(fetch, segment) for segment in segments]:
+                    future.result()
+        except BaseException:
+            save_progress()
+            raise
+        if any(start + done <= end for start, end, done in segments):
+            save_progress()
+            raise requests.RequestException(f"Download of {url} ended before all ranges were complete")
+        if os.path.exists(progress_path):
+            os.remove(progress_path)
+
+    @staticmethod
+    def _load_progress(progress_path, size):
+        try:
+            with open(progress_path) as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return progress["segments"] if progress.get("size") == size else None
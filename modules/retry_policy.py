@@ -0,0 +1,201 @@
+import asyncio
+import random
+import threading
+import time
+from config import Config
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+
+class HTTPStatusError(Exception):
+    """Raised by request attempts that got a non-success status code."""
+
+    def __init__(self, status_code, message=""):
+        super().__init__(message or f"Status code: {status_code}")
+        self.status_code = status_code
+
+
+class CircuitBreaker():
+    """
+    Per-endpoint circuit breaker.
+
+    After failure_threshold consecutive failures the circuit opens and calls fail
+    fast with CircuitOpenError. Once reset_timeout has passed a single probe call is
+    let through (half-open); its success closes the circuit, its failure opens it again.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_at = 0
+        self.probe_in_flight = False
+        self.successes = 0
+        self.failures = 0
+        self.rejected = 0
+
+    @classmethod
+    def for_endpoint(cls, name, **kwargs):
+        with cls._instances_lock:
+            if name not in cls._instances:
+                cls._instances[name] = cls(name, **kwargs)
+            return cls._instances[name]
+
+    @classmethod
+    def metrics(cls):
+        with cls._instances_lock:
+            breakers = list(cls._instances.values())
+        return {breaker.name: breaker.stats() for breaker in breakers}
+
+    def allow(self):
+        with self._lock:
+            if self.state == "open" and time.time() - self.opened_at >= self.reset_timeout:
+                self.state = "half_open"
+                self.probe_in_flight = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self.probe_in_flight:
+                self.probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.consecutive_failures = 0
+            self.state = "closed"
+            self.probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.consecutive_failures += 1
+            if self.state == "half_open" or self.consecutive_failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"Circuit for {self.name} opened after {self.consecutive_failures} failures")
+                self.state = "open"
+                self.opened_at = time.time()
+            self.probe_in_flight = False
+
+    def retry_in(self):
+        """Seconds until the next probe is allowed (0 unless the circuit is open)."""
+        with self._lock:
+            if self.state != "open":
+                return 0
+            return max(0, self.opened_at + self.reset_timeout - time.time())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self.state,
+                "consecutive_failures": self.consecutive_failures,
+                "successes": self.successes,
+                "failures": self.failures,
+                "rejected": self.rejected,
+            }
+
+
+class RetryPolicy():
+    """
+    Exponential backoff with full jitter, bounded by max_attempts and a deadline.
+
+    call() runs the attempt function through the endpoint's circuit breaker and
+    sleeps base_delay * 2^n (capped at max_delay, randomised) between attempts. It
+    gives up early when the circuit is open or the next sleep would pass the deadline,
+    raising the last error, so a dead provider frees its worker within seconds.
+    """
+
+    # Client errors that will not go away by retrying
+    NON_RETRYABLE_STATUS = {400, 401, 403, 404, 405, 413, 422}
+
+    def __init__(self, max_attempts=5, base_delay=1, max_delay=30, deadline=120, failure_threshold=5, reset_timeout=30):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+    @classmethod
+    def from_config(cls):
+        return cls(
+            max_attempts=Config.RETRY_MAX_ATTEMPTS,
+            base_delay=Config.RETRY_BASE_DELAY,
+            max_delay=Config.RETRY_MAX_DELAY,
+            deadline=Config.RETRY_DEADLINE,
+            failure_threshold=Config.CIRCUIT_FAILURE_THRESHOLD,
+            reset_timeout=Config.CIRCUIT_RESET_TIMEOUT,
+        )
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def is_retryable(self, error):
+        return getattr(error, "status_code", None) not in self.NON_RETRYABLE_STATUS
+
+    def call(self, func, endpoint, deadline=None, max_attempts=None):
+        breaker = CircuitBreaker.for_endpoint(endpoint, failure_threshold=self.failure_threshold, reset_timeout=self.reset_timeout)
+        deadline = self.deadline if deadline is None else deadline
+        deadline_at = time.time() + deadline if deadline else None
+        max_attempts = max_attempts or self.max_attempts
+        last_error = None
+        for attempt in range(max_attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit for {endpoint} is open, retry in {breaker.retry_in():.0f}s") from last_error
+            try:
+                result = func()
+            except Exception as e:
+                if not self.is_retryable(e):
+                    # The endpoint answered, the request itself is wrong
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                last_error = e
+                delay = self.backoff(attempt)
+                if attempt + 1 >= max_attempts or (deadline_at and time.time() + delay >= deadline_at):
+                    break
+                print(f"{endpoint} attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f}s...")
+                time.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
+        raise last_error
+
+    async def acall(self, func, endpoint, deadline=None, max_attempts=None):
+        """call() for coroutine functions; waits with asyncio.sleep so the event loop keeps running."""
+        breaker = CircuitBreaker.for_endpoint(endpoint, failure_threshold=self.failure_threshold, reset_timeout=self.reset_timeout)
+        deadline = self.deadline if deadline is None else deadline
+        deadline_at = time.time() + deadline if deadline else None
+        max_attempts = max_attempts or self.max_attempts
+        last_error = None
+        for attempt in range(max_attempts):
+            if not breaker.allow():
+                raise CircuitOpenError(f"Circuit for {endpoint} is open, retry in {breaker.retry_in():.0f}s") from last_error
+            try:
+                result = await func()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self.is_retryable(e):
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                last_error = e
+                delay = self.backoff(attempt)
+                if attempt + 1 >= max_attempts or (deadline_at and time.time() + delay >= deadline_at):
+                    break
+                print(f"{endpoint} attempt {attempt + 1} failed: {e}. Retrying in {delay:.1f}s...")
+                await asyncio.sleep(delay)
+                continue
+            breaker.record_success()
+            return result
+        raise last_error
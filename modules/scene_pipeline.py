@@ -0,0 +1,194 @@
+import asyncio
+import json
+import os
+import re
+import time
+from modules.base_generator import BaseGenerator
+from modules.writer.script_repair import ScriptRepair, ScriptValidationError
+
+
+class IncrementalSceneParser():
+    """
+    Pulls complete scene objects out of a streamed Videos JSON document.
+
+    feed() takes the next chunk of text and returns the scenes whose closing brace
+    has arrived since the last call. It only tracks string/escape state and bracket
+    depth, so each character is looked at once no matter how the stream is chunked.
+    """
+
+    # The key in front of a scenes array, in any case and with any spacing around the colon
+    SCENES_KEY = re.compile(r'"scenes"\s*:\s*$', re.IGNORECASE)
+
+    def __init__(self):
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.in_scenes = False
+        self.scene_start = None
+        self.text = ""
+        self.position = 0
+
+    def feed(self, chunk):
+        self.text += chunk
+        scenes = []
+        while self.position < len(self.text):
+            char = self.text[self.position]
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in '{[':
+                self.depth += 1
+                if char == '[' and self.depth == 2 and self.SCENES_KEY.search(self.text[max(0, self.position - 40):self.position]):
+                    self.in_scenes = True
+                elif char == '{' and self.in_scenes and self.depth == 3:
+                    self.scene_start = self.position
+            elif char in '}]':
+                if char == '}' and self.in_scenes and self.depth == 3 and self.scene_start is not None:
+                    scene = self._parse_scene(self.text[self.scene_start:self.position + 1])
+                    if scene:
+                        scenes.append(scene)
+                    self.scene_start = None
+                if char == ']' and self.in_scenes and self.depth == 2:
+                    self.in_scenes = False
+                self.depth -= 1
+            self.position += 1
+        return scenes
+
+    @staticmethod
+    def _parse_scene(text):
+        try:
+            return ScriptRepair.coerce({"Scenes": [json.loads(text)]})["Scenes"][0]
+        except (ValueError, ScriptValidationError) as e:
+            print(f"Skipping unparsable streamed scene: {e}")
+            return None
+
+
+class ScenePipeline(BaseGenerator):
+    """
+    Streaming orchestration from prompt to ready scenes.
+
+    The script is streamed from Gemini and every scene is handed to the voice and
+    media stages as soon as its JSON object is complete. Each stage has a bounded
+    asyncio queue (backpressure: the producer stops reading the stream while the
+    queues are full) and a fixed number of workers running the blocking generators
+    in threads. on_scene_ready(scene) is called for every scene whose voiceover and
+    media are both done, so rendering can start after the first scene instead of
+    after the whole script.
+    """
+
+    def __init__(self, project_folder, writer, voice_generator, image_generator, footage_downloader=None,
+                 voice="nova", voice_workers=2, media_workers=4, queue_size=8, generation_chance=0.3, on_scene_ready=None):
+        super().__init__(project_folder)
+        self.writer = writer
+        self.voice_generator = voice_generator
+        self.image_generator = image_generator
+        self.footage_downloader = footage_downloader
+        self.voice = voice
+        self.voice_workers = voice_workers
+        self.media_workers = media_workers
+        self.queue_size = queue_size
+        self.generation_chance = generation_chance
+        self.on_scene_ready = on_scene_ready
+        self.first_scene_ready_after = None
+
+    def execute(self, prompt, video_id=1):
+        return asyncio.run(self.run(prompt, video_id))
+
+    async def run(self, prompt, video_id=1):
+        start_time = time.time()
+        voice_queue = asyncio.Queue(maxsize=self.queue_size)
+        media_queue = asyncio.Queue(maxsize=self.queue_size)
+        scenes = []
+        progress = {}
+
+        async def scene_done(scene, stage, result=None):
+            entry = progress.setdefault(scene["scene"], {"stages": set(), "media_path": ""})
+            entry["stages"].add(stage)
+            if stage == "media":
+                entry["media_path"] = result or ""
+                await asyncio.to_thread(self.store.set_scene_assets, video_id, scene["scene"], image_path=entry["media_path"], google_image_path="")
+            if entry["stages"] == {"voice", "media"}:
+                if self.first_scene_ready_after is None:
+                    self.first_scene_ready_after = time.time() - start_time
+                    print(f"First scene ready after {self.first_scene_ready_after:.1f}s")
+                if self.on_scene_ready:
+                    try:
+                        await asyncio.to_thread(self.on_scene_ready, dict(scene, media_path=entry["media_path"]))
+                    except Exception as e:
+                        print(f"on_scene_ready failed for scene {scene['scene']}: {e}")
+
+        async def voice_worker():
+            while True:
+                scene = await voice_queue.get()
+                try:
+                    await asyncio.to_thread(self.voice_generator.execute, video_id, scene["scene"], scene["text"], self.voice)
+                except Exception as e:
+                    print(f"Voice generation failed for scene {scene['scene']}: {e}")
+                # task_done only after the hand-off, so join() also waits for on_scene_ready
+                await scene_done(scene, "voice")
+                voice_queue.task_done()
+
+        async def media_worker():
+            while True:
+                scene = await media_queue.get()
+                media_path = ""
+                try:
+                    media_path = await asyncio.to_thread(self.fetch_media, video_id, scene)
+                except Exception as e:
+                    print(f"Media fetch failed for scene {scene['scene']}: {e}")
+                await scene_done(scene, "media", media_path)
+                media_queue.task_done()
+
+        workers = [asyncio.create_task(voice_worker()) for _ in range(self.voice_workers)]
+        workers += [asyncio.create_task(media_worker()) for _ in range(self.media_workers)]
+
+        loop = asyncio.get_running_loop()
+
+        def produce():
+            # Runs in a thread: reading the stream blocks, and queue.put() blocks it when the stages fall behind
+            parser = IncrementalSceneParser()
+            for chunk in self.writer.stream_script_gemini(prompt):
+                for scene_object in parser.feed(chunk):
+                    scene = {
+                        "scene": str(len(scenes) + 1),
+                        "text": self.remove_symbols_script(scene_object["What_Speaker_Says_In_First_Person"].replace("'", "")),
+                        "visuals": scene_object["Visuals"],
+                    }
+                    scenes.append(scene)
+                    asyncio.run_coroutine_threadsafe(voice_queue.put(scene), loop).result()
+                    asyncio.run_coroutine_threadsafe(media_queue.put(scene), loop).result()
+
+        try:
+            await asyncio.to_thread(produce)
+            await voice_queue.join()
+            await media_queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        video = {"video": video_id, "scenes": scenes}
+        self.store.upsert_video(video)
+        self.store.export_script_videos(self.script_videos_file_path)
+        self.store.export_image_paths(self.image_paths_file_path)
+        return video
+
+    def fetch_media(self, video_id, scene):
+        """Generated image first (with the configured chance), stock footage otherwise."""
+        self.image_generator.execute(video_id, scene["scene"], scene["visuals"], generation_chance=self.generation_chance)
+        image_path = ""
+        # The scenes list is shared between media workers, so look the scene up instead of taking the last one
+        for scene_data in self.image_generator.videos[video_id]["scenes"]:
+            if scene_data["scene"] == scene["scene"]:
+                image_path = scene_data["image_path"]
+        if image_path and os.path.exists(image_path):
+            return image_path
+        if self.footage_downloader:
+            return self.footage_downloader.execute(scene["visuals"], mode='video', orientation='portrait') or ""
+        return ""
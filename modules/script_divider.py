@@ -1,114 +1,321 @@
-import re
-import json
-from modules.base_generator import BaseGenerator
-from modules.writer.writer import Writer
-from collections import defaultdict
-from config import Config
-
-
-class ScriptDivider(BaseGenerator):
-    def __init__(self, project_folder, append=False):
-        # Call the constructor of the base class
-        super().__init__(project_folder)
-        self.header = '"Scene" |^| "Duration" |^| "Text" |^| "Visuals" |^| "Hashtags" |^| "Description"'
-        self.header_met = False
-        self.videos = self.initialize_videos(self.script_videos_file_path, append)
-        self.current_video_id = len(self.videos)
-
-    def read_script_data(self):
-        data = self.read_csv(self.script_file_path)
-        return data
-    
-    def execute(self, shorten_speech=False):
-        script_file_path = self.script_file_path
-
-
-        with open(script_file_path, "r", encoding="utf-8") as f:
-            old_json_strings = f.readlines()
-            new_json_data = self.transform_data(old_json_strings, shorten_speech=shorten_speech)
-
-        self.write_json(self.script_videos_file_path, new_json_data)
-
-    def transform_data(self, old_json_strings, shorten_speech=False):
-        """
-        Accepts a list of JSON strings in the old format
-        and returns a list of dictionaries in the new format.
-        """
-        result = []
-        for index, json_str in enumerate(old_json_strings, start=1):
-            json_str = json_str.strip()
-            if json_str.startswith('"') and json_str.endswith('"'):
-                json_str = json_str[1:-1].replace('""', '"').replace("*", "")
-            old_data = json.loads(json_str)
-    
-            scene_objects = old_data.get("Scenes", [])
-            
-            scenes_list = []
-            scenes_text = ""
-            for i, s_obj in enumerate(scene_objects, start=1):
-                text = s_obj.get("What_Speaker_Says_In_First_Person", "")
-                if shorten_speech:
-                    writer = Writer(Config.NAGA_AC_API_KEY, Config.GEMINI_API_KEY, Config.GROQ_API_KEY)
-                    text = writer.generate_text_gemini(text + " the last time it was too long, please generate a way shorter text maintaining the same speaker tone and meaning. Separate the actual text you generated with symbol '|' from start to end, as if they were quotes. For example: 'Here is the text I generated: |This is very good! Check the link!|'. Another example: 'I shortened the text as you asked: |Get the product from the link!|'.", structure=False)
-                    print('shorten_speech from prompt (not clean): ', text)
-                    # get the text between the quotes
-                    text = re.search(r"\|(.+?)\|", text)
-                    if text:
-                        text = text.group(1).strip()
-                    else:
-                        text = s_obj.get("What_Speaker_Says_In_First_Person", "")
-                    
-                scenes_list.append({
-                    "scene": str(i),
-                    # "duration": 3,
-                    "text": self.remove_symbols_script(text.replace("'", "")),
-                    "visuals": s_obj.get("Visuals", ""),
-                    # "hashtags": old_data.get("Hashtags", ""),
-                    # "description": old_data.get("Description", "")
-                })
-                scenes_text += f"{i}. {s_obj.get('What_Speaker_Says_In_First_Person', '')}\n"
-                scenes_text += f"{s_obj.get('Visuals', '')}\n\n"
-
-            writer = Writer(Config.NAGA_AC_API_KEY, Config.GEMINI_API_KEY, Config.GROQ_API_KEY)
-
-            system_prompt = """Write an engaging caption for the video based on given description that will be posted on instagram. Make them quite short, but include all the parts recommended.
-
-            HOOK (H): Grab attention in the first place with an awesome opening line which baits your audience to read into your caption...This could be the beginning of your storytelling, just one line which encourages readers to continue, you want to make sure as many people as possible go through your captions, you'll sell more!
-
-            RELATABILITY (R): Be relatable, your beliefs must be similar to those of your audience. What I mean is, if you write a belief about how life-ruining a 9-5 job can be, you should know that your ideal customer is currently in a 9-5 job & will strongly resonate with what you are writing down! Be relatable all along, this works for writing captions but implement it everywhere, especially in your stories too, but we'll get into that later on.
-
-            CALL TO ACTION (CTA): End your captions, and every single one of them, with a call to action. More often than not, this CTA must be towards selling your product, but in order to not have a selling CTA each time, you can make sure than out of 42 captions you write (so 3 a day for 2 weeks before starting over) 12 of them are not related to your products, so it can be a CTA such as "make sure to watch my stories to not miss out on exclusive motivation tips!" Or a CTA such as "Follow @xprofile for more content on X!"
-
-            For all your other captions & CTAs make sure they are CTAs relating to your products & services, such as "If you're looking to build a business on Instagram & do not know where to start, make sure to DM me the word 'IGMONEY' and I'll get back to you to see if you fit to work 1 on 1 with me!"
-            
-            Do NOT explain what you are doing, just write the caption as if you were writing it for your own Instagram account.
-
-            Make sure it is very shortened, less than 100 characters.
-            """
-
-            caption = writer.generate_text_pollinations(scenes_text)
-
-
-            result.append({
-                "video": index,
-                "caption": caption,
-                "scenes": scenes_list
-            })
-
-        return result
-
-
-    def initialize_videos(self, json_file_path, append):
-        videos = defaultdict(lambda: {"scenes": []}) 
-        if not append:
-            return videos 
-        # Load the initial videos data from a JSON file 
-        initial_videos = self.read_json(json_file_path)
-        # Convert the list to a defaultdict 
-        for video in initial_videos: 
-            video_id = video["video"] 
-            videos[video_id]["scenes"] = video["scenes"] 
-
-        return videos
-
+import os
+import re
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from modules.base_generator import BaseGenerator
+from modules.writer.writer import Writer
+from collections import defaultdict
+from config import Config
+
+
+class ScriptDivider(BaseGenerator):
+    CAPTION_SYSTEM_PROMPT = """Write an engaging caption for the video based on given description that will be posted on instagram. Make them quite short, but include all the parts recommended.
+
+            HOOK (H): Grab attention in the first place with an awesome opening line which baits your audience to read into your caption...This could be the beginning of your storytelling, just one line which encourages readers to continue, you want to make sure as many people as possible go through your captions, you'll sell more!
+
+            RELATABILITY (R): Be relatable, your beliefs must be similar to those of your audience. What I mean is, if you write a belief about how life-ruining a 9-5 job can be, you should know that your ideal customer is currently in a 9-5 job & will strongly resonate with what you are writing down! Be relatable all along, this works for writing captions but implement it everywhere, especially in your stories too, but we'll get into that later on.
+
+            CALL TO ACTION (CTA): End your captions, and every single one of them, with a call to action. More often than not, this CTA must be towards selling your product, but in order to not have a selling CTA each time, you can make sure than out of 42 captions you write (so 3 a day for 2 weeks before starting over) 12 of them are not related to your products, so it can be a CTA such as "make sure to watch my stories to not miss out on exclusive motivation tips!" Or a CTA such as "Follow @xprofile for more content on X!"
+
+            For all your other captions & CTAs make sure they are CTAs relating to your products & services, such as "If you're looking to build a business on Instagram & do not know where to start, make sure to DM me the word 'IGMONEY' and I'll get back to you to see if you fit to work 1 on 1 with me!"
+            
+            Do NOT explain what you are doing, just write the caption as if you were writing it for your own Instagram account.
+
+            Make sure it is very shortened, less than 100 characters.
+            """
+
+    def __init__(self, project_folder, append=False):
+        # Call the constructor of the base class
+        super().__init__(project_folder)
+        self.header = '"Scene" |^| "Duration" |^| "Text" |^| "Visuals" |^| "Hashtags" |^| "Description"'
+        self.header_met = False
+        self.videos = self.initialize_videos(self.script_videos_file_path, append)
+        self.current_video_id = len(self.videos)
+        self._writer = None
+
+    @property
+    def writer(self):
+        # Created on first use, so reading or indexing a script never sets up the LLM clients
+        if self._writer is None:
+            self._writer = Writer(Config.POLLINATIONS_API_KEY, Config.GEMINI_API_KEY)
+        return self._writer
+
+    def read_script_data(self):
+        data = self.read_csv(self.script_file_path)
+        return data
+    
+    def execute(self, shorten_speech=False, shorten_scope='video'):
+        script_file_path = self.script_file_path
+
+
+        with open(script_file_path, "r", encoding="utf-8") as f:
+            old_json_strings = f.readlines()
+            new_json_data = self.transform_data(old_json_strings, shorten_speech=shorten_speech, shorten_scope=shorten_scope)
+
+        self.store.replace_videos(new_json_data)
+        self.store.export_script_videos(self.script_videos_file_path)
+
+    def execute_streaming(self, shorten_speech=False, consolidate=True):
+        """
+        Streaming variant of execute(). Script records are read one at a time and each
+        finished video is appended to script_videos.jsonl (with its byte offset in
+        script_videos.index), so memory stays flat and a restart resumes after the
+        last video that was written. script_videos.json is optionally rebuilt at the end.
+
+        Use it instead of execute() for script files too large to transform in memory,
+        or when a run may be interrupted. It is not what execute() does: a second run
+        resumes from script_videos.jsonl instead of rewriting every video.
+        """
+        last_video = self.recover_jsonl_output()
+        if last_video:
+            print(f"Resuming after video {last_video}")
+
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=Config.CAPTION_WORKERS) as caption_pool, \
+                open(self.script_videos_jsonl_file_path, 'ab') as output, \
+                open(self.script_videos_index_file_path, 'a', encoding='utf-8') as index_file:
+            for index, json_str in self.iter_script_records():
+                if index <= last_video:
+                    continue
+                scene_objects = self.parse_script_line(json_str)
+                texts = [s_obj.get("What_Speaker_Says_In_First_Person", "") for s_obj in scene_objects]
+                if shorten_speech:
+                    texts = self.shorten_speeches([texts])[0]
+                scenes_list, scenes_text = self.build_scenes(scene_objects, texts)
+                video = {"video": index, "caption": None, "scenes": scenes_list}
+                pending.append((video, caption_pool.submit(self.generate_caption, scenes_text)))
+
+                # Write finished videos in order; at most CAPTION_WORKERS videos are held in memory
+                while pending and (pending[0][1].done() or len(pending) >= Config.CAPTION_WORKERS):
+                    self.append_video(output, index_file, *pending.popleft())
+            while pending:
+                self.append_video(output, index_file, *pending.popleft())
+
+        if consolidate:
+            self.consolidate_jsonl()
+
+    def iter_script_records(self):
+        with open(self.script_file_path, "r", encoding="utf-8") as f:
+            for index, line in enumerate(f, start=1):
+                yield index, line
+
+    def append_video(self, output, index_file, video, caption_future):
+        video["caption"] = self.collect_caption(caption_future, video["scenes"], time.time() + Config.CAPTION_TIMEOUT + 5)
+        line = (json.dumps(video, ensure_ascii=False) + "\n").encode('utf-8')
+        offset = output.tell()
+        output.write(line)
+        output.flush()
+        os.fsync(output.fileno())
+        # The index is written after the record, so it never points at a partial line
+        index_file.write(f"{video['video']}\t{offset}\t{len(line)}\n")
+        index_file.flush()
+        self.store.upsert_video(video)
+
+    def recover_jsonl_output(self):
+        """
+        Drops a partially written last line from script_videos.jsonl, brings the index
+        in line with it and returns the id of the last complete video (0 if none).
+        """
+        path = self.script_videos_jsonl_file_path
+        if not os.path.exists(path):
+            if os.path.exists(self.script_videos_index_file_path):
+                os.remove(self.script_videos_index_file_path)
+            return 0
+
+        # Read backwards only as far as needed to find the last complete line
+        with open(path, 'rb+') as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            tail = b""
+            position = size
+            while position > 0 and tail.count(b"\n") < 2:
+                step = min(65536, position)
+                position -= step
+                f.seek(position)
+                tail = f.read(step) + tail
+            if not tail.endswith(b"\n"):
+                cut = tail.rfind(b"\n")
+                f.truncate(position + cut + 1 if cut != -1 else 0)
+                tail = tail[:cut + 1] if cut != -1 else b""
+            lines = tail.splitlines()
+            last_video = json.loads(lines[-1])["video"] if lines else 0
+
+        indexed = self.read_jsonl_index()
+        if (indexed[-1][0] if indexed else 0) != last_video:
+            self.rebuild_jsonl_index()
+        return last_video
+
+    def read_jsonl_index(self):
+        if not os.path.exists(self.script_videos_index_file_path):
+            return []
+        entries = []
+        with open(self.script_videos_index_file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split("\t")
+                if len(parts) == 3:
+                    entries.append((int(parts[0]), int(parts[1]), int(parts[2])))
+        return entries
+
+    def rebuild_jsonl_index(self):
+        with open(self.script_videos_jsonl_file_path, 'rb') as jsonl, \
+                open(self.script_videos_index_file_path, 'w', encoding='utf-8') as index_file:
+            offset = 0
+            for line in jsonl:
+                index_file.write(f"{json.loads(line)['video']}\t{offset}\t{len(line)}\n")
+                offset += len(line)
+
+    def read_video(self, video_id):
+        """Reads one video from script_videos.jsonl using the index."""
+        for indexed_video, offset, length in self.read_jsonl_index():
+            if indexed_video == video_id:
+                with open(self.script_videos_jsonl_file_path, 'rb') as f:
+                    f.seek(offset)
+                    return json.loads(f.read(length))
+        return None
+
+    def iter_videos_jsonl(self):
+        if not os.path.exists(self.script_videos_jsonl_file_path):
+            return
+        with open(self.script_videos_jsonl_file_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def consolidate_jsonl(self):
+        """Writes script_videos.json from the JSONL output one video at a time."""
+        tmp_path = self.script_videos_file_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write("[")
+            for i, video in enumerate(self.iter_videos_jsonl()):
+                f.write(",\n    " if i else "\n    ")
+                f.write(json.dumps(video, indent=4).replace("\n", "\n    "))
+            f.write("\n]")
+        os.replace(tmp_path, self.script_videos_file_path)
+
+    def parse_script_line(self, json_str):
+        json_str = json_str.strip()
+        if json_str.startswith('"') and json_str.endswith('"'):
+            json_str = json_str[1:-1].replace('""', '"').replace("*", "")
+        old_data = json.loads(json_str)
+        return old_data.get("Scenes", [])
+
+    def shorten_speeches(self, speeches, scope='video'):
+        """
+        Shortens the speaker lines of every video. With scope 'video' each video
+        takes one batched request, with scope 'file' the whole script file does.
+        When the file request leaves a video out entirely it gets its own batched
+        request; only the lines still missing after that are shortened one by one.
+        """
+        if scope == 'file':
+            flat = [text for texts in speeches for text in texts]
+            shortened_flat = self.writer.shorten_texts_gemini(flat)
+            shortened = []
+            offset = 0
+            for texts in speeches:
+                video_shortened = shortened_flat[offset:offset + len(texts)]
+                if texts and all(text is None for text in video_shortened):
+                    video_shortened = self.writer.shorten_texts_gemini(texts)
+                shortened.append(video_shortened)
+                offset += len(texts)
+        else:
+            shortened = [self.writer.shorten_texts_gemini(texts) for texts in speeches]
+
+        result = []
+        for texts, shortened_texts in zip(speeches, shortened):
+            result.append([
+                shortened_text if shortened_text is not None else self.writer.shorten_text_gemini(text)
+                for text, shortened_text in zip(texts, shortened_texts)
+            ])
+        return result
+
+    def transform_data(self, old_json_strings, shorten_speech=False, shorten_scope='video'):
+        """
+        Accepts a list of JSON strings in the old format
+        and returns a list of dictionaries in the new format.
+        """
+        result = []
+        caption_futures = {}
+        caption_pool = ThreadPoolExecutor(max_workers=Config.CAPTION_WORKERS)
+        parsed_videos = []
+        for index, json_str in enumerate(old_json_strings, start=1):
+            scene_objects = self.parse_script_line(json_str)
+            parsed_videos.append(scene_objects)
+            # The caption uses the original lines, so it runs in the background while
+            # the next videos are parsed and shortened
+            caption_futures[index] = caption_pool.submit(self.generate_caption, self.caption_text(scene_objects))
+        speeches = [[s_obj.get("What_Speaker_Says_In_First_Person", "") for s_obj in scene_objects] for scene_objects in parsed_videos]
+        if shorten_speech:
+            speeches = self.shorten_speeches(speeches, scope=shorten_scope)
+
+        for index, (scene_objects, texts) in enumerate(zip(parsed_videos, speeches), start=1):
+            scenes_list, _ = self.build_scenes(scene_objects, texts)
+            result.append({
+                "video": index,
+                "caption": None,
+                "scenes": scenes_list
+            })
+
+        # Each call gives up after CAPTION_TIMEOUT, so the pool is done after one timeout per wave of workers
+        waves = -(-len(result) // Config.CAPTION_WORKERS)
+        deadline = time.time() + Config.CAPTION_TIMEOUT * waves + 5
+        for video in result:
+            video["caption"] = self.collect_caption(caption_futures[video["video"]], video["scenes"], deadline)
+        caption_pool.shutdown(wait=False)
+
+        return result
+
+    def caption_text(self, scene_objects):
+        scenes_text = ""
+        for i, s_obj in enumerate(scene_objects, start=1):
+            scenes_text += f"{i}. {s_obj.get('What_Speaker_Says_In_First_Person', '')}\n"
+            scenes_text += f"{s_obj.get('Visuals', '')}\n\n"
+        return scenes_text
+
+    def build_scenes(self, scene_objects, texts):
+        scenes_list = []
+        for i, (s_obj, text) in enumerate(zip(scene_objects, texts), start=1):
+            scenes_list.append({
+                "scene": str(i),
+                # "duration": 3,
+                "text": self.remove_symbols_script(text.replace("'", "")),
+                "visuals": s_obj.get("Visuals", ""),
+                # "hashtags": old_data.get("Hashtags", ""),
+                # "description": old_data.get("Description", "")
+            })
+        return scenes_list, self.caption_text(scene_objects)
+
+    def generate_caption(self, scenes_text):
+        return self.writer.generate_text_pollinations(scenes_text, timeout=Config.CAPTION_TIMEOUT)
+
+    @staticmethod
+    def fallback_caption(scenes):
+        # Deterministic caption from the opening line when the caption call fails
+        first_text = scenes[0]["text"].strip() if scenes else ""
+        caption = first_text[:97].rstrip() + "..." if len(first_text) > 100 else first_text
+        return caption
+
+    def collect_caption(self, future, scenes, deadline):
+        try:
+            caption = future.result(timeout=max(0, deadline - time.time()))
+        except Exception as e:
+            print(f"Caption generation failed: {e}")
+            caption = None
+        return caption if caption else self.fallback_caption(scenes)
+
+
+    def initialize_videos(self, json_file_path, append):
+        videos = defaultdict(lambda: {"scenes": []}) 
+        if not append:
+            return videos 
+        # Load the initial videos data from a JSON file 
+        initial_videos = self.read_json(json_file_path)
+        # Convert the list to a defaultdict 
+        for video in initial_videos: 
+            video_id = video["video"] 
+            videos[video_id]["scenes"] = video["scenes"] 
+
+        return videos
+
         
\ No newline at end of file
@@ -0,0 +1,238 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from config import Config
+
+
+class SingleFlight():
+    """
+    Collapses concurrent calls with the same key into one.
+
+    The first caller of a key (the leader) runs the function; callers arriving while
+    it is in flight wait for it and get the same result, or the same exception. The
+    key is forgotten as soon as the call finishes, so this only removes duplicate
+    work that overlaps in time; caching is left to LLMCache, UrlCache and friends.
+    Each named group counts its calls and how many of them were coalesced.
+
+    Groups created with shared=True also coalesce across processes, such as the job
+    workers. The leader claims the key in a SQLite table and keeps a lease on it
+    while it runs. Leaders of the same key in other processes wait for the stored
+    result (kept for result_ttl seconds) instead of repeating the call. When the
+    leader fails, or dies and its lease runs out, the next one in line runs the call
+    itself. Results of shared groups must be JSON serializable; bytes are allowed.
+    """
+
+    _groups = {}
+    _groups_lock = threading.Lock()
+
+    def __init__(self, name, db_name=None, lease=60, result_ttl=30, poll_interval=0.2):
+        self.name = name
+        self.db_name = db_name
+        self.lease = lease
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+        if db_name:
+            self.init_create_db()
+
+    @classmethod
+    def group(cls, name, shared=False):
+        with cls._groups_lock:
+            if name not in cls._groups:
+                cls._groups[name] = cls(name, db_name=Config.SINGLE_FLIGHT_DB if shared else None)
+            return cls._groups[name]
+
+    def do(self, key, func, *args, **kwargs):
+        """Returns func(*args, **kwargs), shared with every concurrent caller of the same key."""
+        with self._lock:
+            self.calls += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            if self.db_name:
+                result = self._do_shared(key, func, *args, **kwargs)
+            else:
+                result = func(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    async def ado(self, key, func):
+        """
+        do() for coroutine functions (func() returns an awaitable), waiting with
+        asyncio.sleep. Calls in the same event loop are coalesced by the caller.
+        """
+        with self._lock:
+            self.calls += 1
+        if not self.db_name:
+            return await func()
+        flight_key = self._flight_key(key)
+        owner = self._owner()
+        while True:
+            state, result = await asyncio.to_thread(self._claim, flight_key, owner)
+            if state == "claimed":
+                break
+            if state == "done":
+                return result
+            await asyncio.sleep(self.poll_interval)
+        keeper = asyncio.ensure_future(self._keep_lease_async(flight_key, owner))
+        try:
+            result = await func()
+        except BaseException:
+            await asyncio.to_thread(self._abandon, flight_key, owner)
+            raise
+        finally:
+            keeper.cancel()
+        await asyncio.to_thread(self._finish, flight_key, owner, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._inflight)}
+
+    @classmethod
+    def metrics(cls):
+        with cls._groups_lock:
+            groups = dict(cls._groups)
+        return {name: group.stats() for name, group in groups.items()}
+
+    # --- Coalescing across processes ---
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_create_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS flights (
+            name TEXT,
+            key TEXT,
+            owner TEXT,
+            result TEXT,
+            updated_at REAL,
+            PRIMARY KEY (name, key)
+        )''')
+        conn.close()
+
+    @staticmethod
+    def _flight_key(key):
+        # Hashed, so keys that hold API keys or long prompts are not written out as they are
+        return hashlib.sha256(json.dumps(key, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _owner():
+        return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+    @staticmethod
+    def _encode(result):
+        def default(value):
+            if isinstance(value, bytes):
+                return {"__bytes__": base64.b64encode(value).decode('ascii')}
+            raise TypeError(f"{type(value).__name__} results cannot be shared between processes")
+        return json.dumps(result, default=default)
+
+    @staticmethod
+    def _decode(text):
+        return json.loads(text, object_hook=lambda value: base64.b64decode(value["__bytes__"]) if set(value) == {"__bytes__"} else value)
+
+    def _claim(self, flight_key, owner):
+        """Returns ("done", result) for a fresh stored result, ("claimed", None) when owner now leads, else ("wait", None)."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute('SELECT result, updated_at FROM flights WHERE name = ? AND key = ?', (self.name, flight_key)).fetchone()
+            if row and row[0] is not None and now - row[1] < self.result_ttl:
+                state = "done"
+            elif row and row[0] is None and now - row[1] < self.lease:
+                state = "wait"
+            else:
+                state = "claimed"
+                conn.execute('INSERT OR REPLACE INTO flights (name, key, owner, result, updated_at) VALUES (?, ?, ?, NULL, ?)',
+                             (self.name, flight_key, owner, now))
+                # Finished and abandoned flights are only needed while someone may still be waiting
+                conn.execute('DELETE FROM flights WHERE updated_at < ?', (now - max(self.lease, self.result_ttl) * 10,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+        if state == "done":
+            with self._lock:
+                self.coalesced += 1
+            return state, self._decode(row[0])
+        return state, None
+
+    def _refresh_lease(self, flight_key, owner):
+        conn = self._connect()
+        conn.execute('UPDATE flights SET updated_at = ? WHERE name = ? AND key = ? AND owner = ? AND result IS NULL',
+                     (time.time(), self.name, flight_key, owner))
+        conn.close()
+
+    def _finish(self, flight_key, owner, result):
+        conn = self._connect()
+        conn.execute('UPDATE flights SET result = ?, updated_at = ? WHERE name = ? AND key = ? AND owner = ?',
+                     (self._encode(result), time.time(), self.name, flight_key, owner))
+        conn.close()
+
+    def _abandon(self, flight_key, owner):
+        conn = self._connect()
+        conn.execute('DELETE FROM flights WHERE name = ? AND key = ? AND owner = ? AND result IS NULL', (self.name, flight_key, owner))
+        conn.close()
+
+    def _do_shared(self, key, func, *args, **kwargs):
+        flight_key = self._flight_key(key)
+        owner = self._owner()
+        while True:
+            state, result = self._claim(flight_key, owner)
+            if state == "claimed":
+                break
+            if state == "done":
+                return result
+            time.sleep(self.poll_interval)
+
+        stop = threading.Event()
+
+        def keep_lease():
+            while not stop.wait(self.lease / 3):
+                self._refresh_lease(flight_key, owner)
+
+        threading.Thread(target=keep_lease, daemon=True).start()
+        try:
+            result = func(*args, **kwargs)
+        except BaseException:
+            self._abandon(flight_key, owner)
+            raise
+        finally:
+            stop.set()
+        self._finish(flight_key, owner, result)
+        return result
+
+    async def _keep_lease_async(self, flight_key, owner):
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            await asyncio.to_thread(self._refresh_lease, flight_key, owner)
@@ -0,0 +1,99 @@
+import queue
+import threading
+import time
+
+
+class StagePipeline():
+    """
+    Runs a batch of items through a fixed sequence of stages, each with its own
+    bounded pool of worker threads.
+
+    Stages are connected by queues of queue_size, so item N+1 can be in an early
+    stage while item N is in a later one, and a slow stage holds back the stages
+    before it instead of letting work pile up. Throughput is then set by the slowest
+    stage rather than by the sum of all of them. A stage function takes the item
+    and returns it (or a replacement) for the next stage; an item whose stage raises
+    skips the remaining stages and is reported in the errors. utilization() tells
+    how busy each stage's workers were during the last run.
+    """
+
+    _STOP = object()
+
+    def __init__(self, stages, queue_size=2):
+        # stages: [(name, func, workers)]
+        self.stages = stages
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.busy = {name: 0.0 for name, _, _ in self.stages}
+        self.processed = {name: 0 for name, _, _ in self.stages}
+        self.started_at = time.monotonic()
+        self.finished_at = None
+
+    def run(self, items):
+        """Returns (results, errors): results in input order, errors as {position: (stage, exception)}."""
+        items = list(items)
+        self._reset()
+        # The last queue collects finished items and is unbounded so the final stage never blocks
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages] + [queue.Queue()]
+        errors = {}
+
+        def work(index, name, func):
+            while True:
+                entry = queues[index].get()
+                if entry is self._STOP:
+                    return
+                position, item = entry
+                if position not in errors:
+                    start = time.monotonic()
+                    try:
+                        item = func(item)
+                    except Exception as e:
+                        print(f"Pipeline stage '{name}' failed for item {position}: {e}")
+                        errors[position] = (name, e)
+                    with self._lock:
+                        self.busy[name] += time.monotonic() - start
+                        self.processed[name] += 1
+                queues[index + 1].put((position, item))
+
+        threads = []
+        for index, (name, func, workers) in enumerate(self.stages):
+            for _ in range(workers):
+                thread = threading.Thread(target=work, args=(index, name, func), daemon=True)
+                thread.start()
+                threads.append((index, thread))
+
+        def feed():
+            for position, item in enumerate(items):
+                queues[0].put((position, item))
+
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+        results = [None] * len(items)
+        for _ in items:
+            position, item = queues[-1].get()
+            results[position] = item
+        feeder.join()
+
+        for index, _ in threads:
+            queues[index].put(self._STOP)
+        for _, thread in threads:
+            thread.join()
+        self.finished_at = time.monotonic()
+        return results, errors
+
+    def utilization(self):
+        """{stage: {"workers", "items", "busy_seconds", "utilization"}}; utilization is busy time over workers x elapsed time."""
+        elapsed = max((self.finished_at or time.monotonic()) - self.started_at, 1e-9)
+        with self._lock:
+            return {
+                name: {
+                    "workers": workers,
+                    "items": self.processed[name],
+                    "busy_seconds": round(self.busy[name], 2),
+                    "utilization": round(self.busy[name] / (elapsed * workers), 3),
+                }
+                for name, _, workers in self.stages
+            }
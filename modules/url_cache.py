@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import requests
+from config import Config
+from modules.blob_store import BlobStore
+from modules.http_transport import HttpTransport
+from modules.single_flight import SingleFlight
+
+
+class DownloadTooLargeError(Exception):
+    """Raised when a download is bigger than the cache's max_file_bytes."""
+
+
+class UrlCache():
+    """
+    Download cache for media URLs, backed by the blob store.
+
+    Entries are keyed by the normalized URL and remember the blob digest with the
+    response's ETag and Last-Modified. A repeated URL is revalidated with a
+    conditional GET, so an unchanged file costs a 304 instead of a transfer; when the
+    server cannot be reached the cached copy is used as is. Concurrent downloads of
+    the same URL share one request. Files larger than max_file_bytes are refused, and
+    once the entries exceed max_bytes the least recently used ones are forgotten (the
+    blobs themselves are freed by BlobStore.gc once no project links them).
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, blob_store, db_name, max_file_bytes=500 * 1024 * 1024, max_bytes=5 * 1024 * 1024 * 1024):
+        self.blob_store = blob_store
+        self.db_name = db_name
+        self.max_file_bytes = max_file_bytes
+        self.max_bytes = max_bytes
+        self.single_flight = SingleFlight.group("url-download", shared=True)
+        self.init_create_db()
+
+    @classmethod
+    def shared(cls):
+        with cls._instances_lock:
+            if "default" not in cls._instances:
+                blob_store = BlobStore.shared()
+                cls._instances["default"] = cls(
+                    blob_store,
+                    os.path.join(blob_store.root, "url_cache.db"),
+                    max_file_bytes=Config.URL_CACHE_MAX_FILE_BYTES,
+                    max_bytes=Config.URL_CACHE_MAX_BYTES,
+                )
+            return cls._instances["default"]
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_name, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def init_create_db(self):
+        conn = self._connect()
+        conn.execute('''CREATE TABLE IF NOT EXISTS url_cache (
+            url TEXT PRIMARY KEY,
+            digest TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            size INTEGER,
+            fetched_at REAL,
+            last_used REAL
+        )''')
+        conn.commit()
+        conn.close()
+
+    @staticmethod
+    def normalize_url(url):
+        """Lowercases scheme and host, drops default ports and fragments and sorts the query."""
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower()
+        host = (parts.hostname or "").lower()
+        if parts.port and not (scheme, parts.port) in (("http", 80), ("https", 443)):
+            host = f"{host}:{parts.port}"
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit((scheme, host, parts.path or "/", query, ""))
+
+    def _entry(self, url):
+        conn = self._connect()
+        row = conn.execute('SELECT digest, etag, last_modified FROM url_cache WHERE url = ?', (url,)).fetchone()
+        conn.close()
+        if row and self.blob_store.has(row[0]):
+            return {"digest": row[0], "etag": row[1], "last_modified": row[2]}
+        return None
+
+    def fetch(self, url):
+        """Returns the blob digest of url's content, downloading or revalidating as needed."""
+        key = self.normalize_url(url)
+        return self.single_flight.do(key, self._fetch, key, url)
+
+    def _fetch(self, key, url):
+        entry = self._entry(key)
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        try:
+            response = HttpTransport.get(url, headers=headers, stream=True)
+        except requests.RequestException as e:
+            if entry:
+                print(f"Revalidation of {url} failed ({e}), using the cached copy")
+                self._touch(key)
+                return entry["digest"]
+            raise
+        if response.status_code == 304 and entry:
+            response.close()
+            self._touch(key)
+            return entry["digest"]
+        response.raise_for_status()
+
+        length = int(response.headers.get("Content-Length") or 0)
+        if length > self.max_file_bytes:
+            response.close()
+            raise DownloadTooLargeError(f"{url} is {length} bytes, more than the {self.max_file_bytes} byte limit")
+        digest = self.blob_store.put_chunks(self._limited(response, url))
+        # Content-Length is missing for chunked responses, the blob has the real size
+        size = os.path.getsize(self.blob_store.blob_path(digest))
+        conn = self._connect()
+        with conn:
+            now = time.time()
+            conn.execute('''INSERT OR REPLACE INTO url_cache (url, digest, etag, last_modified, size, fetched_at, last_used)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)''',
+                         (key, digest, response.headers.get("ETag"), response.headers.get("Last-Modified"), size, now, now))
+            self._evict(conn)
+        conn.close()
+        return digest
+
+    def _limited(self, response, url):
+        received = 0
+        for chunk in response.iter_content(chunk_size=Config.DOWNLOAD_CHUNK_SIZE):
+            received += len(chunk)
+            if received > self.max_file_bytes:
+                response.close()
+                raise DownloadTooLargeError(f"{url} is more than the {self.max_file_bytes} byte limit")
+            yield chunk
+
+    def _touch(self, key):
+        conn = self._connect()
+        with conn:
+            now = time.time()
+            conn.execute('UPDATE url_cache SET fetched_at = ?, last_used = ? WHERE url = ?', (now, now, key))
+        conn.close()
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM url_cache').fetchone()[0]
+        while total > self.max_bytes:
+            conn.execute('DELETE FROM url_cache WHERE url = (SELECT url FROM url_cache ORDER BY last_used LIMIT 1)')
+            total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM url_cache').fetchone()[0]
+
+    def download(self, url, folder, filename):
+        """Links url's content into folder as <digest>_<filename>, so different URLs never overwrite each other."""
+        digest = self.fetch(url)
+        return self.blob_store.link(digest, os.path.join(folder, f"{digest[:16]}_{filename}"))
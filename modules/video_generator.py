@@ -10,8 +10,12 @@ from moviepy.editor import (
     VideoClip
 )
 from config import Config
+from modules.project_store import ProjectStore
 
 class VideoGenerator:
+    # Photos zoom in by this much over the scene; they are kept this much larger than the frame so the zoom shows real pixels
+    ZOOM_FACTOR = 1.2
+
     def __init__(self, project_folder, brand_text="", width=1080, height=1920):
         self.project_folder = os.path.join('projects', project_folder)
         self.generated_images = os.path.join(self.project_folder, 'generated_images')
@@ -21,6 +25,16 @@ class VideoGenerator:
         self.height = height
         self.fonts_folder = 'fonts'
 
+    @property
+    def store(self):
+        # Same project.db as the BaseGenerator based modules of this project
+        return ProjectStore.shared(os.path.join(self.project_folder, ProjectStore.FILE_NAME))
+
+    @staticmethod
+    def temp_audio_path(output_path):
+        # MoviePy's default temp audio goes to the working directory, shared by all job workers
+        return os.path.splitext(output_path)[0] + "_temp_audio.m4a"
+
     def create_pil_text_clip(self, text, fontsize, color, duration, font_path=None):
         """Creates a high-quality text image using Pillow"""
         # 1. Find a valid font
@@ -96,90 +110,97 @@ class VideoGenerator:
             
         return captions
 
-    def execute(self, video_dict, media_paths_dict):
+    def execute(self, video_dict, media_paths_dict, progress=None):
+        # progress: an optional ProgressReporter for frames rendered per scene and the final encode
         clip_paths = []
+        # Indexed by scene once instead of scanning the list for every scene
+        media_by_scene = {str(path['scene']): path for path in media_paths_dict}
 
         for i, scene in enumerate(video_dict['scenes']):
             # Find media path
             media_path = ""
-            for path in media_paths_dict:
-                if str(scene['scene']) == str(path['scene']):
-                    media_path = path['image_path'] if path['image_path'] else path['google_image_path']
-                    break
-            
-            # Paths
-            scene_dir = os.path.join(self.generated_images, str(video_dict['video']), str(scene['scene']))
-            voiceover_path = os.path.join(scene_dir, "voiceover.mp3")
-            video_output_path = os.path.join(self.generated_video, str(video_dict['video']), str(scene['scene']), "video.mp4")
-            os.makedirs(os.path.dirname(video_output_path), exist_ok=True)
+            path = media_by_scene.get(str(scene['scene']))
+            if path:
+                media_path = path['image_path'] if path['image_path'] else path['google_image_path']
+            clip_paths.append(self.render_scene(video_dict['video'], scene, media_path, progress=progress))
+
+        # Concatenate
+        final_video_path = os.path.join(self.generated_video, str(video_dict['video']), "final_video.mp4")
+        logger = progress.frame_logger("encode", video_dict['video']) if progress else 'bar'
+        self.concatenate_video_clips(clip_paths, final_video_path, logger=logger)
+        return final_video_path
 
-            print(f"Processing Scene {scene['scene']}...")
+    def render_scene(self, video_id, scene, media_path, progress=None):
+        """Renders one scene to its video.mp4 (kept when it already exists) and returns the path."""
+        # Paths
+        scene_dir = os.path.join(self.generated_images, str(video_id), str(scene['scene']))
+        voiceover_path = os.path.join(scene_dir, "voiceover.mp3")
+        video_output_path = os.path.join(self.generated_video, str(video_id), str(scene['scene']), "video.mp4")
+        os.makedirs(os.path.dirname(video_output_path), exist_ok=True)
 
-            if not os.path.exists(video_output_path):
-                # 1. Get Audio Duration
-                audio_duration = 5 # Default
-                audio_clip = None
-                if os.path.exists(voiceover_path):
-                    audio_clip = AudioFileClip(voiceover_path)
-                    audio_duration = audio_clip.duration
+        print(f"Processing Scene {scene['scene']}...")
 
-                # 2. Create Visual Background
-                if media_path and media_path.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
-                    image = Image.open(media_path)
-                    
-                    # Force RGB (Drop Alpha/Transparency)
-                    if image.mode != 'RGB':
-                        image = image.convert('RGB')
+        if not os.path.exists(video_output_path):
+            # 1. Get Audio Duration
+            audio_duration = 5 # Default
+            audio_clip = None
+            if os.path.exists(voiceover_path):
+                audio_clip = AudioFileClip(voiceover_path)
+                audio_duration = audio_clip.duration
 
-                    image = self.scale_and_crop(image)
-                    video_clip = self.zoom_in_effect(image, duration=audio_duration)
-                elif media_path:
-                    video_clip = self.create_video_clip(media_path, audio_duration)
-                else:
-                    from moviepy.editor import ColorClip
-                    video_clip = ColorClip(size=(self.width, self.height), color=(0,0,0), duration=audio_duration)
+            # 2. Create Visual Background
+            if media_path and media_path.lower().endswith(('.jpg', '.jpeg', '.png', '.gif')):
+                # Decoded near the zoomed frame size and forced to RGB (drops alpha/transparency)
+                image = self.load_image(media_path, margin=self.ZOOM_FACTOR)
 
-                if audio_clip:
-                    video_clip = video_clip.set_audio(audio_clip)
+                image = self.scale_and_crop(image, margin=self.ZOOM_FACTOR)
+                video_clip = self.zoom_in_effect(image, duration=audio_duration, zoom_factor=self.ZOOM_FACTOR)
+            elif media_path:
+                video_clip = self.create_video_clip(media_path, audio_duration)
+            else:
+                from moviepy.editor import ColorClip
+                video_clip = ColorClip(size=(self.width, self.height), color=(0,0,0), duration=audio_duration)
 
-                # 3. Add Perfect Captions (No Whisper)
-                text_clips = []
-                if audio_duration > 0 and scene['text']:
-                    # Use the ORIGINAL script text
-                    captions = self.generate_linear_captions(scene['text'], audio_duration)
-                    
-                    for cap in captions:
-                        duration = cap['end'] - cap['start']
-                        txt_clip = self.create_pil_text_clip(
-                            cap['text'], 
-                            fontsize=110, # Large font for single words
-                            color='white', 
-                            duration=duration
-                        )
-                        txt_clip = txt_clip.set_start(cap['start']).set_position('center')
-                        text_clips.append(txt_clip)
+            if audio_clip:
+                video_clip = video_clip.set_audio(audio_clip)
 
-                # 4. Composite
-                final_layers = [video_clip] + text_clips
+            # 3. Add Perfect Captions (No Whisper)
+            text_clips = []
+            if audio_duration > 0 and scene['text']:
+                # Use the ORIGINAL script text
+                captions = self.generate_linear_captions(scene['text'], audio_duration)
                 
-                # Brand Text (Optional)
-                if self.brand_text:
-                    brand_clip = self.add_brand_text(video_clip, self.brand_text)
-                    final_layers.append(brand_clip)
+                for cap in captions:
+                    duration = cap['end'] - cap['start']
+                    txt_clip = self.create_pil_text_clip(
+                        cap['text'], 
+                        fontsize=110, # Large font for single words
+                        color='white', 
+                        duration=duration
+                    )
+                    txt_clip = txt_clip.set_start(cap['start']).set_position('center')
+                    text_clips.append(txt_clip)
 
-                final_clip = CompositeVideoClip(final_layers)
-                final_clip.write_videofile(video_output_path, codec="libx264", fps=24, audio_codec="aac")
-                
-                final_clip.close()
-                if audio_clip: audio_clip.close()
-                video_clip.close()
+            # 4. Composite
+            final_layers = [video_clip] + text_clips
             
-            clip_paths.append(video_output_path)
+            # Brand Text (Optional)
+            if self.brand_text:
+                brand_clip = self.add_brand_text(video_clip, self.brand_text)
+                final_layers.append(brand_clip)
 
-        # Concatenate
-        final_video_path = os.path.join(self.generated_video, str(video_dict['video']), "final_video.mp4")
-        self.concatenate_video_clips(clip_paths, final_video_path)
-        return final_video_path
+            final_clip = CompositeVideoClip(final_layers)
+            logger = progress.frame_logger("render", video_id, scene['scene']) if progress else 'bar'
+            final_clip.write_videofile(video_output_path, codec="libx264", fps=24, audio_codec="aac",
+                                       temp_audiofile=self.temp_audio_path(video_output_path), logger=logger)
+            
+            final_clip.close()
+            if audio_clip: audio_clip.close()
+            video_clip.close()
+            self.store.set_stage(video_id, "render", "done", scene_id=scene['scene'])
+        elif progress:
+            progress.emit("render", video_id, scene['scene'], final=True, cached=True)
+        return video_output_path
 
     def add_brand_text(self, base_clip, text, fontsize=50):
         txt_clip = self.create_pil_text_clip(
@@ -206,9 +227,7 @@ class VideoGenerator:
             return video_clip
         else:
            # Load with PIL first to convert to RGB safely
-            img = Image.open(media_path)
-            if img.mode != 'RGB':
-                img = img.convert('RGB')
+            img = self.load_image(media_path)
             
             # Convert PIL image to NumPy array for MoviePy
             img_np = np.array(img)
@@ -217,16 +236,36 @@ class VideoGenerator:
             image_clip = image_clip.resize(newsize=(self.width, self.height))
             return image_clip
         
-    def concatenate_video_clips(self, clip_paths, final_video_path):
+    def concatenate_video_clips(self, clip_paths, final_video_path, logger='bar'):
         video_clips = [VideoFileClip(clip_path) for clip_path in clip_paths]
         final_video = concatenate_videoclips(video_clips, method="compose")
-        final_video.write_videofile(final_video_path, codec="libx264", fps=24, audio_codec="aac")
+        final_video.write_videofile(final_video_path, codec="libx264", fps=24, audio_codec="aac",
+                                    temp_audiofile=self.temp_audio_path(final_video_path), logger=logger)
         final_video.close()
         return final_video_path
     
-    def scale_and_crop(self, image):
-        width = self.width
-        height = self.height
+    def load_image(self, media_path, margin=1):
+        """
+        Opens an image as RGB, decoded at the smallest scale that still covers the
+        frame (times margin). JPEGs use draft() to decode at 1/2, 1/4 or 1/8 scale inside libjpeg;
+        other formats are shrunk with reduce() before the final LANCZOS resize.
+        """
+        image = Image.open(media_path)
+        is_jpeg = image.format == 'JPEG'
+        scale = max(self.width * margin / image.width, self.height * margin / image.height)
+        if scale < 1 and is_jpeg:
+            image.draft('RGB', (int(image.width * scale) + 1, int(image.height * scale) + 1))
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        factor = int(1 / scale) if scale < 1 else 1
+        if not is_jpeg and factor >= 2:
+            image = image.reduce(factor)
+        return image
+
+    def scale_and_crop(self, image, margin=1):
+        """Crops the image to the frame's aspect ratio and resizes it to the frame size times margin."""
+        width = int(self.width * margin)
+        height = int(self.height * margin)
         original_aspect = image.width / image.height
         target_aspect = width / height
         if original_aspect > target_aspect:
@@ -243,15 +282,16 @@ class VideoGenerator:
         return image
 
     def zoom_in_effect(self, image, duration, zoom_factor=1.2):
+        """
+        Zooms from the whole image to its centre 1/zoom_factor over the clip. Every
+        frame resizes the visible window down to the frame size, so an image kept
+        zoom_factor times larger than the frame never has to be upscaled.
+        """
         w, h = image.size
-        img_np = np.array(image)
         def make_frame(t):
             zoom = 1 + (zoom_factor - 1) * (t / duration)
-            new_w, new_h = int(w * zoom), int(h * zoom)
-            img_resized = Image.fromarray(img_np).resize((new_w, new_h), Image.LANCZOS)
-            left = (new_w - w) // 2
-            top = (new_h - h) // 2
-            right = left + w
-            bottom = top + h
-            return np.array(img_resized.crop((left, top, right, bottom)))
+            box_w, box_h = w / zoom, h / zoom
+            left = (w - box_w) / 2
+            top = (h - box_h) / 2
+            return np.array(image.resize((self.width, self.height), Image.LANCZOS, box=(left, top, left + box_w, top + box_h)))
         return VideoClip(make_frame, duration=duration)
\ No newline at end of file
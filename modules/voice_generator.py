@@ -1,5 +1,6 @@
 import os
 import re
+import time
 from modules.base_generator import BaseGenerator
 from openai import OpenAI
 from modules.nagaac_utils import NagaACUtils
@@ -80,15 +81,18 @@ class VoiceGenerator(BaseGenerator):
         rate_limit_cheked = False
         rate_limit_exceeded = False
         while not rate_limit_cheked:
+            start_time = time.time()
             try:
                 response = self.client.audio.speech.create(model=current_model_id,
                                             input=prompt,
                                             voice=voice,
                                             speed=1)
+                self.nagaac_utils.router.record_success(current_model_id, time.time() - start_time)
                 rate_limit_exceeded = False
                 self.nagaac_utils.update_api_usage(current_model_id, exceeded=rate_limit_exceeded, voice_model=True)
             except Exception as e:
                 print(e)
+                self.nagaac_utils.router.record_error(current_model_id, e, latency=time.time() - start_time)
                 if 'rate_limit_exceeded' or 'Invalid model' or 'no_sources_available' or 'Input should be' in str(e):
                     rate_limit_exceeded = True
                     self.nagaac_utils.update_api_usage(current_model_id, exceeded=rate_limit_exceeded, voice_model=True)
@@ -0,0 +1,245 @@
+import json
+import re
+from typing import get_type_hints
+from modules.script_entity import Scene, Videos
+
+
+class ScriptValidationError(ValueError):
+    """Raised when a structured script cannot be repaired locally."""
+
+
+class ScriptRepair():
+    """
+    Validates and repairs structured script JSON against the Videos/Scene schema.
+
+    LLM output often arrives wrapped in code fences, with trailing commas, smart or
+    single quotes, Python literals or slightly different key names. All of that is
+    fixed here without another network call; only output that is still unusable
+    raises ScriptValidationError with a message that can be sent back to the model.
+    """
+
+    VIDEO_FIELDS = get_type_hints(Videos)
+    SCENE_FIELDS = get_type_hints(Scene)
+
+    # Alternative key spellings the models use for the schema fields
+    KEY_ALIASES = {
+        "what_speaker_says_in_first_person": "What_Speaker_Says_In_First_Person",
+        "what_speaker_says": "What_Speaker_Says_In_First_Person",
+        "speaker_text": "What_Speaker_Says_In_First_Person",
+        "speech": "What_Speaker_Says_In_First_Person",
+        "narration": "What_Speaker_Says_In_First_Person",
+        "voiceover": "What_Speaker_Says_In_First_Person",
+        "text": "What_Speaker_Says_In_First_Person",
+        "visual": "Visuals",
+        "visuals": "Visuals",
+        "video": "Video",
+        "scenes": "Scenes",
+    }
+
+    @classmethod
+    def parse(cls, text):
+        """Returns the script as a dict matching Videos, repairing it where possible."""
+        if isinstance(text, (dict, list)):
+            data = text
+        else:
+            data = cls._loads(text)
+        return cls.coerce(data)
+
+    @classmethod
+    def _loads(cls, text):
+        if not text or not text.strip():
+            raise ScriptValidationError("The response was empty. Return the script as a JSON object.")
+
+        text = cls.strip_code_fences(text)
+        text = cls._extract_json(text)
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+
+        # Repairs are applied cumulatively, least invasive first, parsing after each one. A repair
+        # is only kept when the result parses or the first error moved further into the text, so
+        # a repair that does not apply cannot damage what the others are fixing. Skipped repairs
+        # get another pass once a later one has moved the error on.
+        try:
+            json.loads(text)
+        except json.JSONDecodeError as e:
+            error = e
+        for _ in cls.REPAIRS:
+            progressed = False
+            for repair in cls.REPAIRS:
+                repaired = repair(text)
+                try:
+                    return json.loads(repaired)
+                except json.JSONDecodeError as e:
+                    if e.pos > error.pos:
+                        text, error, progressed = repaired, e, True
+            if not progressed:
+                break
+        raise ScriptValidationError(
+            f"The JSON is invalid at line {error.lineno} column {error.colno}: {error.msg}. "
+            f"Return only a valid JSON object with the keys Video and Scenes."
+        )
+
+    @staticmethod
+    def _fix_quotes(text):
+        # Smart quotes are only replaced where they delimit strings; inside a string they are text
+        result = []
+        closing = None
+        escaped = False
+        for index, char in enumerate(text):
+            if closing is None:
+                if char in '"\u201c\u201d':
+                    closing = '"' if char == '"' else '\u201c\u201d'
+                    char = '"'
+                elif char == '\u2018' or (char == '\u2019' and re.match(r'\s*[:,}\]]', text[index + 1:])):
+                    # A closing \u2019 elsewhere is an apostrophe
+                    char = "'"
+            elif escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char in closing:
+                closing = None
+                char = '"'
+            result.append(char)
+        return ''.join(result)
+
+    @staticmethod
+    def _fix_trailing_commas(text):
+        return re.sub(r',\s*([}\]])', r'\1', text)
+
+    @staticmethod
+    def _fix_literals(text):
+        text = re.sub(r'\bTrue\b', 'true', text)
+        text = re.sub(r'\bFalse\b', 'false', text)
+        return re.sub(r'\bNone\b', 'null', text)
+
+    @staticmethod
+    def _fix_single_quotes(text):
+        text = re.sub(r"'([^'\\]*(?:\\.[^'\\]*)*)'(\s*:)", r'"\1"\2', text)
+        return re.sub(r"([:\[,]\s*)'([^'\\]*(?:\\.[^'\\]*)*)'(?=\s*[,}\]])", r'\1"\2"', text)
+
+    @staticmethod
+    def _fix_unquoted_keys(text):
+        return re.sub(r'([{,]\s*)([A-Za-z_][A-Za-z0-9_]*)(\s*:)', r'\1"\2"\3', text)
+
+    @staticmethod
+    def _escape_newlines_in_strings(text):
+        # Raw newlines inside strings are not valid JSON
+        result = []
+        in_string = False
+        escaped = False
+        for char in text:
+            if in_string and char == '\n':
+                result.append('\\n')
+                continue
+            if char == '"' and not escaped:
+                in_string = not in_string
+            escaped = char == '\\' and not escaped
+            result.append(char)
+        return ''.join(result)
+
+    @staticmethod
+    def strip_code_fences(text):
+        text = text.strip()
+        match = re.search(r'```(?:json|JSON)?\s*(.*?)```', text, re.DOTALL)
+        return match.group(1).strip() if match else text
+
+    @staticmethod
+    def _extract_json(text):
+        # Drop any prose before the first and after the last bracket
+        starts = [i for i in (text.find('{'), text.find('[')) if i != -1]
+        if not starts:
+            return text
+        start = min(starts)
+        end = max(text.rfind('}'), text.rfind(']'))
+        return text[start:end + 1] if end > start else text[start:]
+
+    REPAIRS = (
+        _fix_quotes.__func__,
+        _fix_trailing_commas.__func__,
+        _escape_newlines_in_strings.__func__,
+        _fix_literals.__func__,
+        _fix_single_quotes.__func__,
+        _fix_unquoted_keys.__func__,
+    )
+
+    @classmethod
+    def _normalize_keys(cls, obj, fields):
+        normalized = {}
+        lower_fields = {field.lower(): field for field in fields}
+        for key, value in obj.items():
+            plain_key = str(key).strip().lower().replace(' ', '_').replace('-', '_')
+            field = lower_fields.get(plain_key) or cls.KEY_ALIASES.get(plain_key)
+            if field in fields and field not in normalized:
+                normalized[field] = value
+        return normalized
+
+    @classmethod
+    def coerce(cls, data):
+        """Coerces parsed JSON into a Videos dict, raising ScriptValidationError if impossible."""
+        if isinstance(data, list):
+            # Either a list of videos (take the first) or a bare list of scenes
+            if data and isinstance(data[0], dict) and any(k.lower() == "scenes" for k in data[0]):
+                data = data[0]
+            else:
+                data = {"Video": 1, "Scenes": data}
+        if not isinstance(data, dict):
+            raise ScriptValidationError("The response must be a JSON object with the keys Video and Scenes.")
+
+        video = cls._normalize_keys(data, cls.VIDEO_FIELDS)
+        try:
+            video_number = int(video.get("Video", 1))
+        except (TypeError, ValueError):
+            video_number = 1
+
+        scenes = video.get("Scenes")
+        if scenes is None:
+            raise ScriptValidationError("The JSON object has no Scenes list. Put every scene into a list under the key Scenes.")
+        if isinstance(scenes, dict):
+            scenes = list(scenes.values())
+        if not isinstance(scenes, list):
+            raise ScriptValidationError("Scenes must be a list of objects.")
+
+        coerced_scenes = []
+        for scene in scenes:
+            if isinstance(scene, str):
+                scene = {"What_Speaker_Says_In_First_Person": scene}
+            if not isinstance(scene, dict):
+                continue
+            scene = cls._normalize_keys(scene, cls.SCENE_FIELDS)
+            coerced = {field: str(scene.get(field) or "").strip() for field in cls.SCENE_FIELDS}
+            if any(coerced.values()):
+                coerced_scenes.append(coerced)
+
+        if not coerced_scenes:
+            raise ScriptValidationError(
+                "Scenes is empty. Every scene needs What_Speaker_Says_In_First_Person and Visuals."
+            )
+        missing_speech = [i for i, scene in enumerate(coerced_scenes, start=1) if not scene["What_Speaker_Says_In_First_Person"]]
+        if missing_speech:
+            raise ScriptValidationError(
+                f"Scenes {', '.join(map(str, missing_speech))} have no What_Speaker_Says_In_First_Person text."
+            )
+        return {"Video": video_number, "Scenes": coerced_scenes}
+
+    @staticmethod
+    def text_length(script):
+        return sum(len(scene["What_Speaker_Says_In_First_Person"]) + len(scene["Visuals"]) for scene in script["Scenes"])
+
+    @classmethod
+    def check_limits(cls, script, min_scenes=0, max_scenes=None, length_limit=None):
+        """
+        Applies scene-count and length limits. Too many scenes are trimmed locally;
+        returns a list of problems that need the model to write the script again.
+        """
+        problems = []
+        if max_scenes and len(script["Scenes"]) > max_scenes:
+            script["Scenes"] = script["Scenes"][:max_scenes]
+        if len(script["Scenes"]) < min_scenes:
+            problems.append(f"The last time it was {len(script['Scenes'])} scenes, please generate {min_scenes} or more scenes.")
+        length = cls.text_length(script)
+        if length_limit and length > length_limit:
+            problems.append(f"The last time it was {length} characters long, please generate a shorter response. {length_limit} characters or less.")
+        return problems
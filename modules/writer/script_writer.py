@@ -10,6 +10,7 @@ import requests
 
 from modules.base_generator import BaseGenerator
 from modules.writer.writer import Writer
+from modules.writer.script_repair import ScriptRepair, ScriptValidationError
 import json
 
 
@@ -19,56 +20,45 @@ class ScriptWriter(BaseGenerator):
         self.writer = Writer(pollinations_api_key=pollinations_api_key, gemini_api_key=gemini_api_key)
 
     def execute(self, prompt, more_scenes=False, max_scenes=100, length_limit=10000):
-        # Try to structure and validate the JSON
-        
-        valid_json = False
+        # Generate, structure and repair the script locally; the model is only asked
+        # again for problems that cannot be fixed here, and is told what went wrong
         max_attempts = 20
         attempts = 0
         response = ""
-        
-        while not valid_json and attempts < max_attempts:
+        feedback = ""
+        script_text = None
+        structure_hint = ""
+
+        while attempts < max_attempts:
+            attempts += 1
+            if script_text is None:
+                # A retry must reach the model; replaying the rejected answer from the cache would not help
+                script_text = self.writer.generate_text_gemini(prompt + (" " + feedback if feedback else ""), use_cache=not feedback)
+                structure_hint = ""
+
+            response = self.writer.structure_script_gemini(script_text + structure_hint)
             try:
-                response = self.writer.generate_text_gemini(prompt)
+                script = ScriptRepair.parse(response)
+            except ScriptValidationError as e:
+                # The script itself is fine, only its structured form is broken: re-structure it
+                print(f"Structured script could not be repaired: {e}")
+                structure_hint = f"\n\nThe previous structured output was rejected: {e}"
+                continue
+
+            problems = ScriptRepair.check_limits(script, min_scenes=3 if more_scenes else 0, max_scenes=max_scenes, length_limit=length_limit)
+            if problems:
+                # Scene count or length is off: the text has to be written again
+                feedback = " ".join(problems)
+                print(f"Script rejected: {feedback}")
+                script_text = None
+                response = json.dumps(script, ensure_ascii=False)
+                continue
 
-                if more_scenes:
-                    # Check if response contains at least 5 instances of "scene"
-                    scene_count = 0
-                    if response:
-                        scene_count = len(re.findall(r'scene', response, re.IGNORECASE))
-                        
-                    max_scene_attempts = 10
-                    scene_attempts = 0
-                    while scene_count < 3 and scene_attempts < max_scene_attempts:
-                        response = self.writer.generate_text_gemini(prompt, " the last time it was less than 3 scenes, please generate 3 or more scenes")
-                        if response:
-                            scene_count = len(re.findall(r'scene', response, re.IGNORECASE))
-                        scene_attempts += 1
-                
-                max_scene_attempts = 10
-                scene_count = 0
-                if response:
-                    scene_count = len(re.findall(r'scene', response, re.IGNORECASE))
-                while scene_count > max_scenes and max_scene_attempts < 10:
-                    response = self.writer.generate_text_gemini(prompt, " the last time it was more than " + str(max_scenes) + " scenes, please generate " + str(max_scenes) + " or less scenes")
-                    if response:
-                        scene_count = len(re.findall(r'scene', response, re.IGNORECASE))
-                    max_scene_attempts += 1
+            # put the whole response into a one line
+            return json.dumps(script, ensure_ascii=False)
 
-                max_length_attempts = 10
-                while len(response) > length_limit and max_length_attempts < 10:
-                    response = self.writer.generate_text_gemini(prompt, " the last time it was too long, please generate a shorter response. " + str(length_limit) + " characters or less")
-                    max_length_attempts += 1
-                
-                response = self.writer.structure_script_gemini(response)
-                json.loads(response)  # Validate JSON
-                valid_json = True
-                # put the whole response into a one line
-                response = re.sub(r'\n', '', response)
-            except json.JSONDecodeError:
-                attempts += 1
-                if attempts >= max_attempts:
-                    # If all attempts fail, return the last structured attempt
-                    break
+        # If all attempts fail, return the last structured attempt
+        response = re.sub(r'\n', '', response)
         # file_path = self.script_file_path
         # self.write_csv(file_path, response)
         return response
@@ -1,72 +1,263 @@
 import time
 from openai import OpenAI
 from modules.pollinations_utils import PollinationsUtils
+from modules.model_router import ModelRouter
+from modules.quota_pacer import QuotaPacer
+from modules.client_pool import ClientPool
+from modules.llm_cache import LLMCache
 from modules.script_entity import Scene, Videos
+from modules.writer.script_repair import ScriptRepair, ScriptValidationError
 from google import genai
 from google.genai import types
 import json
 import re
+from config import Config
 
 
 class Writer:
-    def __init__(self, pollinations_api_key, gemini_api_key):
+    def __init__(self, pollinations_api_key, gemini_api_key, gemini_models=None):
         self.gemini_api_key = gemini_api_key
+        self.gemini_models = gemini_models or Config.GEMINI_MODELS
+        self.gemini_router = ModelRouter.shared("gemini", self.gemini_models)
+        self.gemini_pacer = QuotaPacer.shared("gemini", rpm=Config.GEMINI_RPM, tpm=Config.GEMINI_TPM)
+        self.llm_cache = LLMCache.shared()
         self.pollinations_api_key = pollinations_api_key
         self.pollinations_utils = PollinationsUtils(api_key=pollinations_api_key)
 
         self.model_errors_file = "model_errors.txt"
 
-        # Initialize or reset model error counters
+        # Initialize the model error counters; an existing file (it is tracked in git) is left as it is
         try:
-            with open(self.model_errors_file, "w") as f:
+            with open(self.model_errors_file, "x") as f:
                 f.write("pollinations 0")
+        except FileExistsError:
+            pass
         except Exception as e:
-            print(f"Error creating/resetting model errors file: {e}")
+            print(f"Error creating model errors file: {e}")
     
-    def generate_text_pollinations(self, prompt, system_prompt=''):
-        pollinations = PollinationsUtils(api_key=self.pollinations_api_key)
-        response = pollinations.generate_text(prompt, system_prompt)
+    def generate_text_pollinations(self, prompt, system_prompt='', timeout=None, use_cache=True):
+        response = self.pollinations_utils.generate_text(prompt, system_prompt, timeout=timeout, use_cache=use_cache)
         return response
 
-    def generate_text_gemini(self, prompt, system_prompt=''):
-        client = genai.Client(api_key=self.gemini_api_key)
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                system_instruction='generate structure: Visuals and What_Speaker_Says_In_First_Person',
+    def generate_content_gemini(self, client, **kwargs):
+        """
+        Calls generate_content on the Gemini model with the best expected completion time.
+        A failing model is skipped for the rest of this call; the router keeps it in
+        cooldown for later calls if the failure was a rate limit.
+        """
+        tried = []
+        last_error = None
+        while True:
+            model = self.gemini_router.best_model(self.gemini_models, exclude=tried)
+            if model is None:
+                if last_error is not None:
+                    raise last_error
+                # Every model is cooling down, wait for the first one to come back
+                time.sleep(max(0, self.gemini_router.next_available_at(self.gemini_models) - time.time()))
+                continue
+            # Only sleeps when this model is actually close to its RPM/TPM quota
+            quota_entry = self.gemini_pacer.acquire(model, tokens=QuotaPacer.estimate_tokens(str(kwargs.get('contents', ''))))
+            try:
+                with self.gemini_router.track(model):
+                    response = client.models.generate_content(model=model, **kwargs)
+                usage = getattr(response, 'usage_metadata', None)
+                if usage is not None and getattr(usage, 'total_token_count', None):
+                    self.gemini_pacer.record_usage(quota_entry, usage.total_token_count)
+                return response
+            except Exception as e:
+                print(f"Gemini model {model} failed: {e}")
+                if ModelRouter.is_rate_limit_error(e):
+                    self.gemini_pacer.backoff(model, ModelRouter.parse_retry_after(e))
+                tried.append(model)
+                last_error = e
+
+    def stream_script_gemini(self, prompt, use_cache=True):
+        """
+        Writes a script straight into the Videos schema and yields the JSON text as it
+        streams in, so scenes can be parsed (and their media started) before the model
+        has finished. A failing model is only swapped before the first chunk arrives.
+        """
+        key = LLMCache.make_key("gemini", ",".join(self.gemini_models), prompt, params={"schema": "Videos", "stream": True})
+        cached = self.llm_cache.get(key) if use_cache else None
+        if cached is not None:
+            yield cached
+            return
+
+        client = ClientPool.gemini(self.gemini_api_key)
+        config = self.gemini_config(key, response_mime_type="application/json", response_schema=Videos)
+        tried = []
+        while True:
+            model = self.gemini_router.best_model(self.gemini_models, exclude=tried)
+            if model is None:
+                raise RuntimeError("No Gemini model available for streaming")
+            self.gemini_pacer.acquire(model, tokens=QuotaPacer.estimate_tokens(prompt))
+            start_time = time.time()
+            chunks = []
+            try:
+                for chunk in client.models.generate_content_stream(model=model, contents=prompt, config=config):
+                    if chunk.text:
+                        chunks.append(chunk.text)
+                        yield chunk.text
+            except Exception as e:
+                self.gemini_router.record_error(model, e, latency=time.time() - start_time)
+                if ModelRouter.is_rate_limit_error(e):
+                    self.gemini_pacer.backoff(model, ModelRouter.parse_retry_after(e))
+                if chunks:
+                    raise
+                print(f"Gemini model {model} failed: {e}")
+                tried.append(model)
+                continue
+            self.gemini_router.record_success(model, time.time() - start_time)
+            text = "".join(chunks)
+            if self._is_repairable_script(text):
+                self.llm_cache.set(key, text, "gemini", ",".join(self.gemini_models))
+            return
+
+    def gemini_config(self, key, **kwargs):
+        # Deterministic mode: greedy sampling with a seed derived from the request
+        if self.llm_cache.deterministic:
+            kwargs.update(temperature=0, seed=LLMCache.seed_for(key))
+        return types.GenerateContentConfig(**kwargs)
+
+    def cached_gemini(self, prompt, call, system_prompt='', params=None, use_cache=True, validate=None):
+        # The router may pick any of the configured models, so the whole list is part of the key
+        return self.llm_cache.cached_call("gemini", ",".join(self.gemini_models), prompt, call, system_prompt=system_prompt,
+                                          params=params, use_cache=use_cache, validate=validate)
+
+    def generate_text_gemini(self, prompt, system_prompt='', use_cache=True):
+        system_instruction = 'generate structure: Visuals and What_Speaker_Says_In_First_Person'
+
+        def call(key):
+            client = ClientPool.gemini(self.gemini_api_key)
+            response = self.generate_content_gemini(
+                client,
+                contents=prompt,
+                config=self.gemini_config(key, system_instruction=system_instruction)
             )
-        )
-        time.sleep(10)
-        return response.text
+            return response.text
+        return self.cached_gemini(prompt, call, system_prompt=system_instruction, use_cache=use_cache)
     
-    def structure_script_gemini(self, prompt):
-        client = genai.Client(api_key=self.gemini_api_key)
+    def structure_script_gemini(self, prompt, use_cache=True):
         prompt = f"""
         Get text from the script based on the schema given. 
 
         {prompt}"""
-        response = client.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                response_mime_type="application/json",
-                response_schema=Videos
+
+        def call(key):
+            client = ClientPool.gemini(self.gemini_api_key)
+            response = self.generate_content_gemini(
+                client,
+                contents=prompt,
+                config=self.gemini_config(
+                    key,
+                    response_mime_type="application/json",
+                    response_schema=Videos
+                )
             )
-        )
 
+            try:
+                # Attempt to parse the response text as JSON
+                json.loads(response.text)
+
+            except json.JSONDecodeError as e:
+                # If parsing fails, print the error and the raw response text
+                print(f"Error decoding JSON: {e}")
+                print(f"Raw response text: {response.text}")
+            return response.text
+        # Only structured output that the repair stage accepts is worth caching
+        return self.cached_gemini(prompt, call, params={"schema": "Videos"}, use_cache=use_cache, validate=self._is_repairable_script)
+
+    @staticmethod
+    def _is_repairable_script(text):
         try:
-            # Attempt to parse the response text as JSON
-            json.loads(response.text)
-
-        except json.JSONDecodeError as e:
-            # If parsing fails, print the error and the raw response text
-            print(f"Error decoding JSON: {e}")
-            print(f"Raw response text: {response.text}")
-        # wait 10 seconds so that the server would not be overloaded
-        time.sleep(10)
-        return response.text
+            ScriptRepair.parse(text)
+            return True
+        except ScriptValidationError:
+            return False
     
+    def shorten_texts_gemini(self, texts):
+        """
+        Shortens all given speaker lines in one structured request.
+        Returns a list aligned with texts. The model keeps each line's number, so the
+        answers are matched to their lines even when some are merged or dropped; the
+        entries the model did not return are None.
+        """
+        if not texts:
+            return []
+        numbered_lines = "\n".join(f"{i}. {text}" for i, text in enumerate(texts, start=1))
+        prompt = f"""
+        Below are {len(texts)} numbered lines a speaker says in a short video.
+        Rewrite every line so it is way shorter while maintaining the same speaker tone and meaning.
+        Return a JSON array with exactly {len(texts)} strings, the shortened lines in the same order, each starting with its number, e.g. "1. Short line".
+
+        {numbered_lines}"""
+
+        def call(key):
+            client = ClientPool.gemini(self.gemini_api_key)
+            response = self.generate_content_gemini(
+                client,
+                contents=prompt,
+                config=self.gemini_config(
+                    key,
+                    response_mime_type="application/json",
+                    response_schema=list[str]
+                )
+            )
+            return response.text
+
+        def validate(text):
+            # An answer with merged or dropped lines is still used, but not worth caching
+            return self._is_json(text) and None not in self._match_numbered_lines(json.loads(text), len(texts))
+
+        try:
+            shortened = json.loads(self.cached_gemini(prompt, call, params={"schema": "numbered list[str]"}, validate=validate))
+        except Exception as e:
+            print(f"Batched shortening failed: {e}")
+            return [None] * len(texts)
+
+        result = self._match_numbered_lines(shortened, len(texts))
+        missing = result.count(None)
+        if missing:
+            print(f"Batched shortening left {missing} of {len(texts)} lines out, shortening them one by one")
+        return result
+
+    @staticmethod
+    def _match_numbered_lines(lines, count):
+        """Places answers like "3. Short line" at their line number; unnumbered answers are only trusted when none is missing."""
+        result = [None] * count
+        if not isinstance(lines, list):
+            return result
+        lines = [line.strip() for line in lines if isinstance(line, str) and line.strip()]
+        numbered = [re.match(r"^(\d+)\s*[.):]\s*(.+)$", line, re.DOTALL) for line in lines]
+        if not any(numbered):
+            return lines if len(lines) == count else result
+        for match in numbered:
+            if match and 1 <= int(match.group(1)) <= count and result[int(match.group(1)) - 1] is None:
+                result[int(match.group(1)) - 1] = match.group(2).strip()
+        return result
+
+    @staticmethod
+    def _is_json(text):
+        try:
+            json.loads(text)
+            return True
+        except (TypeError, ValueError):
+            return False
+
+    def shorten_text_gemini(self, text):
+        """Shortens a single speaker line; returns the original text if the model's answer cannot be parsed."""
+        prompt = text + " the last time it was too long, please generate a way shorter text maintaining the same speaker tone and meaning. Separate the actual text you generated with symbol '|' from start to end, as if they were quotes. For example: 'Here is the text I generated: |This is very good! Check the link!|'. Another example: 'I shortened the text as you asked: |Get the product from the link!|'."
+
+        def call(key):
+            client = ClientPool.gemini(self.gemini_api_key)
+            response = self.generate_content_gemini(client, contents=prompt, config=self.gemini_config(key))
+            return response.text
+        response_text = self.cached_gemini(prompt, call, validate=lambda r: re.search(r"\|(.+?)\|", r) is not None)
+        print('shorten_speech from prompt (not clean): ', response_text)
+        # get the text between the quotes
+        match = re.search(r"\|(.+?)\|", response_text or "")
+        return match.group(1).strip() if match else text
+
     @staticmethod
     def remove_symbols(text):
         # Remove asterisks and underscores and the text between them
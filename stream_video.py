@@ -0,0 +1,46 @@
+# Writes a reel from a prompt and renders every scene as soon as its voiceover and media are ready,
+# e.g. `python stream_video.py "5 facts about octopuses" octopus_project`
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from config import Config
+from modules.footage_downloader import FootageDownloader
+from modules.image_generator import ImageGenerator
+from modules.scene_pipeline import ScenePipeline
+from modules.video_generator import VideoGenerator
+from modules.voice_generator import VoiceGenerator
+from modules.writer.writer import Writer
+
+
+def stream_video(prompt, project_name, video_id=1):
+    video_generator = VideoGenerator(project_name)
+    # One render at a time, so the stage workers never wait for MoviePy
+    render_pool = ThreadPoolExecutor(max_workers=1)
+    renders = {}
+
+    def render(scene):
+        renders[scene["scene"]] = render_pool.submit(video_generator.render_scene, video_id, scene, scene["media_path"])
+
+    pipeline = ScenePipeline(
+        project_name,
+        Writer(Config.POLLINATIONS_API_KEY, Config.GEMINI_API_KEY),
+        VoiceGenerator(project_name, Config.NAGA_AC_API_KEY),
+        ImageGenerator(project_name, Config.VIDEO_WIDTH, Config.VIDEO_HEIGHT),
+        FootageDownloader(project_name, Config.PEXELS_API_KEY),
+        on_scene_ready=render,
+    )
+    video = pipeline.execute(prompt, video_id)
+    clip_paths = [renders[scene["scene"]].result() for scene in video["scenes"] if scene["scene"] in renders]
+    render_pool.shutdown()
+    if not clip_paths:
+        print("No scene was ready to render")
+        return None
+    final_video_path = os.path.join(video_generator.generated_video, str(video_id), "final_video.mp4")
+    return video_generator.concatenate_video_clips(clip_paths, final_video_path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print('Usage: python stream_video.py "<prompt>" <project name>')
+        sys.exit(1)
+    print(stream_video(sys.argv[1], sys.argv[2]))
@@ -0,0 +1,78 @@
+import hashlib
+import os
+from modules.blob_store import BlobStore
+
+
+def make_store(tmp_path):
+    return BlobStore(str(tmp_path / "blobs"))
+
+
+def test_put_stores_each_content_once(tmp_path):
+    store = make_store(tmp_path)
+    digest = store.put_bytes(b"clip")
+
+    assert digest == hashlib.sha256(b"clip").hexdigest()
+    assert store.put_chunks([b"cl", b"ip"]) == digest
+    with open(store.blob_path(digest), 'rb') as f:
+        assert f.read() == b"clip"
+    assert store.stats()["blobs"] == 1
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_put_moved_takes_the_file_out_of_tmp(tmp_path):
+    store = make_store(tmp_path)
+    src = os.path.join(store.tmp_dir, "download.mp4")
+    with open(src, 'wb') as f:
+        f.write(b"video")
+
+    digest = store.put_moved(src)
+    assert not os.path.exists(src)
+    assert store.has(digest)
+
+
+def test_read_only_links_share_the_blob(tmp_path):
+    store = make_store(tmp_path)
+    digest = store.put_bytes(b"footage")
+    first = store.link(digest, str(tmp_path / "a" / "footage.mp4"))
+    second = store.link(digest, str(tmp_path / "b" / "footage.mp4"))
+
+    for path in (first, second):
+        with open(path, 'rb') as f:
+            assert f.read() == b"footage"
+    assert store.refcounts()[digest] == 2
+
+
+def test_writable_links_never_change_the_blob(tmp_path):
+    store = make_store(tmp_path)
+    digest = store.put_bytes(b"voice")
+    path = store.link(digest, str(tmp_path / "voice.mp3"), writable=True)
+
+    assert os.stat(path).st_ino != os.stat(store.blob_path(digest)).st_ino
+    with open(path, 'wb') as f:
+        f.write(b"enhanced voice")
+    with open(store.blob_path(digest), 'rb') as f:
+        assert f.read() == b"voice"
+
+
+def test_gc_deletes_only_unreferenced_blobs(tmp_path):
+    store = make_store(tmp_path)
+    kept = store.put_bytes(b"kept")
+    released = store.put_bytes(b"released")
+    deleted = store.put_bytes(b"deleted")
+    store.link(kept, str(tmp_path / "kept.bin"))
+    store.release(store.link(released, str(tmp_path / "released.bin")))
+    os.remove(store.link(deleted, str(tmp_path / "deleted.bin")))
+
+    assert store.gc(grace=0) == len(b"released") + len(b"deleted")
+    assert store.has(kept)
+    assert not store.has(released)
+    assert not store.has(deleted)
+    assert store.stats() == {"blobs": 1, "bytes": len(b"kept"), "references": 1}
+
+
+def test_gc_keeps_new_blobs_within_the_grace_period(tmp_path):
+    store = make_store(tmp_path)
+    digest = store.put_bytes(b"about to be linked")
+
+    assert store.gc(grace=3600) == 0
+    assert store.has(digest)
@@ -0,0 +1,99 @@
+import threading
+from modules.job_queue import JobQueue
+
+
+def make_queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_claim_hands_out_the_oldest_queued_job(tmp_path):
+    queue = make_queue(tmp_path)
+    first = queue.enqueue("generate_videos", {"n": 1})
+    second = queue.enqueue("generate_videos", {"n": 2})
+
+    job = queue.claim("worker-a")
+    assert job["job_id"] == first
+    assert job["status"] == "running"
+    assert job["worker"] == "worker-a"
+    assert job["payload"] == {"n": 1}
+    assert queue.claim("worker-b")["job_id"] == second
+    assert queue.claim("worker-c") is None
+
+
+def test_each_job_is_claimed_by_exactly_one_worker(tmp_path):
+    queue = make_queue(tmp_path)
+    job_ids = {queue.enqueue("generate_videos", {"n": n}) for n in range(20)}
+    claimed = []
+    lock = threading.Lock()
+
+    def work(worker):
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job["job_id"])
+
+    threads = [threading.Thread(target=work, args=(f"worker-{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claimed) == sorted(job_ids)
+
+
+def test_cancelling_a_queued_job_finishes_it_at_once(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("generate_videos", {})
+
+    assert queue.cancel(job_id)
+    assert queue.get(job_id)["status"] == "cancelled"
+    assert queue.claim("worker-a") is None
+
+
+def test_cancelling_a_running_job_only_flags_it(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("generate_videos", {})
+    queue.claim("worker-a")
+
+    assert queue.cancel(job_id)
+    assert queue.get(job_id)["status"] == "running"
+    assert queue.cancel_requested(job_id)
+    queue.mark_cancelled(job_id)
+    assert queue.get(job_id)["status"] == "cancelled"
+
+
+def test_finished_jobs_cannot_be_cancelled_or_finished_again(tmp_path):
+    queue = make_queue(tmp_path)
+    job_id = queue.enqueue("generate_videos", {})
+    queue.claim("worker-a")
+    queue.complete(job_id, {"videos": 1})
+
+    assert not queue.cancel(job_id)
+    queue.fail(job_id, "late failure")
+    job = queue.get(job_id)
+    assert job["status"] == "done"
+    assert job["result"] == {"videos": 1}
+
+
+def test_fail_orphans_fails_only_jobs_of_dead_workers(tmp_path):
+    queue = make_queue(tmp_path)
+    orphan = queue.enqueue("generate_videos", {})
+    alive = queue.enqueue("generate_videos", {})
+    waiting = queue.enqueue("generate_videos", {})
+    queue.claim("dead-worker")
+    queue.claim("live-worker")
+
+    queue.fail_orphans(lambda worker: worker == "live-worker")
+    assert queue.get(orphan)["status"] == "failed"
+    assert "dead-worker" in queue.get(orphan)["error"]
+    assert queue.get(alive)["status"] == "running"
+    assert queue.get(waiting)["status"] == "queued"
+
+
+def test_worker_metrics_round_trip(tmp_path):
+    queue = make_queue(tmp_path)
+    queue.report_metrics("worker-a", {"http": {"requests": 3}})
+
+    assert queue.worker_metrics("http") == {"worker-a": {"requests": 3}}
+    assert queue.worker_metrics("http", max_age=-1) == {}
@@ -0,0 +1,87 @@
+import json
+import os
+import threading
+from modules.project_store import ProjectStore
+
+
+SCRIPT_VIDEOS = [
+    {"video": 1, "caption": "First", "scenes": [
+        {"scene": "Opening shot", "text": "I found a box", "visuals": "A closed box"},
+        {"scene": "Reveal", "text": "Inside was a map", "visuals": "An old map"},
+    ]},
+    {"video": 2, "scenes": [{"scene": "Ünïcode scene", "text": "Ça marche", "visuals": "Café"}]},
+    {"video": 10, "caption": None, "scenes": []},
+]
+
+IMAGE_PATHS = [
+    {"video": 1, "scenes": [
+        {"scene": "Opening shot", "image_path": "generated_images/1/Opening shot/img.png", "google_image_path": ""},
+        {"scene": "Reveal", "image_path": "", "google_image_path": "downloaded_videos/1/Reveal/map.mp4"},
+    ]},
+]
+
+
+def write_json(path, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+def read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def make_store(tmp_path):
+    return ProjectStore(str(tmp_path / ProjectStore.FILE_NAME))
+
+
+def test_import_export_round_trip(tmp_path):
+    write_json(tmp_path / "script_videos.json", SCRIPT_VIDEOS)
+    write_json(tmp_path / "image_paths.json", IMAGE_PATHS)
+    store = make_store(tmp_path)
+    store.import_json(str(tmp_path / "script_videos.json"), str(tmp_path / "image_paths.json"))
+
+    store.export_script_videos(str(tmp_path / "out_script_videos.json"))
+    store.export_image_paths(str(tmp_path / "out_image_paths.json"))
+    # get_video() leaves out a caption of None
+    expected = [{k: v for k, v in video.items() if not (k == "caption" and v is None)} for video in SCRIPT_VIDEOS]
+    assert read_json(tmp_path / "out_script_videos.json") == expected
+    assert read_json(tmp_path / "out_image_paths.json") == IMAGE_PATHS
+
+
+def test_videos_are_exported_in_numeric_order(tmp_path):
+    store = make_store(tmp_path)
+    for video in reversed(SCRIPT_VIDEOS):
+        store.upsert_video(video)
+
+    assert [video["video"] for video in store.videos()] == [1, 2, 10]
+
+
+def test_scene_asset_updates_do_not_overwrite_each_other(tmp_path):
+    store = make_store(tmp_path)
+    store.replace_videos(SCRIPT_VIDEOS)
+    threads = [threading.Thread(target=store.set_asset, args=(1, scene, kind, f"{scene}/{kind}"))
+               for scene in ("Opening shot", "Reveal") for kind in ProjectStore.IMAGE_PATH_KINDS]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert store.scene_assets(1) == {
+        scene: {kind: f"{scene}/{kind}" for kind in ProjectStore.IMAGE_PATH_KINDS}
+        for scene in ("Opening shot", "Reveal")
+    }
+
+
+def test_export_leaves_no_temp_files(tmp_path):
+    store = make_store(tmp_path)
+    store.replace_videos(SCRIPT_VIDEOS)
+    path = tmp_path / "script_videos.json"
+    threads = [threading.Thread(target=store.export_script_videos, args=(str(path),)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(read_json(path)) == len(SCRIPT_VIDEOS)
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
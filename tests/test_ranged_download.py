@@ -0,0 +1,111 @@
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+import requests
+from modules.ranged_download import RangedDownload
+
+
+BODY = bytes(range(256)) * 64
+
+
+class RangeHandler(BaseHTTPRequestHandler):
+    """Serves BODY with range support; while server.cut_after is set, GETs stop after that many bytes."""
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(BODY)))
+        self.send_header("Accept-Ranges", "bytes" if self.server.ranges else "none")
+        self.end_headers()
+
+    def do_GET(self):
+        self.server.ranges_requested.append(self.headers.get("Range"))
+        match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range") or "")
+        if match and self.server.ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(BODY) - 1
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(BODY)}")
+        else:
+            start, end = 0, len(BODY) - 1
+            self.send_response(200)
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        body = BODY[start:end + 1]
+        if self.server.cut_after is not None:
+            body = body[:self.server.cut_after]
+            self.close_connection = True
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    server.ranges = True
+    server.cut_after = None
+    server.ranges_requested = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url_of(server):
+    return f"http://127.0.0.1:{server.server_address[1]}/clip.mp4"
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_parallel_download_resumes_every_segment(server, tmp_path):
+    path = str(tmp_path / "clip.mp4")
+    downloader = RangedDownload(parts=4, min_part_size=1024, chunk_size=256)
+    server.cut_after = 512
+    with pytest.raises(requests.RequestException):
+        downloader.download(url_of(server), path)
+    assert not os.path.exists(path)
+    assert os.path.exists(path + ".part.json")
+
+    server.cut_after = None
+    server.ranges_requested.clear()
+    assert read(downloader.download(url_of(server), path)) == BODY
+    # Each of the 4 segments continues after the 512 bytes it already had
+    assert sorted(server.ranges_requested) == sorted(f"bytes={start + 512}-{start + 4095}" for start in range(0, len(BODY), 4096))
+    assert not os.path.exists(path + ".part")
+    assert not os.path.exists(path + ".part.json")
+
+
+def test_single_stream_download_resumes_from_the_part_file(server, tmp_path):
+    path = str(tmp_path / "clip.mp4")
+    with open(path + ".part", 'wb') as f:
+        f.write(BODY[:1000])
+
+    assert read(RangedDownload(parts=1).download(url_of(server), path)) == BODY
+    assert server.ranges_requested == ["bytes=1000-"]
+
+
+def test_single_stream_download_starts_over_without_range_support(server, tmp_path):
+    path = str(tmp_path / "clip.mp4")
+    with open(path + ".part", 'wb') as f:
+        f.write(b"stale bytes")
+    server.ranges = False
+
+    assert read(RangedDownload(parts=4, min_part_size=1024).download(url_of(server), path)) == BODY
+    assert server.ranges_requested == [None]
+
+
+def test_finished_downloads_are_not_fetched_again(server, tmp_path):
+    path = str(tmp_path / "clip.mp4")
+    downloader = RangedDownload(parts=4, min_part_size=1024)
+    downloader.download(url_of(server), path)
+    server.ranges_requested.clear()
+
+    assert read(downloader.download(url_of(server), path)) == BODY
+    assert server.ranges_requested == []
@@ -0,0 +1,52 @@
+import json
+import pytest
+from modules.scene_pipeline import IncrementalSceneParser
+
+
+SCRIPT = {
+    "Video": 1,
+    "Scenes": [
+        {"What_Speaker_Says_In_First_Person": "I found a {strange} \"box\"", "Visuals": "A box [closed]"},
+        {"What_Speaker_Says_In_First_Person": "Inside was a map", "Visuals": "An old map"},
+        {"What_Speaker_Says_In_First_Person": "It led home", "Visuals": "A house"},
+    ],
+}
+
+
+def feed_in_chunks(text, size):
+    parser = IncrementalSceneParser()
+    batches = [parser.feed(text[i:i + size]) for i in range(0, len(text), size)]
+    return [scene for batch in batches for scene in batch], batches
+
+
+@pytest.mark.parametrize("size", [1, 2, 7, 64, 10000])
+def test_scenes_are_the_same_whatever_the_chunking(size):
+    scenes, _ = feed_in_chunks(json.dumps(SCRIPT), size)
+    assert scenes == SCRIPT["Scenes"]
+
+
+def test_each_scene_is_returned_as_soon_as_it_closes():
+    text = json.dumps(SCRIPT)
+    first_end = text.index('"A box [closed]"}') + len('"A box [closed]"}')
+    parser = IncrementalSceneParser()
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end]) == [SCRIPT["Scenes"][0]]
+    assert parser.feed(text[first_end:]) == SCRIPT["Scenes"][1:]
+
+
+def test_scenes_key_is_matched_in_any_case_and_spacing():
+    text = '{"Video": 1, "scenes" :\n [{"What_Speaker_Says_In_First_Person": "Hi", "Visuals": "Wave"}]}'
+    scenes, _ = feed_in_chunks(text, 3)
+    assert scenes == [{"What_Speaker_Says_In_First_Person": "Hi", "Visuals": "Wave"}]
+
+
+def test_objects_outside_the_scenes_array_are_ignored():
+    text = '{"Meta": [{"What_Speaker_Says_In_First_Person": "No", "Visuals": "No"}], "Scenes": []}'
+    scenes, _ = feed_in_chunks(text, 5)
+    assert scenes == []
+
+
+def test_unparsable_scene_is_skipped():
+    text = '{"Scenes": [{"Visuals": "Only visuals"}, {"What_Speaker_Says_In_First_Person": "Ok", "Visuals": "Fine"}]}'
+    scenes, _ = feed_in_chunks(text, 4)
+    assert scenes == [{"What_Speaker_Says_In_First_Person": "Ok", "Visuals": "Fine"}]
@@ -0,0 +1,53 @@
+import pytest
+from modules.writer.script_repair import ScriptRepair, ScriptValidationError
+
+
+EXPECTED = {"Video": 1, "Scenes": [
+    {"What_Speaker_Says_In_First_Person": "I found a box", "Visuals": "A closed box"},
+    {"What_Speaker_Says_In_First_Person": "It's full of maps", "Visuals": "Old maps"},
+]}
+
+
+@pytest.mark.parametrize("text", [
+    # Code fence and prose around the JSON
+    'Here is your script:\n```json\n{"Video": 1, "Scenes": [{"What_Speaker_Says_In_First_Person": "I found a box", "Visuals": "A closed box"}, '
+    '{"What_Speaker_Says_In_First_Person": "It\'s full of maps", "Visuals": "Old maps"}]}\n```\nEnjoy!',
+    # Trailing commas
+    '{"Video": 1, "Scenes": [{"What_Speaker_Says_In_First_Person": "I found a box", "Visuals": "A closed box",}, '
+    '{"What_Speaker_Says_In_First_Person": "It\'s full of maps", "Visuals": "Old maps",},],}',
+    # Smart quotes as delimiters, with an apostrophe inside a string
+    '{“Video”: 1, “Scenes”: [{“What_Speaker_Says_In_First_Person”: “I found a box”, “Visuals”: “A closed box”}, '
+    '{“What_Speaker_Says_In_First_Person”: “It\'s full of maps”, “Visuals”: “Old maps”}]}',
+    # Single quotes and unquoted keys
+    "{Video: 1, Scenes: [{'What_Speaker_Says_In_First_Person': 'I found a box', 'Visuals': 'A closed box'}, "
+    "{'What_Speaker_Says_In_First_Person': \"It's full of maps\", 'Visuals': 'Old maps'}]}",
+    # Other key spellings
+    '{"video": "1", "scenes": [{"speech": "I found a box", "visual": "A closed box"}, {"narration": "It\'s full of maps", "Visuals": "Old maps"}]}',
+    # A bare list of scenes
+    '[{"What_Speaker_Says_In_First_Person": "I found a box", "Visuals": "A closed box"}, '
+    '{"What_Speaker_Says_In_First_Person": "It\'s full of maps", "Visuals": "Old maps"}]',
+])
+def test_malformed_scripts_are_repaired(text):
+    assert ScriptRepair.parse(text) == EXPECTED
+
+
+def test_raw_newlines_in_strings_are_escaped():
+    text = '{"Video": 1, "Scenes": [{"What_Speaker_Says_In_First_Person": "I found\na box", "Visuals": "A closed box"}]}'
+    assert ScriptRepair.parse(text)["Scenes"][0]["What_Speaker_Says_In_First_Person"] == "I found\na box"
+
+
+def test_python_literals_are_repaired():
+    text = "{'Video': 1, 'Scenes': [{'What_Speaker_Says_In_First_Person': 'I found a box', 'Visuals': None}], 'Final': True}"
+    assert ScriptRepair.parse(text) == {"Video": 1, "Scenes": [{"What_Speaker_Says_In_First_Person": "I found a box", "Visuals": ""}]}
+
+
+@pytest.mark.parametrize("text, message", [
+    ("", "empty"),
+    ('{"Video": 1, "Scenes": [{"What_Speaker_Says_In_First_Person": "I found a box" "Visuals": "A box"}]}', "invalid at line 1"),
+    ('{"Video": 1}', "no Scenes list"),
+    ('{"Video": 1, "Scenes": []}', "Scenes is empty"),
+    ('{"Video": 1, "Scenes": [{"Visuals": "A closed box"}]}', "Scenes 1 have no What_Speaker_Says_In_First_Person"),
+])
+def test_unusable_scripts_raise_a_message_for_the_model(text, message):
+    with pytest.raises(ScriptValidationError, match=message):
+        ScriptRepair.parse(text)
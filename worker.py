@@ -0,0 +1,8 @@
+# Runs generation job workers without the web server, e.g. `python worker.py 4`
+import sys
+from app import job_workers
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        job_workers.processes = int(sys.argv[1])
+    job_workers.start().join()